@@ -0,0 +1,53 @@
+"""
+Benchmark building the 'Face Color' column of the table.
+
+Compares napari rgb_to_hex() called once per point (what getDataFrame()
+used to do) with the vectorized rgbaToHex() at 10k, 100k and 1M points.
+
+Run with:
+
+    python benchmarks/bench_face_color.py
+    python benchmarks/bench_face_color.py --points 10000 100000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from napari.utils.colormaps.standardize_color import rgb_to_hex
+
+from napari_layer_table._utils import rgbaToHex
+
+def perPointHex(rgba : np.ndarray) -> list:
+    return [str(rgb_to_hex(oneColor)[0]) for oneColor in rgba]
+
+def vectorHex(rgba : np.ndarray) -> list:
+    return rgbaToHex(rgba).astype(object)
+
+def timeIt(func, rgba, repeat : int = 3) -> float:
+    """Return best time in seconds over repeat calls.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(rgba)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def run(numPointsList = (10_000, 100_000, 1_000_000)):
+    rng = np.random.default_rng(0)
+    print(f'{"points":>10} {"per point (s)":>14} {"vectorized (s)":>15} {"speedup":>8}')
+    for numPoints in numPointsList:
+        rgba = rng.uniform(0, 1, (numPoints, 4))
+        assert list(vectorHex(rgba[:1000])) == perPointHex(rgba[:1000])
+        # per point loop is slow, only run it once
+        loopTime = timeIt(perPointHex, rgba, repeat=1)
+        vectorTime = timeIt(vectorHex, rgba)
+        print(f'{numPoints:>10,} {loopTime:>14.4f} {vectorTime:>15.4f} {loopTime/vectorTime:>7.0f}x')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--points', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+    run(args.points)
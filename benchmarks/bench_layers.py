@@ -0,0 +1,209 @@
+"""
+Benchmark the layer adapters and LayerTablePlugin at 1e3 to 1e6 items.
+
+Points, shapes and labels layers are made in an offscreen napari viewer.
+See benchmarks/readme.md to run and compare with a baseline.
+"""
+
+import numpy as np
+import pytest
+
+from napari_layer_table import LayerTablePlugin
+from napari_layer_table._undo import mmUndo
+
+numSelect = 1_000  # items selected, deleted and undone in each round
+
+layerViewers = ['pointsViewer', 'shapesViewer', 'labelsViewer']
+
+def _makePlugin(viewer) -> LayerTablePlugin:
+    """Plugin on the one layer in viewer.
+
+    Builds the whole table in the Qt event loop so we time the same
+    code at every size. refresh() at 1e6 points is timed with the
+    virtual model in bench_refresh_virtual().
+    """
+    layer = viewer.layers[0]
+    return LayerTablePlugin(viewer, oneLayer=layer,
+                            virtualModelRows=None,
+                            workerLabelPixels=None)
+
+def _roundsFor(numItems : int) -> int:
+    return 3 if numItems >= 100_000 else 10
+
+@pytest.mark.benchmark(group='layer.getDataFrame')
+@pytest.mark.parametrize('viewerFixture', layerViewers)
+def bench_getDataFrame(benchmark, request, viewerFixture, numItems):
+    viewer = request.getfixturevalue(viewerFixture)
+    myLayer = _makePlugin(viewer)._myLayer
+
+    def setup():
+        if viewerFixture == 'labelsViewer':
+            # time the region props, not the cached stats
+            myLayer.slot_data(None)
+        return (), {'getFull': True}
+
+    df = benchmark.pedantic(myLayer.getDataFrame, setup=setup,
+                            rounds=_roundsFor(numItems))
+    assert len(df) == numItems
+
+@pytest.mark.benchmark(group='widget.refresh')
+@pytest.mark.parametrize('viewerFixture', layerViewers)
+def bench_refresh(benchmark, request, viewerFixture, numItems):
+    viewer = request.getfixturevalue(viewerFixture)
+    plugin = _makePlugin(viewer)
+    myLayer = plugin._myLayer
+
+    def setup():
+        if viewerFixture == 'labelsViewer':
+            myLayer.slot_data(None)
+
+    benchmark.pedantic(plugin.refresh, setup=setup, rounds=_roundsFor(numItems))
+    assert plugin.myTable2.getNumRows() == numItems
+
+@pytest.mark.benchmark(group='widget.refresh')
+def bench_refresh_virtual(benchmark, pointsViewer, numItems):
+    layer = pointsViewer.layers[0]
+    plugin = LayerTablePlugin(pointsViewer, oneLayer=layer, virtualModelRows=0)
+
+    benchmark.pedantic(plugin.refresh, rounds=_roundsFor(numItems))
+    assert plugin.myTable2.getNumRows() == numItems
+
+def _twoSelections(numItems : int) -> list:
+    """Two different selections so each round is a real change.
+    """
+    rng = np.random.default_rng(0)
+    numSelected = min(numSelect, numItems // 2)
+    rows = rng.choice(numItems, 2 * numSelected, replace=False)
+    return [set(rows[:numSelected].tolist()), set(rows[numSelected:].tolist())]
+
+@pytest.mark.benchmark(group='selection.fromLayer')
+@pytest.mark.parametrize('viewerFixture', ['pointsViewer', 'shapesViewer'])
+def bench_select_from_layer(benchmark, request, viewerFixture, numItems):
+    """User selects in the viewer, the table selects the same rows.
+    """
+    viewer = request.getfixturevalue(viewerFixture)
+    plugin = _makePlugin(viewer)
+    myLayer = plugin._myLayer
+    selections = _twoSelections(numItems)
+    roundIdx = [0]
+
+    def setup():
+        roundIdx[0] += 1
+        return (selections[roundIdx[0] % 2],), {}
+
+    def run(selectedSet):
+        myLayer._layer.selected_data = selectedSet
+        # do not wait for the next frame
+        myLayer._flushHighlight()
+
+    benchmark.pedantic(run, setup=setup, rounds=_roundsFor(numItems))
+    assert len(plugin.myTable2._getRowSelection()) == len(selections[0])
+
+@pytest.mark.benchmark(group='selection.fromTable')
+@pytest.mark.parametrize('viewerFixture', ['pointsViewer', 'shapesViewer'])
+def bench_select_from_table(benchmark, request, viewerFixture, numItems):
+    """User selects rows in the table, the layer selects the same items.
+    """
+    viewer = request.getfixturevalue(viewerFixture)
+    plugin = _makePlugin(viewer)
+    myLayer = plugin._myLayer
+    selections = _twoSelections(numItems)
+    roundIdx = [0]
+
+    def setup():
+        roundIdx[0] += 1
+        return (sorted(selections[roundIdx[0] % 2]), False), {}
+
+    benchmark.pedantic(plugin.slot_selection_changed, setup=setup,
+                        rounds=_roundsFor(numItems))
+    assert len(myLayer.selected_data) == len(selections[0])
+
+@pytest.mark.benchmark(group='undo.delete')
+def bench_undo_delete(benchmark, pointsViewer, numItems):
+    """Undo of deleting numSelect points.
+    """
+    plugin = _makePlugin(pointsViewer)
+    myLayer = plugin._myLayer
+    undo = mmUndo(myLayer)
+    selectedSet = _twoSelections(numItems)[0]
+
+    def setup():
+        myLayer._layer.selected_data = selectedSet
+        myLayer._flushHighlight()
+        myLayer._layer.remove_selected()
+        assert undo.numUndo() == 1
+
+    benchmark.pedantic(undo.doUndo, setup=setup, rounds=_roundsFor(numItems))
+    assert myLayer.numItems() == numItems
+
+def _moveItems(myLayer, rows : np.ndarray, shift : np.ndarray):
+    """Move items like a mouse drag, without the mouse.
+    """
+    # the layer copies the selection on 'changing'
+    myLayer._selectionSnapshot.materialize(myLayer._layerVersion)
+    if isinstance(myLayer._layer.data, list):
+        myLayer._shiftItems(rows, shift)
+        myLayer._layer.refresh()
+    else:
+        myLayer._moveItems(rows, shift)
+    # 'changed'
+    myLayer.slot_user_edit_data(None)
+
+@pytest.mark.benchmark(group='undo.move')
+@pytest.mark.parametrize('viewerFixture', ['pointsViewer', 'shapesViewer'])
+def bench_undo_move(benchmark, request, viewerFixture, numItems):
+    """Undo of moving numSelect items.
+
+    Shapes are shifted with one mesh update, time should not grow
+    much faster with the number of shapes than for points.
+    """
+    viewer = request.getfixturevalue(viewerFixture)
+    plugin = _makePlugin(viewer)
+    myLayer = plugin._myLayer
+    undo = mmUndo(myLayer)
+    selectedSet = _twoSelections(numItems)[0]
+    rows = np.array(sorted(selectedSet))
+    shift = np.full((len(rows), myLayer._layer.ndim), 5.0)
+    myLayer.selectItems(selectedSet)
+
+    def setup():
+        _moveItems(myLayer, rows, shift)
+        assert undo.numUndo() == 1
+
+    benchmark.pedantic(undo.doUndo, setup=setup, rounds=_roundsFor(numItems))
+    assert undo.numRedo() == 1
+
+@pytest.mark.benchmark(group='layer.getVisibleItems')
+def bench_getVisibleItems(benchmark, pointsViewer, numItems):
+    """Items in one z-plane of a 100 plane stack, like on a dims slider step.
+    """
+    myLayer = _makePlugin(pointsViewer)._myLayer
+    myLayer.getSpatialIndex()  # built once, not timed
+    zPlanes = [40, 60]
+    roundIdx = [0]
+
+    def setup():
+        roundIdx[0] += 1
+        pointsViewer.dims.set_point(0, zPlanes[roundIdx[0] % 2])
+
+    visibleRows = benchmark.pedantic(myLayer.getVisibleItems, setup=setup,
+                                        rounds=_roundsFor(numItems))
+    assert len(visibleRows) < numItems
+
+@pytest.mark.benchmark(group='layer.findNearestItem')
+def bench_findNearestItem(benchmark, pointsViewer, numItems):
+    """Nearest point to a click, like a duplicate check on shift+click.
+    """
+    myLayer = _makePlugin(pointsViewer)._myLayer
+    myLayer.getSpatialIndex()  # built once, not timed
+    rng = np.random.default_rng(0)
+    lower = myLayer._layer.data.min(axis=0)
+    upper = myLayer._layer.data.max(axis=0)
+
+    def setup():
+        return (rng.uniform(lower, upper),), {}
+
+    benchmark.pedantic(myLayer.findNearestItem, setup=setup,
+                        rounds=10 * _roundsFor(numItems))
+    row, _distance = myLayer.findNearestItem(lower)
+    assert row is not None
@@ -0,0 +1,112 @@
+"""
+Benchmark pandasModel edits and sortProxyModel at 1e3 to 1e6 rows.
+
+Each round gets a fresh model (not timed) so edits do not pile up.
+See benchmarks/readme.md to run and compare with a baseline.
+"""
+
+import numpy as np
+import pytest
+from qtpy import QtCore
+
+from napari_layer_table import pandasModel, sortProxyModel
+from napari_layer_table._data_model import queryRowMask
+
+from conftest import makeDataFrame
+
+numEdit = 1_000  # rows set, appended and deleted in each round
+
+@pytest.fixture
+def dataFrame(numItems):
+    return makeDataFrame(numItems)
+
+def _roundsFor(numItems : int) -> int:
+    # building a 1e6 row model is slow, fewer rounds for big models
+    return 5 if numItems >= 100_000 else 20
+
+@pytest.mark.benchmark(group='model.mySetRow')
+def bench_mySetRow(benchmark, qapp, dataFrame, numItems):
+    rng = np.random.default_rng(0)
+    rowList = np.sort(rng.choice(numItems, min(numEdit, numItems), replace=False)).tolist()
+    dfNew = makeDataFrame(len(rowList))
+    dfNew.index = rowList
+
+    def setup():
+        return (pandasModel(dataFrame.copy()), rowList, dfNew), {}
+
+    def run(model, rowList, dfNew):
+        assert model.mySetRow(rowList, dfNew)
+        # include dataChanged, normally emitted on the next event loop tick
+        model.myFlushDataChanged()
+
+    benchmark.pedantic(run, setup=setup, rounds=_roundsFor(numItems))
+
+@pytest.mark.benchmark(group='model.myAppendRow')
+def bench_myAppendRow(benchmark, qapp, dataFrame, numItems):
+    dfRow = makeDataFrame(numEdit)
+
+    def setup():
+        return (pandasModel(dataFrame.copy()), dfRow), {}
+
+    def run(model, dfRow):
+        model.myAppendRow(dfRow)
+
+    benchmark.pedantic(run, setup=setup, rounds=_roundsFor(numItems))
+
+@pytest.mark.benchmark(group='model.myDeleteRows')
+def bench_myDeleteRows(benchmark, qapp, dataFrame, numItems):
+    # scattered rows, like deleting a selection from a sorted table
+    rng = np.random.default_rng(0)
+    rows = rng.choice(numItems, min(numEdit, numItems) // 2, replace=False).tolist()
+
+    def setup():
+        return (pandasModel(dataFrame.copy()), rows), {}
+
+    def run(model, rows):
+        model.myDeleteRows(rows)
+
+    benchmark.pedantic(run, setup=setup, rounds=_roundsFor(numItems))
+
+@pytest.mark.benchmark(group='proxy.sort')
+def bench_sort(benchmark, qapp, dataFrame, numItems):
+    # sort by 'x', a float column
+    proxy = sortProxyModel()
+    proxy.setSourceModel(pandasModel(dataFrame))
+    colIdx = dataFrame.columns.get_loc('x')
+    roundIdx = [0]
+
+    def setup():
+        roundIdx[0] += 1
+        order = QtCore.Qt.AscendingOrder if roundIdx[0] % 2 else QtCore.Qt.DescendingOrder
+        return (colIdx, order), {}
+
+    benchmark.pedantic(proxy.sort, setup=setup, rounds=_roundsFor(numItems))
+    assert proxy.rowCount() == numItems
+
+@pytest.mark.benchmark(group='proxy.mapRows')
+def bench_mapRowsFromSource(benchmark, qapp, dataFrame, numItems):
+    proxy = sortProxyModel()
+    proxy.setSourceModel(pandasModel(dataFrame))
+    proxy.sort(dataFrame.columns.get_loc('x'))
+    rows = np.arange(0, numItems, 2)
+
+    proxyRows = benchmark(proxy.mapRowsFromSource, rows)
+    assert np.array_equal(proxy.mapRowsToSource(proxyRows), rows)
+
+@pytest.mark.benchmark(group='proxy.setRowFilter')
+def bench_setRowFilter(benchmark, qapp, dataFrame, numItems):
+    # what the query bar does on each (debounced) keystroke
+    proxy = sortProxyModel()
+    proxy.setSourceModel(pandasModel(dataFrame))
+    queries = ['z > 10 and x < 512', 'z > 50 and x < 512']
+    roundIdx = [0]
+
+    def rowFilterFor(query):
+        return lambda model: queryRowMask(model.myGetQueryFrame(), query)
+
+    def setup():
+        roundIdx[0] += 1
+        return (rowFilterFor(queries[roundIdx[0] % 2]),), {}
+
+    benchmark.pedantic(proxy.setRowFilter, setup=setup, rounds=_roundsFor(numItems))
+    assert 0 < proxy.rowCount() < numItems
@@ -0,0 +1,84 @@
+"""
+Benchmark repaint time of the table while scrolling a large model.
+
+Builds a pandasModel with 1M rows (columns like a 3D points layer),
+shows it in a myTableView and scrolls through it one page at a time.
+Each page is repainted synchronously and timed.
+
+Run with:
+
+    python benchmarks/bench_table_scroll.py
+    python benchmarks/bench_table_scroll.py --rows 200000 --pages 200
+
+Use QT_QPA_PLATFORM=offscreen to run without a display.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from qtpy import QtWidgets
+
+from napari_layer_table import pandasModel, myTableView
+
+def makeDataFrame(numRows : int) -> pd.DataFrame:
+    """Make a DataFrame that looks like a 3D points layer.
+    """
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'Symbol': ['●'] * numRows,
+        'x': rng.uniform(0, 1024, numRows),
+        'y': rng.uniform(0, 1024, numRows),
+        'z': rng.integers(0, 100, numRows),
+        'accept': [''] * numRows,
+        'Face Color': ['#ff00ffff'] * numRows,
+    })
+    return df
+
+def run(numRows : int = 1_000_000, numPages : int = 100):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    t0 = time.perf_counter()
+    df = makeDataFrame(numRows)
+    model = pandasModel(df)
+    tableView = myTableView()
+    tableView.mySetModel(model)
+    tableView.resize(800, 600)
+    tableView.show()
+    app.processEvents()
+    print(f'built {numRows:,} row model and view in {time.perf_counter()-t0:.3f} s')
+
+    scrollBar = tableView.verticalScrollBar()
+    pageStep = max(scrollBar.pageStep(), 1)
+    # jump through the whole table so we do not just repaint the first rows
+    stride = max((scrollBar.maximum() - scrollBar.minimum()) // numPages, pageStep)
+
+    repaintTimes = []
+    value = scrollBar.minimum()
+    for _ in range(numPages):
+        scrollBar.setValue(value)
+        t0 = time.perf_counter()
+        tableView.viewport().repaint()
+        repaintTimes.append(time.perf_counter() - t0)
+        value += stride
+        if value > scrollBar.maximum():
+            value = scrollBar.minimum()
+
+    repaintTimes = np.array(repaintTimes) * 1000  # ms
+    print(f'{numPages} repaints of {pageStep} rows each')
+    print(f'  first:  {repaintTimes[0]:.2f} ms')
+    print(f'  median: {np.median(repaintTimes[1:]):.2f} ms')
+    print(f'  mean:   {np.mean(repaintTimes[1:]):.2f} ms')
+    print(f'  max:    {np.max(repaintTimes[1:]):.2f} ms')
+
+    tableView.close()
+    return repaintTimes
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--pages', type=int, default=100)
+    args = parser.parse_args()
+    run(args.rows, args.pages)
@@ -0,0 +1,87 @@
+"""
+Fixtures for the pytest-benchmark suite in this folder.
+
+Each benchmark that takes a `numItems` argument is run once per layer size,
+1e3 up to --bench-max-items (default 1e5, use 1e6 before a release).
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+defaultNumItems = [1_000, 10_000, 100_000, 1_000_000]
+
+def pytest_addoption(parser):
+    parser.addoption('--bench-max-items', type=int, default=100_000,
+                        help='largest layer size to benchmark (default 100000)')
+
+def pytest_generate_tests(metafunc):
+    if 'numItems' in metafunc.fixturenames:
+        maxItems = metafunc.config.getoption('--bench-max-items')
+        numItemsList = [n for n in defaultNumItems if n <= maxItems]
+        metafunc.parametrize('numItems', numItemsList, ids=lambda n: f'{n:.0e}')
+
+@pytest.fixture(scope='session', autouse=True)
+def offscreenQt():
+    """Run Qt without a display, must be set before the QApplication exists.
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+def makeDataFrame(numRows : int) -> pd.DataFrame:
+    """Make a DataFrame that looks like a 3D points layer.
+    """
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'Symbol': ['●'] * numRows,
+        'x': rng.uniform(0, 1024, numRows),
+        'y': rng.uniform(0, 1024, numRows),
+        'z': rng.integers(0, 100, numRows),
+        'accept': [''] * numRows,
+        'Face Color': ['#ff00ffff'] * numRows,
+    })
+    return df
+
+def makePoints(numItems : int) -> np.ndarray:
+    """(numItems, 3) z/y/x points in a 100x1024x1024 volume.
+    """
+    rng = np.random.default_rng(0)
+    points = rng.uniform(0, 1024, (numItems, 3))
+    points[:, 0] = rng.integers(0, 100, numItems)
+    return points
+
+def makeRectangles(numItems : int) -> list:
+    """numItems 2D rectangles, each a (4, 2) array of corners.
+    """
+    rng = np.random.default_rng(0)
+    corners = rng.uniform(0, 1000, (numItems, 1, 2))
+    offsets = np.array([[0, 0], [0, 10], [10, 10], [10, 0]])
+    return list(corners + offsets)
+
+def makeLabels(numItems : int) -> np.ndarray:
+    """2D label image with numItems labels, each a 2x2 block of pixels.
+    """
+    side = int(np.ceil(np.sqrt(numItems)))
+    labels = np.arange(1, side * side + 1, dtype=np.int32)
+    labels[numItems:] = 0
+    labels = labels.reshape(side, side)
+    return np.kron(labels, np.ones((2, 2), dtype=np.int32))
+
+@pytest.fixture
+def pointsViewer(make_napari_viewer, numItems):
+    viewer = make_napari_viewer()
+    viewer.add_points(makePoints(numItems), size=3, name='points')
+    return viewer
+
+@pytest.fixture
+def shapesViewer(make_napari_viewer, numItems):
+    viewer = make_napari_viewer()
+    viewer.add_shapes(makeRectangles(numItems), shape_type='rectangle', name='shapes')
+    return viewer
+
+@pytest.fixture
+def labelsViewer(make_napari_viewer, numItems):
+    viewer = make_napari_viewer()
+    viewer.add_labels(makeLabels(numItems), name='labels')
+    return viewer
@@ -4,8 +4,10 @@ __version__ = "0.0.2"
 
 from ._table_widget import myTableView
 from ._data_model import pandasModel
+from ._data_model import virtualLayerModel
+from ._data_model import sortProxyModel
 from ._my_widget import LayerTablePlugin
-from ._my_logger import logger
+from ._my_logger import logger, getTracer, setTraceLevel
 
 from ._my_layer import pointsLayer
 from ._my_layer import shapesLayer
@@ -1,11 +1,103 @@
-from pprint import pprint
-import math
+from collections import OrderedDict
 import numpy as np
 import pandas as pd
-from qtpy import QtCore, QtGui, QtWidgets
-from napari_layer_table._my_logger import logger
+from qtpy import QtCore, QtGui
+from napari_layer_table._my_logger import logger, getTracer
+from napari_layer_table._profiler import profileStage, numBytesOf
 from typing import List
-import time
+
+tracer = getTracer('model')
+
+sortRole = QtCore.Qt.UserRole
+"""Role for the raw typed value of a cell (not its display string), used to sort."""
+
+def _dfArgBytes(result, self, rowList, df=None, *args, **kwargs):
+    # mySetRow(rowList, df), bytes of the new values
+    return numBytesOf(df)
+
+def _appendBytes(result, self, dfRow=None):
+    return numBytesOf(dfRow)
+
+_hexDigits = np.full(128, -1, dtype=np.int64)
+_hexDigits[[ord(c) for c in '0123456789']] = np.arange(10)
+_hexDigits[[ord(c) for c in 'abcdef']] = np.arange(10, 16)
+_hexDigits[[ord(c) for c in 'ABCDEF']] = np.arange(10, 16)
+# lookup table from character code to hex digit value (-1 if not a hex digit)
+
+def hexToArgb(hexColors : np.ndarray):
+    """Convert napari hex colors to packed Qt colors in one vectorized pass.
+
+    Napari uses '#RRGGBBAA', Qt uses 0xAARRGGBB (see QColor.fromRgba).
+    '#RRGGBB' is treated as opaque.
+
+    Args:
+        hexColors (np.ndarray): 1D array of hex color strings.
+            Entries that are not strings (e.g. nan) are allowed.
+
+    Returns:
+        argb (np.ndarray): uint32 packed 0xAARRGGBB
+        valid (np.ndarray): bool, False where entry was not a hex color
+    """
+    hexColors = np.asarray(hexColors)
+    numColors = len(hexColors)
+    if numColors == 0:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=bool)
+
+    # fixed width unicode gives us one uint32 character code per char
+    try:
+        hexColors = hexColors.astype('U9')
+    except (ValueError) as e:
+        # some entries are sequences like [r, g, b, a]
+        hexColors = np.array([c if isinstance(c, str) else '' for c in hexColors], dtype='U9')
+    chars = hexColors.view(np.uint32).reshape(numColors, 9)
+    digits = _hexDigits[np.minimum(chars[:, 1:], 127)]  # (n, 8)
+
+    # '#RRGGBB' has no alpha, make it opaque
+    noAlpha = (chars[:, 7] == 0) & (chars[:, 8] == 0)
+    digits[noAlpha, 6:8] = 15
+
+    valid = (chars[:, 0] == ord('#')) & np.all(digits >= 0, axis=1)
+    digits[~valid] = 0
+
+    shifts = np.arange(28, -4, -4, dtype=np.int64)
+    rgba = (digits << shifts).sum(axis=1)
+    argb = ((rgba >> 8) | ((rgba & 0xFF) << 24)).astype(np.uint32)
+    return argb, valid
+
+def contiguousRanges(rows) -> List[tuple]:
+    """Group row indices into contiguous (first, last) ranges.
+
+    Args:
+        rows (iterable of int): row indices, any order, duplicates allowed
+
+    Returns:
+        list of (first, last) tuples, sorted and inclusive
+    """
+    rows = np.unique(np.asarray(list(rows), dtype=np.int64))
+    if len(rows) == 0:
+        return []
+    breaks = np.nonzero(np.diff(rows) != 1)[0]
+    firstRows = np.concatenate(([rows[0]], rows[breaks + 1]))
+    lastRows = np.concatenate((rows[breaks], [rows[-1]]))
+    return list(zip(firstRows.tolist(), lastRows.tolist()))
+
+def queryRowMask(df : pd.DataFrame, query : str) -> np.ndarray:
+    """Evaluate a pandas expression to one bool per row, vectorized.
+
+    Args:
+        df (pd.DataFrame): rows to test
+        query (str): DataFrame.eval() expression like "accept == 'Yes' and z > 10",
+            quote column names with spaces in backticks, e.g. `Face Color`
+
+    Raises:
+        ValueError: if query does not give one True/False per row.
+            Bad expressions raise what DataFrame.eval() raises.
+    """
+    mask = np.asarray(df.eval(query))
+    if mask.dtype != bool or mask.shape != (len(df),):
+        raise ValueError(f'"{query}" is not True/False for each row')
+    # a bool column name gives a (read only) view of df, return a copy
+    return np.array(mask, dtype=bool)
 
 class pandasModel(QtCore.QAbstractTableModel):
 
@@ -13,18 +105,159 @@ class pandasModel(QtCore.QAbstractTableModel):
     signalMyDataChanged = QtCore.Signal(object, object, object)
     """Emit on user editing a cell."""
 
-    def __init__(self, data : pd.DataFrame):
+    def __init__(self, data : pd.DataFrame, dataChangedInterval : int = 0):
         """Data model for a pandas dataframe.
 
         Args:
             data (pd.dataframe): pandas dataframe
+            dataChangedInterval (int): ms to collect changed rows before one
+                dataChanged per contiguous range is emitted.
+                0 for the next event loop tick, None to emit right away.
         """
         QtCore.QAbstractTableModel.__init__(self)
-        
+
         self._data = data
+        # may have spare rows at the end (see myAppendRow), use myGetData()
+
+        self._numRows = len(data)
+        # number of rows in the model, rows after this in self._data are spare
+
+        self._minSpareRows = 64
+        # when growing self._data, add at least this many spare rows
+
+        self._maxRemoveRanges = 32
+        # myDeleteRows() with more contiguous ranges does a model reset
+
+        self._displayCache = {}
+        # dict of column name to np.ndarray (dtype object) of display strings
+        # built on first paint of a column, see _getDisplayColumn()
+
+        self._faceColorArgb = None
+        # np.ndarray (uint32) of 'Face Color' column as Qt 0xAARRGGBB
+        # built on first paint, see _getFaceColor()
+        self._faceColorValid = None
+        # np.ndarray (bool), False where 'Face Color' is not a hex color
+
+        self._qColors = {}
+        # dict of 0xAARRGGBB to shared QColor
+
+        self._symbolFont = None
+        # shared QFont for 'Symbol' column, created on first paint
+
+        self._rowBrushes = (QtGui.QBrush(QtGui.QColor('#444444')),
+                            QtGui.QBrush(QtGui.QColor('#666666')))
+        # alternating row backgrounds (even, odd)
+
+        self._dataChangedInterval = dataChangedInterval
+        self._dirtyRows = []
+        # list of np.ndarray of rows changed since the last myFlushDataChanged()
+        self._dirtyColumns = None
+        # (first, last) column changed since the last myFlushDataChanged()
+        self._numDataChangedFlushed = 0
+        # number of flushes that emitted dataChanged, for tests and profiling
+
+        # a burst of mySetRow() (e.g. a drag in the viewer) repaints once
+        self._dataChangedTimer = QtCore.QTimer(self)
+        self._dataChangedTimer.setSingleShot(True)
+        self._dataChangedTimer.setInterval(dataChangedInterval or 0)
+        self._dataChangedTimer.timeout.connect(self.myFlushDataChanged)
+
+    def _getDisplayColumn(self, colIdx : int) -> np.ndarray:
+        """Get the display strings for one column.
+
+        Strings are built once per column (vectorized) and then reused on
+        every repaint. The cache is patched by mySetRow(), myAppendRow()
+        and myDeleteRows() and only rebuilt when self._data is replaced.
+
+        Args:
+            colIdx (int): Column index into the model.
+        """
+        columnName = self._data.columns[colIdx]
+        try:
+            return self._displayCache[columnName]
+        except KeyError:
+            pass
+        displayColumn = self._data.iloc[:, colIdx].astype(str).to_numpy(dtype=object)
+        self._displayCache[columnName] = displayColumn
+        return displayColumn
+
+    def _getDisplayString(self, row : int, colIdx : int) -> str:
+        """Get the display string for one cell.
+        """
+        # display strings are built once per column, see _getDisplayColumn()
+        return self._getDisplayColumn(colIdx)[row]
+
+    def _updateDisplayCache(self, rowList : List[int], columns = None):
+        """Refresh cached display strings for some rows.
+
+        Args:
+            rowList (list of int): row indices that changed
+            columns (list of str): column names that changed, None for all
+        """
+        for columnName in (columns if columns is not None else list(self._displayCache.keys())):
+            displayColumn = self._displayCache.get(columnName)
+            if displayColumn is None:
+                # not painted yet, will be built on demand
+                continue
+            displayColumn[rowList] = self._data.loc[rowList, columnName].astype(str).to_numpy(dtype=object)
+
+        if self._faceColorArgb is not None and (columns is None or 'Face Color' in columns):
+            self._faceColorArgb[rowList], self._faceColorValid[rowList] = \
+                    hexToArgb(self._data.loc[rowList, 'Face Color'].to_numpy())
+
+    def _getSortValue(self, row : int, colIdx : int):
+        """Get the raw value of one cell as a Python scalar.
+        """
+        value = self._data.iat[row, colIdx]
+        return value.item() if isinstance(value, np.generic) else value
+
+    def _getSymbolFont(self) -> QtGui.QFont:
+        """Shared font for 'Symbol' column.
+
+        Created on first use so we never build a QFont without a QApplication.
+        """
+        if self._symbolFont is None:
+            self._symbolFont = QtGui.QFont('Arial', pointSize=14)
+        return self._symbolFont
+
+    def _getFaceColor(self, row : int):
+        """Get a shared QColor for the 'Face Color' of a row.
+
+        Returns:
+            (QColor) or None if there is no valid 'Face Color'.
+        """
+        argb = self._getFaceColorArgb(row)
+        if argb is None:
+            return None
+        try:
+            return self._qColors[argb]
+        except KeyError:
+            theColor = QtGui.QColor.fromRgba(argb)
+            self._qColors[argb] = theColor
+            return theColor
+
+    def _getFaceColorArgb(self, row : int):
+        """Get 'Face Color' of a row as Qt 0xAARRGGBB.
+
+        Returns:
+            (int) or None if there is no valid 'Face Color'.
+        """
+        if self._faceColorArgb is None:
+            if 'Face Color' not in self._data.columns:
+                return None
+            self._faceColorArgb, self._faceColorValid = \
+                    hexToArgb(self._data['Face Color'].to_numpy())
+        if not self._faceColorValid[row]:
+            return None
+        return int(self._faceColorArgb[row])
+
+    def _clearDisplayCache(self):
+        self._displayCache = {}
+        self._faceColorArgb = None
+        self._faceColorValid = None
 
     def rowCount(self, parent=None):
-        return self._data.shape[0]
+        return self._numRows
 
     def columnCount(self, parnet=None):
         return self._data.shape[1]
@@ -45,126 +278,36 @@ class pandasModel(QtCore.QAbstractTableModel):
                 pass
             #elif role in [QtCore.Qt.DisplayRole, QtCore.Qt.EditRole]:
             elif role in [QtCore.Qt.DisplayRole]:
-                columnName = self._data.columns[index.column()]
+                return self._getDisplayString(index.row(), index.column())
 
-                realRow = index.row()
-                retVal = self._data.loc[realRow, columnName]
-            
-                #time.sleep(0.1)
-
-                if columnName == 'accept' and realRow==1:
-                    # logger.info(' ======================================= accept column')
-                    # print('  index.row():', index.row())
-                    # print('  index.column():', index.column())
-                    # print('  realRow:', realRow)
-                    # print('  columnName:', columnName)
-                    # print(f'  self._data.loc[realRow] is:')
-                    
-                    print(f'  (0) retVal is: "{retVal}"')
-
-                    # comment this and toggle with 'a' does not work
-                    print(self._data.loc[realRow])
-                    
-                    print(f'  (1) retVal is: "{retVal}"')
-
-                    # print(f'  self._data.loc[realRow, columnName] is "{self._data.loc[realRow, columnName]}"')
-                    # print('  self._data["accept"]: is')
-                    # print(self._data["accept"])
-                    # print('  self._data["x"]: is')
-                    # print(self._data["x"])
-                    # logger.info('  ========================================self._data is:')
-                    # print(self._data)
-                    # print('')
-
-                    pass
-
-                return str(retVal)
-                #return str(retVal)
-                #return QtCore.QVariant(retVal)
-
-                # if columnName == 'accept':
-                #     logger.info(f'orig retVal: "{retVal}" {type(retVal)}')
-                #     print('  self._data:')
-                #     print(self._data)
-
-                if isinstance(retVal, np.float64):
-                    retVal = float(retVal)
-                elif isinstance(retVal, np.int64):
-                    retVal = int(retVal)
-                elif isinstance(retVal, np.bool_):
-                    retVal = str(retVal)
-                elif isinstance(retVal, list):
-                    retVal = str(retVal)
-                elif isinstance(retVal, str) and retVal == 'nan':
-                    # logger.info('nan error 1')
-                    retVal = ''
-
-                elif isinstance(retVal, float) and math.isnan(retVal):
-                    # don't show 'nan' in table
-                    logger.info('nan error 2')
-                    retVal = ''
-                # added march 22
-                elif isinstance(retVal, str):
-                    logger.info(f'new mar 22 returning {retVal} {type(retVal)}')
-                    #retVal = retVal
-
-                if columnName == 'accept':
-                    logger.info(f'  returning realRow:{realRow} columnName:{columnName} retVal: "{retVal}"')
-                
-                return retVal
+            elif role == sortRole:
+                return self._getSortValue(index.row(), index.column())
 
             elif role == QtCore.Qt.FontRole:
-                #realRow = self._data.index[index.row()]
-                realRow = index.row()
                 columnName = self._data.columns[index.column()]
                 if columnName == 'Symbol':
                     # make symbols larger
-                    return QtCore.QVariant(QtGui.QFont('Arial', pointSize=14))
+                    return self._getSymbolFont()
                 return QtCore.QVariant()
 
             elif role == QtCore.Qt.ForegroundRole:
                 columnName = self._data.columns[index.column()]
                 colorColumns = ['Symbol', 'Shape Type']
-                #if columnName == 'Symbol':
                 if columnName in colorColumns:
-                    # don't get col from index, get from name
-                    realRow = self._data.index[index.row()]
-                    face_color = self._data.loc[realRow, 'Face Color'] # rgba
-                    # TODO: face_color is sometimes a scalar
-                    # try:
-                    #  _color = (np.array(color.getRgb()) / 255).astype(np.float32)
-                    try:
-                        #r = int(face_color[0] * 255)
-                        #g = int(face_color[1] * 255)
-                        #b = int(face_color[2] * 255)
-                        #alpha = int(face_color[3] * 255)
-                        #theColor = QtCore.QVariant(QtGui.QColor(r, g, b, alpha))
-                        # swap AA
-                        # napari uses proper order #RRGGBBAA
-                        # pyqt uses stange order #AARRGGBB
-                        face_color = face_color[0] + face_color[7:9] + face_color[1:7]
-                        theColor = QtCore.QVariant(QtGui.QColor(face_color))
+                    # color the symbol with the 'Face Color' of its row
+                    theColor = self._getFaceColor(index.row())
+                    if theColor is not None:
                         return theColor
-                    except (IndexError) as e:
-                        logger.error(f'expecting "Face Color"" as list of rgba, got scalar of {face_color}')
-                        return QtCore.QVariant()
                 return QtCore.QVariant()
 
             elif role == QtCore.Qt.BackgroundRole:
-                realRow = self._data.index[index.row()]
-                
                 columnName = self._data.columns[index.column()]
                 if columnName == 'Face Color':
-                    realRow = self._data.index[index.row()]
-                    face_color = self._data.loc[realRow, 'Face Color'] # rgba
-                    face_color = face_color[0] + face_color[7:9] + face_color[1:7]
-                    theColor = QtCore.QVariant(QtGui.QColor(face_color))
-                    return theColor         
-                #elif index.row() % 2 == 0:
-                elif realRow % 2 == 0:
-                    return QtCore.QVariant(QtGui.QColor('#444444'))
-                else:
-                    return QtCore.QVariant(QtGui.QColor('#666666'))
+                    theColor = self._getFaceColor(index.row())
+                    if theColor is not None:
+                        return theColor
+                    return QtCore.QVariant()
+                return self._rowBrushes[index.row() % 2]
         #
         return QtCore.QVariant()
 
@@ -202,6 +345,7 @@ class pandasModel(QtCore.QAbstractTableModel):
                 # set
                 self._data.loc[realRow, columnName] = value
                 #self._data.iloc[rowIdx, columnIdx] = value
+                self._updateDisplayCache([realRow], [columnName])
 
                 # emit change
                 emitRowDict = self.myGetRowDict(realRow)
@@ -224,7 +368,7 @@ class pandasModel(QtCore.QAbstractTableModel):
             columnName = self._data.columns[columnIdx]
         except(IndexError) as e:
             logger.warning(f'IndexError for columnIdx:{columnIdx} len:{len(self._data.columns)}')
-            print('  self._data.columns:', self._data.columns)
+            tracer.debug('self._data.columns:%s', self._data.columns)
             raise
 
         theRet = QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
@@ -266,153 +410,235 @@ class pandasModel(QtCore.QAbstractTableModel):
     def myCopyTable(self):
         """Copy model data to clipboard.
         """
-        dfCopy = self._data.copy()
+        dfCopy = self.myGetData().copy()
         dfCopy.to_clipboard(sep='\t', index=False)
         logger.info(f'Copied table to clipboard with shape: {dfCopy.shape}')
-        pprint(dfCopy)
+        tracer.debug('copied:\n%s', dfCopy)
 
+    @profileStage('model.myAppendRow', numBytes=_appendBytes)
     def myAppendRow(self, dfRow : pd.DataFrame = None):
-        """Append one row to internal DataFrame.
-        
+        """Append rows to internal DataFrame.
+
+        Rows are written into spare rows at the end of self._data,
+        the DataFrame only grows (and is copied) when we run out of spare rows.
+
         Args:
-            dfRow (pd.DataFrame): One row DataFrame to append.
+            dfRow (pd.DataFrame): DataFrame of rows to append.
         """
-        if dfRow.empty:
+        if dfRow is None or dfRow.empty:
             return
 
-        logger.info('')
-        # append one empty row
-        newRowIdx = len(self._data)
-        self.beginInsertRows(QtCore.QModelIndex(), newRowIdx, newRowIdx)
+        self.myFlushDataChanged()
 
-        self._data = pd.concat([self._data, dfRow], ignore_index=True)
+        numNewRows = len(dfRow)
+        firstRow = self._numRows
+        lastRow = firstRow + numNewRows - 1
+
+        self.beginInsertRows(QtCore.QModelIndex(), firstRow, lastRow)
+
+        newColumns = [column for column in dfRow.columns
+                        if column not in self._data.columns]
+        if newColumns or lastRow >= len(self._data):
+            self._appendAndGrow(dfRow)
+        else:
+            try:
+                self._appendInPlace(dfRow)
+            except (TypeError, ValueError) as e:
+                # e.g. new category in a categorical column
+                logger.warning(f'could not append in place, growing instead: {e}')
+                self._appendAndGrow(dfRow)
+        self._numRows += numNewRows
 
         self.endInsertRows()
 
+    def _appendInPlace(self, dfRow : pd.DataFrame):
+        """Write rows of dfRow into spare rows at end of self._data.
+        """
+        firstRow = self._numRows
+        newRows = slice(firstRow, firstRow + len(dfRow))
+        for colIdx, columnName in enumerate(self._data.columns):
+            oldDtype = self._data.dtypes.iloc[colIdx]
+            if columnName in dfRow.columns:
+                values = dfRow[columnName].to_numpy()
+            else:
+                # same as pd.concat() for a missing column
+                values = np.nan
+            self._data.iloc[newRows, colIdx] = values
+            if self._data.dtypes.iloc[colIdx] != oldDtype:
+                # e.g. int column became float, all strings change
+                self._displayCache.pop(columnName, None)
+        self._updateDisplayCache(list(range(newRows.start, newRows.stop)))
+
+    def _appendAndGrow(self, dfRow : pd.DataFrame):
+        """Append rows of dfRow and allocate new spare rows.
+
+        Spare rows are copies of the last row so column dtypes do not change.
+        """
+        newData = pd.concat([self.myGetData(), dfRow], ignore_index=True)
+        numSpareRows = max(len(newData) // 2, self._minSpareRows)
+        spareRows = newData.iloc[[len(newData)-1] * numSpareRows]
+        self._data = pd.concat([newData, spareRows], ignore_index=True)
+        self._clearDisplayCache()
+
+    @profileStage('model.myDeleteRows')
     def myDeleteRows(self, rows: list):
         """Delete a list of rows from model.
 
+        Rows are grouped into contiguous ranges and each range is removed
+        with beginRemoveRows()/endRemoveRows() so views keep their selection,
+        sort order and scroll position.
+
         Args:
             rows (list of int): row indices to delete
-        
-        TODO: get update of rows to work
         """
-        logger.info('qqqqqqq  wwwwwww')
-        # minRow = min(rows)
-        # maxRow = max(rows)
-        # want this
-        # self.beginRemoveRows(QtCore.QModelIndex(), minRow, maxRow)
-        self.beginResetModel()
+        rows = np.asarray(list(rows), dtype=np.int64)
+        badRows = (rows < 0) | (rows >= self._numRows)
+        if np.any(badRows):
+            logger.error(f'ignoring rows not in model: {rows[badRows]}')
+            rows = rows[~badRows]
+
+        rowRanges = contiguousRanges(rows)
+        if not rowRanges:
+            return
 
-        self._data = self._data.drop(rows)
-        self._data = self._data.reset_index(drop=True)
-    
-        # want this
-        # self.endRemoveRows()
-        self.endResetModel()
+        self.myFlushDataChanged()
+
+        if len(rowRanges) > self._maxRemoveRanges:
+            # many scattered rows, one reset is cheaper than many removes
+            self.beginResetModel()
+            keepRows = np.ones(self._numRows, dtype=bool)
+            keepRows[rows] = False
+            self._data = self.myGetData()[keepRows].reset_index(drop=True)
+            self._numRows = len(self._data)
+            self._clearDisplayCache()
+            self.endResetModel()
+            return
+
+        # remove from the end so row indices of earlier ranges do not change
+        for firstRow, lastRow in reversed(rowRanges):
+            self.beginRemoveRows(QtCore.QModelIndex(), firstRow, lastRow)
+            self._removeRowRange(firstRow, lastRow)
+            self.endRemoveRows()
+
+    def _removeRowRange(self, firstRow : int, lastRow : int):
+        """Remove rows [firstRow, lastRow] by shifting the rows after them up.
 
+        The freed rows at the end become spare rows for myAppendRow().
+        """
+        numRemove = lastRow - firstRow + 1
+        numRows = self._numRows
+        if lastRow + 1 < numRows:
+            dst = slice(firstRow, numRows - numRemove)
+            src = slice(lastRow + 1, numRows)
+            for colIdx in range(self._data.shape[1]):
+                self._data.iloc[dst, colIdx] = self._data.iloc[src, colIdx].to_numpy()
+            for displayColumn in self._displayCache.values():
+                displayColumn[dst] = displayColumn[src]
+            if self._faceColorArgb is not None:
+                self._faceColorArgb[dst] = self._faceColorArgb[src]
+                self._faceColorValid[dst] = self._faceColorValid[src]
+        self._numRows -= numRemove
+
+    @profileStage('model.mySetRow', numBytes=_dfArgBytes)
     def mySetRow(self, rowList: List[int], df: pd.DataFrame, ignoreAccept : bool = False):
         """Set a number of rows from a pandas dataframe.
-        
+
+        All rows are written with one indexed assignment and views are told
+        with one dataChanged per contiguous range of rows.
+
         Args:
             rowList (list of int): row indices to change
             df (pd.Dataframe): DataFrame with new values for each row in rowList.
-                Rows of dataframe correspond to enumeration of rowList list
+                The index of df has the row indices in rowList
             ignoreAccept (bool): If True then do not assign 'accept' column
                 This is used when user moves a point
                 Napari layer does not know about accept
         """
+        rowList = list(rowList)
+        if not rowList:
+            return True
 
-        # logger.info(f'  === (0) received rowList and df, df type is {type(df)}')
-        # logger.info(f'                       rowList:{rowList}')
-        # logger.info('  df')
-        # print(df)
-
-        # print('   before we do anything, self._data is:')
-        # print(self._data)
+        try:
+            dfRows = df.loc[rowList]
+        except (KeyError) as e:
+            logger.error(f'df does not have rows {rowList}: {e}')
+            return False
+
+        # accept column is owned by layer table and is not in napari layer
+        columns = [column for column in dfRows.columns
+                    if not (ignoreAccept and column == 'accept')]
+        unknownColumns = [column for column in columns
+                            if column not in self._data.columns]
+        if unknownColumns:
+            logger.warning(f'ignoring columns not in model: {unknownColumns}')
+            columns = [column for column in columns if column not in unknownColumns]
+        if not columns:
+            return True
+
+        oldDtypes = self._data.dtypes[columns]
+        try:
+            # aligns on row labels and column names
+            self._data.loc[rowList, columns] = dfRows[columns]
+        except (ValueError) as e:
+            logger.error(e)
+            logger.error(f'rowList: {rowList}')
+            return False
+
+        changedDtype = [column for column in columns
+                            if self._data.dtypes[column] != oldDtypes[column]]
+        for column in changedDtype:
+            # e.g. int column became float, all strings change
+            self._displayCache.pop(column, None)
+        self._updateDisplayCache(rowList, columns)
+
+        columnIndices = [self._data.columns.get_loc(column) for column in columns]
+        self._markDataChanged(rowList, min(columnIndices), max(columnIndices))
 
-        # print('          Mar 22, HERE IS WERE WE SET DATA AND IT DOES NOT GET UPDATED XXXXXXXXXXXXXX')
+        return True
 
-        for dfIdx, rowIdx in enumerate(rowList):
-            # on switching to v2, was giving error
-            # our df has row indices matching the changed rows (same as rowList)
-            
-            # ARRRGGGGG, 20230323, without copy this does not work !!!!!
-            #oneRow = df.loc[rowIdx].copy()
-            oneRow = df.loc[rowIdx]
-            
-            # print('(0.0) oneRow is type', type(oneRow), 'and had values of:')
-            # print(oneRow)
+    def _markDataChanged(self, rowList : List[int], firstColumn : int, lastColumn : int):
+        """Remember changed rows and columns, emit dataChanged on the next flush.
 
-            #IndexError: iloc cannot enlarge its target object
-            try:
-                # logger.info(f'  setting rowIdx:{rowIdx} to oneRow from df')
-                # print(f'      setting one row to new values oneRow is:')
-                # print(oneRow)
-                # print(f'=== (1) row {rowIdx} before set is:')
-                # print(self._data.loc[rowIdx])
+        With no interval (None), emit now.
+        """
+        if self._dataChangedInterval is None:
+            self._emitDataChanged(rowList, firstColumn, lastColumn)
+            return
 
-                #
-                # set
-                #
-                #oneRow['accept'] = 999
-                #self._data.loc[rowIdx] = oneRow
-
-                # accept column is owned by layer table and is not in lanapri layer
-
-                # oneRow is a pandas.core.series.Series
-                if ignoreAccept:
-                    _oneRowDict = oneRow.to_dict()
-                    for k,v in _oneRowDict.items():
-                        if k == 'accept':
-                            continue
-                        self._data.loc[rowIdx, k] = v
-                else:
-                    self._data.loc[rowIdx] = oneRow
-                
-                # print('  === (2) row after set is:')
-                # print(self._data.loc[rowIdx])
-
-                # print('  === (2.5) "accept" col after set self._data["accept"] is')
-                # print(self._data['accept'])
-                # print(self._data['x'])
-
-                # print('   self._data.columns is:')
-                # print(self._data.columns)
-
-                # print('  === (2) self._data after set is:')
-                # print(self._data)
-
-            except (ValueError) as e:
-                logger.error(e)
-                logger.error(f'rowIdx: {rowIdx}')
-                logger.error(f'oneRow: {oneRow}')
-
-            startIdx = self.index(rowIdx, 0)  # QModelIndex
-            stopIdx = self.index(rowIdx, self._data.shape[1]-1)  # QModelIndex
-            
-            #stopIdx = self.index(rowIdx+1, self._data.shape[1]-1)  # QModelIndex
-
-            #print('  startIdx:', startIdx.row(), startIdx.column())
-            #print('  stopIdx:', stopIdx.row(), stopIdx.column())
-            
-            # logger.info(f'  XXXXXXXX startIdx:{startIdx.row()} {startIdx.column()}')
-            # logger.info(f'  XXXXXXXX stopIdx:{stopIdx.row()} {stopIdx.column()}')
-
-            # does nothing
-            #self.dataChanged.emit(startIdx, stopIdx)
-            
-            # print('           -->> self.dataChanged.emit with:')
-            # print('            startIdx:', startIdx.row(), startIdx.column())
-            # print('            stopIdx:', stopIdx.row(), stopIdx.column())
-            #self.dataChanged.emit(startIdx, stopIdx, [QtCore.Qt.DisplayRole])
+        self._dirtyRows.append(np.asarray(rowList, dtype=np.int64))
+        if self._dirtyColumns is None:
+            self._dirtyColumns = (firstColumn, lastColumn)
+        else:
+            self._dirtyColumns = (min(firstColumn, self._dirtyColumns[0]),
+                                    max(lastColumn, self._dirtyColumns[1]))
+        if not self._dataChangedTimer.isActive():
+            self._dataChangedTimer.start()
+
+    def _emitDataChanged(self, rowList, firstColumn : int, lastColumn : int):
+        for firstRow, lastRow in contiguousRanges(rowList):
+            startIdx = self.index(firstRow, firstColumn)  # QModelIndex
+            stopIdx = self.index(lastRow, lastColumn)  # QModelIndex
             self.dataChanged.emit(startIdx, stopIdx)
 
-            # logger.info('(4) at end')
-            # print(self._data)
-            # print(self._data['accept'])
+    def myFlushDataChanged(self):
+        """Emit dataChanged for all rows changed since the last flush.
 
-        return True
+        Called by a single shot timer after mySetRow(). Also called before
+        rows are inserted or removed so pending row indices are still valid.
+        """
+        self._dataChangedTimer.stop()
+        if not self._dirtyRows:
+            return
+
+        rows = np.concatenate(self._dirtyRows)
+        firstColumn, lastColumn = self._dirtyColumns
+        self._dirtyRows = []
+        self._dirtyColumns = None
+
+        rows = rows[rows < self._numRows]
+        tracer.debug('flushing %s changed rows', len(rows))
+        self._emitDataChanged(rows, firstColumn, lastColumn)
+        self._numDataChangedFlushed += 1
 
     def old_myGetValue(self, rowIdx, colStr):
         val = None
@@ -424,5 +650,547 @@ class pandasModel(QtCore.QAbstractTableModel):
             val = self._data.loc[rowIdx, colStr]
         return val
 
-    def myGetData(self):
-        return self._data
\ No newline at end of file
+    def myGetRows(self, rowList : List[int]) -> pd.DataFrame:
+        """Get a copy of some rows of the model data.
+
+        Args:
+            rowList (list of int): row indices, the index of the returned frame
+        """
+        return self.myGetData().loc[list(rowList)].copy()
+
+    def myGetColumns(self) -> pd.Index:
+        """Get the column names of the model.
+        """
+        return self._data.columns
+
+    def myGetData(self) -> pd.DataFrame:
+        """Get the model data, without spare rows.
+        """
+        if self._numRows == len(self._data):
+            return self._data
+        return self._data.iloc[:self._numRows]
+
+    def myGetQueryFrame(self) -> pd.DataFrame:
+        """Get the rows a row filter (see queryRowMask) is evaluated on.
+        """
+        return self.myGetData()
+
+    def mySortKeys(self, colIdx : int) -> pd.Series:
+        """Get the typed values sortProxyModel sorts a column by, one per row.
+
+        Numbers sort as numbers, not as their display strings.
+
+        Args:
+            colIdx (int): Column index into the model.
+        """
+        return self._data.iloc[:self._numRows, colIdx]
+
+class virtualLayerModel(pandasModel):
+    """Data model that reads rows straight from a layer, one chunk at a time.
+
+    Nothing is copied when the model is created. When a view asks for a row,
+    its chunk of rows is fetched with myLayer.getDataFrame(rowList=...)
+    and at most maxChunks chunks are kept (least recently used are dropped).
+    This keeps memory constant for layers with millions of items.
+
+    The layer is the data, edits with mySetRow() are written to layer features.
+    """
+
+    def __init__(self, myLayer, chunkSize : int = 512, maxChunks : int = 64,
+                    dataChangedInterval : int = 0):
+        """
+        Args:
+            myLayer (mmLayer): layer to display
+            chunkSize (int): number of rows fetched from the layer at once
+            maxChunks (int): maximum number of chunks to keep
+            dataChangedInterval (int): see pandasModel
+        """
+        self._myLayer = myLayer
+        self._chunkSize = chunkSize
+        self._maxChunks = maxChunks
+
+        self._chunks = OrderedDict()
+        # chunk index to dict of 'display' (2D np.ndarray of str),
+        # 'argb' and 'valid' (see hexToArgb)
+
+        numRows = myLayer.numItems()
+        firstChunk = myLayer.getDataFrame(rowList=range(min(chunkSize, numRows)))
+
+        # self._data is an empty frame that holds our columns
+        super().__init__(firstChunk.iloc[0:0], dataChangedInterval=dataChangedInterval)
+        self._numRows = numRows
+
+    def _getChunk(self, row : int) -> dict:
+        chunkIdx = row // self._chunkSize
+        chunk = self._chunks.get(chunkIdx)
+        if chunk is not None:
+            self._chunks.move_to_end(chunkIdx)
+            return chunk
+
+        firstRow = chunkIdx * self._chunkSize
+        stopRow = min(firstRow + self._chunkSize, self._numRows)
+        df = self._myLayer.getDataFrame(rowList=range(firstRow, stopRow))
+        df = df.reindex(columns=self._data.columns)
+
+        chunk = {'display': df.astype(str).to_numpy(dtype=object),
+                    'values': df.to_numpy(dtype=object)}
+        if 'Face Color' in df.columns:
+            chunk['argb'], chunk['valid'] = hexToArgb(df['Face Color'].to_numpy())
+
+        self._chunks[chunkIdx] = chunk
+        if len(self._chunks) > self._maxChunks:
+            self._chunks.popitem(last=False)
+        return chunk
+
+    def _dropChunks(self, firstRow : int, lastRow : int = None):
+        """Drop fetched chunks that overlap rows [firstRow, lastRow].
+
+        Args:
+            lastRow: None for all rows after firstRow
+        """
+        firstChunk = firstRow // self._chunkSize
+        lastChunk = None if lastRow is None else lastRow // self._chunkSize
+        for chunkIdx in list(self._chunks.keys()):
+            if chunkIdx >= firstChunk and (lastChunk is None or chunkIdx <= lastChunk):
+                del self._chunks[chunkIdx]
+
+    def _getDisplayString(self, row : int, colIdx : int) -> str:
+        chunk = self._getChunk(row)
+        return chunk['display'][row % self._chunkSize, colIdx]
+
+    def _getSortValue(self, row : int, colIdx : int):
+        chunk = self._getChunk(row)
+        value = chunk['values'][row % self._chunkSize, colIdx]
+        return value.item() if isinstance(value, np.generic) else value
+
+    def _getFaceColorArgb(self, row : int):
+        chunk = self._getChunk(row)
+        if 'argb' not in chunk or not chunk['valid'][row % self._chunkSize]:
+            return None
+        return int(chunk['argb'][row % self._chunkSize])
+
+    def _updateDisplayCache(self, rowList : List[int], columns = None):
+        for firstRow, lastRow in contiguousRanges(rowList):
+            self._dropChunks(firstRow, lastRow)
+
+    def _clearDisplayCache(self):
+        self._chunks = OrderedDict()
+
+    def myGetRows(self, rowList : List[int]) -> pd.DataFrame:
+        return self._myLayer.getDataFrame(rowList=rowList)
+
+    def myGetData(self) -> pd.DataFrame:
+        """Get all rows from the layer.
+
+        Note:
+            This builds the full DataFrame, avoid for large layers.
+        """
+        logger.warning(f'building full DataFrame for {self._numRows} rows')
+        return self._myLayer.getDataFrame(getFull=True)
+
+    def myGetQueryFrame(self) -> pd.DataFrame:
+        """Get the layer features (no copy) to filter rows.
+
+        'Symbol' and 'Face Color' are not layer features and can not be queried.
+        """
+        return self._myLayer._layer.features
+
+    def mySortKeys(self, colIdx : int) -> pd.Series:
+        """Get the typed values of one column for all rows, from the layer.
+
+        Note:
+            This builds the full DataFrame, sorting a virtual model is not free.
+        """
+        return self.myGetData().iloc[:, colIdx]
+
+    @profileStage('model.mySetRow', numBytes=_dfArgBytes)
+    def mySetRow(self, rowList: List[int], df: pd.DataFrame, ignoreAccept : bool = False):
+        """Set rows by writing layer features and dropping fetched chunks.
+
+        See pandasModel.mySetRow()
+
+        Returns:
+            False if df changes a column that is not a layer feature,
+                see mmLayer.setFeatureRows().
+        """
+        rowList = list(rowList)
+        if not rowList:
+            return True
+
+        if ignoreAccept and 'accept' in df.columns:
+            df = df.drop(columns='accept')
+        if not self._myLayer.setFeatureRows(rowList, df):
+            return False
+
+        for firstRow, lastRow in contiguousRanges(rowList):
+            self._dropChunks(firstRow, lastRow)
+        self._markDataChanged(rowList, 0, self.columnCount() - 1)
+        return True
+
+    @profileStage('model.myAppendRow', numBytes=_appendBytes)
+    def myAppendRow(self, dfRow : pd.DataFrame = None):
+        """Layer already has the new rows (at the end), tell the view.
+        """
+        if dfRow is None or dfRow.empty:
+            return
+
+        self.myFlushDataChanged()
+
+        if self._numRows == 0:
+            # our columns came from an empty layer, get them again
+            self.beginResetModel()
+            self._numRows = self._myLayer.numItems()
+            self._data = self._myLayer.getDataFrame(rowList=range(min(self._chunkSize, self._numRows))).iloc[0:0]
+            self._clearDisplayCache()
+            self.endResetModel()
+            return
+
+        firstRow = self._numRows
+        lastRow = firstRow + len(dfRow) - 1
+        self.beginInsertRows(QtCore.QModelIndex(), firstRow, lastRow)
+        self._dropChunks(firstRow)
+        self._numRows += len(dfRow)
+        self.endInsertRows()
+
+    @profileStage('model.myDeleteRows')
+    def myDeleteRows(self, rows: list):
+        """Layer already removed the rows, tell the view.
+
+        See pandasModel.myDeleteRows()
+        """
+        rowRanges = contiguousRanges(rows)
+        if not rowRanges:
+            return
+
+        self.myFlushDataChanged()
+
+        # rows after the first deleted row have moved
+        self._dropChunks(rowRanges[0][0])
+
+        if len(rowRanges) > self._maxRemoveRanges:
+            self.beginResetModel()
+            self._numRows = self._myLayer.numItems()
+            self.endResetModel()
+            return
+
+        for firstRow, lastRow in reversed(rowRanges):
+            self.beginRemoveRows(QtCore.QModelIndex(), firstRow, lastRow)
+            self._numRows -= lastRow - firstRow + 1
+            self.endRemoveRows()
+
+class sortProxyModel(QtCore.QAbstractProxyModel):
+    """Sort and filter proxy that keeps its rows as a NumPy array.
+
+    Replaces QSortFilterProxyModel, which maps and compares one row at a time.
+    Sorting is one stable argsort of the typed sourceModel().mySortKeys(column)
+    (the same values as data(index, sortRole)), filtering is one bool mask
+    per source row (see setRowFilter) and
+    proxy <-> source rows are mapped in bulk with mapRowsToSource()
+    and mapRowsFromSource().
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self._proxyToSource = np.zeros(0, dtype=np.int64)
+        # source row of each proxy row
+        self._sourceToProxy = np.zeros(0, dtype=np.int64)
+        # proxy row of each source row, -1 if the row is not in the proxy
+
+        self._sortColumn = -1
+        self._sortOrder = QtCore.Qt.AscendingOrder
+        self._sortedRows = None
+        # all source rows in sort order, None to sort again
+
+        self._rowFilter = None
+        # func(sourceModel) -> np.ndarray of bool, None to show all rows
+        self._rowMask = None
+        # last result of self._rowFilter, one bool per source row
+
+        self._maxRemoveRanges = 32
+        # a source remove that is more proxy ranges than this does a reset
+
+        self._sourceConnections = []
+
+    def setSourceModel(self, sourceModel : pandasModel):
+        self.beginResetModel()
+        oldModel = self.sourceModel()
+        if oldModel is not None:
+            for signal, slot in self._sourceConnections:
+                signal.disconnect(slot)
+        self._sourceConnections = []
+
+        super().setSourceModel(sourceModel)
+
+        if sourceModel is not None:
+            self._sourceConnections = [
+                (sourceModel.dataChanged, self._onSourceDataChanged),
+                (sourceModel.headerDataChanged, self.headerDataChanged),
+                (sourceModel.rowsAboutToBeInserted, self._onSourceRowsAboutToBeInserted),
+                (sourceModel.rowsInserted, self._onSourceRowsInserted),
+                (sourceModel.rowsRemoved, self._onSourceRowsRemoved),
+                (sourceModel.modelAboutToBeReset, self.beginResetModel),
+                (sourceModel.modelReset, self._onSourceModelReset),
+                (sourceModel.layoutAboutToBeChanged, self.layoutAboutToBeChanged),
+                (sourceModel.layoutChanged, self._onSourceLayoutChanged),
+            ]
+            for signal, slot in self._sourceConnections:
+                signal.connect(slot)
+
+        self._sortedRows = None
+        self._updateRowMask()
+        self._proxyToSource = self._shownSourceRows()
+        self._updateSourceToProxy()
+        self.endResetModel()
+
+    def sortColumn(self) -> int:
+        return self._sortColumn
+
+    def sortOrder(self):
+        return self._sortOrder
+
+    def _numSourceRows(self) -> int:
+        sourceModel = self.sourceModel()
+        return 0 if sourceModel is None else sourceModel.rowCount()
+
+    def _shownSourceRows(self) -> np.ndarray:
+        """Source rows in sorted order that pass the row filter.
+        """
+        sourceRows = self._sortedSourceRows()
+        if self._rowMask is not None:
+            sourceRows = sourceRows[self._rowMask[sourceRows]]
+        return sourceRows
+
+    def _sortedSourceRows(self) -> np.ndarray:
+        """All source rows in sorted order, sorted once and kept.
+        """
+        if self._sortedRows is None or len(self._sortedRows) != self._numSourceRows():
+            self._sortedRows = self._sortSourceRows()
+        return self._sortedRows
+
+    def _sortSourceRows(self) -> np.ndarray:
+        """Source rows in sorted order, model order if not sorted.
+        """
+        numRows = self._numSourceRows()
+        if self._sortColumn < 0 or self._sortColumn >= self.columnCount():
+            return np.arange(numRows, dtype=np.int64)
+
+        keys = pd.Series(self.sourceModel().mySortKeys(self._sortColumn)).reset_index(drop=True)
+        ascending = self._sortOrder == QtCore.Qt.AscendingOrder
+        try:
+            # stable, equal keys stay in model order, missing values go last
+            sortedKeys = keys.sort_values(ascending=ascending, kind='stable', na_position='last')
+        except (TypeError) as e:
+            # mixed types, e.g. str and float, sort as strings
+            logger.warning(f'sorting column {self._sortColumn} as strings: {e}')
+            sortedKeys = keys.astype(str).sort_values(ascending=ascending, kind='stable')
+        return sortedKeys.index.to_numpy(dtype=np.int64)
+
+    def _updateSourceToProxy(self):
+        """Invert self._proxyToSource in one pass.
+        """
+        self._sourceToProxy = np.full(self._numSourceRows(), -1, dtype=np.int64)
+        self._sourceToProxy[self._proxyToSource] = np.arange(len(self._proxyToSource))
+
+    @profileStage('proxy.sort')
+    def sort(self, column : int, order=QtCore.Qt.AscendingOrder):
+        """Sort by one column, column -1 is model order.
+        """
+        self._sortColumn = column
+        self._sortOrder = order
+        self._sortedRows = None
+        self._relayout()
+
+    def _evalRowMask(self, rowFilter):
+        if rowFilter is None or self.sourceModel() is None:
+            return None
+        rowMask = np.asarray(rowFilter(self.sourceModel()), dtype=bool)
+        if rowMask.shape != (self._numSourceRows(),):
+            raise ValueError(f'row filter gave {rowMask.shape} values for {self._numSourceRows()} rows')
+        return rowMask
+
+    def _updateRowMask(self):
+        """Evaluate the row filter again after the source changed.
+        """
+        try:
+            self._rowMask = self._evalRowMask(self._rowFilter)
+        except (SyntaxError, NameError, KeyError, TypeError, ValueError) as e:
+            # e.g. a queried column is gone
+            logger.error(f'showing all rows, row filter failed: {e}')
+            self._rowMask = None
+
+    @profileStage('proxy.setRowFilter')
+    def setRowFilter(self, rowFilter):
+        """Show only the source rows that pass a filter.
+
+        Args:
+            rowFilter: func(sourceModel) -> np.ndarray of bool, one per source row.
+                It is evaluated again when source data changes.
+                None to show all rows.
+
+        Raises:
+            What rowFilter raises, the current filter is kept.
+        """
+        rowMask = self._evalRowMask(rowFilter)
+        self._rowFilter = rowFilter
+        self._rowMask = rowMask
+        self._relayout()
+
+    def _relayout(self):
+        """Sort and filter again, keep persistent indexes (e.g. the selection).
+
+        Persistent indexes of rows that are filtered out become invalid.
+        """
+        self.layoutAboutToBeChanged.emit()
+        oldPersistent = self.persistentIndexList()
+        sourceRows = self.mapRowsToSource([index.row() for index in oldPersistent])
+
+        self._proxyToSource = self._shownSourceRows()
+        self._updateSourceToProxy()
+
+        newRows = self.mapRowsFromSource(sourceRows)
+        newPersistent = [self.index(int(row), index.column())
+                            for row, index in zip(newRows, oldPersistent)]
+        self.changePersistentIndexList(oldPersistent, newPersistent)
+        self.layoutChanged.emit()
+
+    def mapRowsToSource(self, proxyRows) -> np.ndarray:
+        """Map proxy (visual) rows to source rows with one fancy index.
+        """
+        proxyRows = np.asarray(proxyRows, dtype=np.int64)
+        return self._proxyToSource[proxyRows]
+
+    def mapRowsFromSource(self, sourceRows) -> np.ndarray:
+        """Map source rows to proxy (visual) rows, -1 if not in the proxy.
+        """
+        sourceRows = np.asarray(sourceRows, dtype=np.int64)
+        proxyRows = np.full(len(sourceRows), -1, dtype=np.int64)
+        inModel = (sourceRows >= 0) & (sourceRows < len(self._sourceToProxy))
+        proxyRows[inModel] = self._sourceToProxy[sourceRows[inModel]]
+        return proxyRows
+
+    def mapToSource(self, proxyIndex):
+        if not proxyIndex.isValid() or self.sourceModel() is None:
+            return QtCore.QModelIndex()
+        sourceRow = int(self._proxyToSource[proxyIndex.row()])
+        return self.sourceModel().index(sourceRow, proxyIndex.column())
+
+    def mapFromSource(self, sourceIndex):
+        if not sourceIndex.isValid():
+            return QtCore.QModelIndex()
+        proxyRow = int(self._sourceToProxy[sourceIndex.row()])
+        if proxyRow < 0:
+            return QtCore.QModelIndex()
+        return self.index(proxyRow, sourceIndex.column())
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        if parent.isValid() or not (0 <= row < self.rowCount()
+                                    and 0 <= column < self.columnCount()):
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=None):
+        return QtCore.QModelIndex()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._proxyToSource)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid() or self.sourceModel() is None:
+            return 0
+        return self.sourceModel().columnCount()
+
+    def _onSourceDataChanged(self, topLeft, bottomRight, roles=None):
+        firstColumn = topLeft.column()
+        lastColumn = bottomRight.column()
+        needsLayout = False
+        if firstColumn <= self._sortColumn <= lastColumn:
+            # sort values changed, keep the table sorted
+            self._sortedRows = None
+            needsLayout = True
+        if self._rowFilter is not None:
+            # rows may now pass or fail the filter
+            self._updateRowMask()
+            needsLayout = True
+        if needsLayout:
+            self._relayout()
+            return
+
+        proxyRows = self._sourceToProxy[topLeft.row():bottomRight.row() + 1]
+        proxyRows = proxyRows[proxyRows >= 0]
+        for firstRow, lastRow in contiguousRanges(proxyRows):
+            self.dataChanged.emit(self.index(firstRow, firstColumn),
+                                    self.index(lastRow, lastColumn))
+
+    def _onSourceRowsAboutToBeInserted(self, parent, first, last):
+        # new rows go at the end, _relayout() sorts and filters them
+        numProxyRows = self.rowCount()
+        self.beginInsertRows(QtCore.QModelIndex(), numProxyRows,
+                                numProxyRows + last - first)
+
+    def _onSourceRowsInserted(self, parent, first, last):
+        numNewRows = last - first + 1
+        proxyToSource = self._proxyToSource.copy()
+        proxyToSource[proxyToSource >= first] += numNewRows
+        self._proxyToSource = np.concatenate(
+                (proxyToSource, np.arange(first, last + 1, dtype=np.int64)))
+        self._updateSourceToProxy()
+        self.endInsertRows()
+
+        self._sortedRows = None
+        if self._sortColumn >= 0 or self._rowFilter is not None:
+            self._updateRowMask()
+            self._relayout()
+
+    def _onSourceRowsRemoved(self, parent, first, last):
+        """Remove proxy rows of source rows [first, last].
+
+        Source rows are already gone, self._proxyToSource is shifted first
+        so remaining proxy rows map to the right source rows.
+        """
+        numRemoved = last - first + 1
+
+        # remaining rows keep their sort order and filter result
+        if self._sortedRows is not None:
+            sortedRows = self._sortedRows[(self._sortedRows < first) | (self._sortedRows > last)]
+            sortedRows[sortedRows > last] -= numRemoved
+            self._sortedRows = sortedRows
+        if self._rowMask is not None:
+            self._rowMask = np.delete(self._rowMask, np.s_[first:last + 1])
+
+        removed = (self._proxyToSource >= first) & (self._proxyToSource <= last)
+        proxyRanges = contiguousRanges(np.nonzero(removed)[0])
+
+        if len(proxyRanges) > self._maxRemoveRanges:
+            # scattered in a sorted table, one reset is cheaper
+            self.beginResetModel()
+            self._proxyToSource = self._shownSourceRows()
+            self._updateSourceToProxy()
+            self.endResetModel()
+            return
+
+        proxyToSource = self._proxyToSource.copy()
+        proxyToSource[proxyToSource > last] -= numRemoved
+        self._proxyToSource = proxyToSource
+        for firstRow, lastRow in reversed(proxyRanges):
+            self.beginRemoveRows(QtCore.QModelIndex(), firstRow, lastRow)
+            self._proxyToSource = np.delete(self._proxyToSource,
+                                            np.s_[firstRow:lastRow + 1])
+            self.endRemoveRows()
+        self._updateSourceToProxy()
+
+    def _onSourceModelReset(self):
+        self._sortedRows = None
+        self._updateRowMask()
+        self._proxyToSource = self._shownSourceRows()
+        self._updateSourceToProxy()
+        self.endResetModel()
+
+    def _onSourceLayoutChanged(self):
+        self._sortedRows = None
+        self._updateRowMask()
+        self._proxyToSource = self._shownSourceRows()
+        self._updateSourceToProxy()
+        self.layoutChanged.emit()
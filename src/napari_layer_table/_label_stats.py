@@ -0,0 +1,279 @@
+"""
+Per label statistics (area, centroid, bounding box) for a napari labels layer.
+
+Stats are kept in arrays indexed by label id so a single label
+is a lookup and all labels are a slice.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from napari_layer_table._my_logger import logger
+from napari_layer_table._utils import coordinateColumns
+
+_noBboxMin = np.iinfo(np.int64).max
+_noBboxMax = -1
+
+class labelStats():
+    def __init__(self, ndim : int):
+        """Statistics of each label in a label image.
+
+        Area and coordinate sums are additive so they can be built one slab
+        at a time and patched with the pixels changed by a paint or fill.
+
+        Args:
+            ndim: number of dimensions of the label image
+        """
+        self._ndim = ndim
+        self.clear()
+
+    def clear(self):
+        """Remove all labels.
+        """
+        ndim = self._ndim
+
+        self._count = np.zeros(0, dtype=np.int64)
+        # number of pixels in each label (area)
+
+        self._coordSum = np.zeros((0, ndim), dtype=np.float64)
+        # sum of pixel coordinates in each label, centroid is _coordSum / _count
+
+        self._bboxMin = np.zeros((0, ndim), dtype=np.int64)
+        self._bboxMax = np.zeros((0, ndim), dtype=np.int64)
+        # bounding box of each label, max is exclusive (like regionprops)
+
+        self._dirtyBbox = set()
+        self._dirtyData = None
+        # labels that lost pixels in a paint, their bbox is recomputed from
+        # _dirtyData when next needed (napari may emit paint before writing data)
+
+    @property
+    def ndim(self):
+        return self._ndim
+
+    def _grow(self, maxLabel : int):
+        """Make room for labels up to and including maxLabel.
+        """
+        oldSize = len(self._count)
+        newSize = maxLabel + 1
+        if newSize <= oldSize:
+            return
+        # grow by at least half to limit copies when painting new labels
+        newSize = max(newSize, oldSize + oldSize // 2)
+        addSize = newSize - oldSize
+        ndim = self._ndim
+        self._count = np.concatenate([self._count, np.zeros(addSize, dtype=np.int64)])
+        self._coordSum = np.concatenate([self._coordSum, np.zeros((addSize, ndim))])
+        self._bboxMin = np.concatenate([self._bboxMin,
+                                np.full((addSize, ndim), _noBboxMin, dtype=np.int64)])
+        self._bboxMax = np.concatenate([self._bboxMax,
+                                np.full((addSize, ndim), _noBboxMax, dtype=np.int64)])
+
+    def _addPixels(self, labels : np.ndarray, coords : List[np.ndarray], sign : int = 1):
+        """Add (or remove with sign=-1) pixels to area and coordinate sums.
+
+        Args:
+            labels: 1d array with label of each pixel
+            coords: list of ndim 1d arrays, coordinate of each pixel
+        """
+        numLabels = len(self._count)
+        self._count += sign * np.bincount(labels, minlength=numLabels)
+        for axis, axisCoords in enumerate(coords):
+            self._coordSum[:, axis] += sign * np.bincount(labels,
+                                                weights=axisCoords,
+                                                minlength=numLabels)
+
+    def build(self, data, slabSize : int = 16):
+        """Compute stats of all labels, one slab along axis 0 at a time.
+
+        Args:
+            data: label image, numpy or array like (e.g. dask/zarr)
+            slabSize: number of planes along axis 0 in each slab
+        """
+        for _ in self.iterBuild(data, slabSize):
+            pass
+
+    def iterBuild(self, data, slabSize : int = 16):
+        """Compute stats of all labels, yield labels as they are finished.
+
+        A label is finished once a slab without it follows the slabs with it.
+
+        Args:
+            data: label image, numpy or array like (e.g. dask/zarr)
+            slabSize: number of planes along axis 0 in each slab
+
+        Yields:
+            (np.ndarray, float) labels finished by this slab
+                and fraction of data done
+        """
+        self.clear()
+        numPlanes = data.shape[0]
+        isYielded = np.zeros(0, dtype=bool)
+        for start in range(0, numPlanes, slabSize):
+            self.addSlab(data[start:start+slabSize], start)
+
+            isYielded = np.concatenate([isYielded,
+                                np.zeros(len(self._count) - len(isYielded), dtype=bool)])
+            isFinished = (self._count > 0) & ~isYielded
+            isFinished[:1] = False  # label 0 is background
+            stop = min(start + slabSize, numPlanes)
+            if stop < numPlanes:
+                # labels in this slab may continue in the next one
+                isFinished &= self._bboxMax[:, 0] <= start
+            isYielded |= isFinished
+            yield np.flatnonzero(isFinished), stop / numPlanes
+
+    def addSlab(self, slab, offset : int = 0):
+        """Add the labels of one slab to the stats.
+
+        Pixels are grouped by label with one sort, then area, coordinate sums
+        and bbox of all labels come from reduceat() over the groups.
+        These are numpy calls that release the GIL, other threads keep running.
+
+        Args:
+            slab: part of the label image, all of axis 1.. and a range of axis 0
+            offset: index of first plane of slab along axis 0
+        """
+        slab = np.asarray(slab)
+
+        # label 0 is background, we do not keep its stats
+        pixels = np.flatnonzero(slab)
+        if pixels.size == 0:
+            return
+        labels = slab.ravel()[pixels]
+        order = np.argsort(labels, kind='stable')
+        pixels = pixels[order]
+        labels = labels[order]
+
+        # first pixel of each label
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(labels)) + 1])
+        slabLabels = labels[starts].astype(np.int64)
+        self._grow(int(slabLabels[-1]))
+
+        self._count[slabLabels] += np.diff(np.append(starts, len(labels)))
+        coords = np.unravel_index(pixels, slab.shape)
+        for axis, axisCoords in enumerate(coords):
+            if axis == 0:
+                axisCoords = axisCoords + offset
+            self._coordSum[slabLabels, axis] += np.add.reduceat(axisCoords, starts)
+            self._bboxMin[slabLabels, axis] = np.minimum(self._bboxMin[slabLabels, axis],
+                                        np.minimum.reduceat(axisCoords, starts))
+            self._bboxMax[slabLabels, axis] = np.maximum(self._bboxMax[slabLabels, axis],
+                                        np.maximum.reduceat(axisCoords, starts) + 1)
+
+    def updateFromPaint(self, data, historyItem : List[Tuple]) -> List[int]:
+        """Update stats for labels touched by a paint or fill.
+
+        Args:
+            data: label image, used later to shrink bbox of labels that lost pixels
+            historyItem: napari labels paint event value,
+                a list of (indices, old values, new value) atoms
+
+        Returns:
+            Sorted list of labels that changed
+        """
+        touchedLabels = set()
+        shrunkLabels = set()
+        for indices, oldValues, newValue in historyItem:
+            if len(indices) == 0 or len(indices[0]) == 0:
+                continue
+            coords = [np.asarray(axisIndices, dtype=np.float64) for axisIndices in indices]
+            numPixels = len(coords[0])
+            oldValues = np.asarray(oldValues, dtype=np.int64).ravel()
+            newValues = np.broadcast_to(np.asarray(newValue, dtype=np.int64), (numPixels,))
+
+            self._grow(int(max(oldValues.max(), newValues.max())))
+            self._addPixels(oldValues, coords, sign=-1)
+            self._addPixels(newValues, coords, sign=1)
+
+            # labels that gained pixels, grow bbox
+            for label in np.unique(newValues):
+                if label == 0:
+                    continue
+                labelMask = newValues == label
+                labelMin = [int(axisIndices[labelMask].min()) for axisIndices in indices]
+                labelMax = [int(axisIndices[labelMask].max()) + 1 for axisIndices in indices]
+                self._bboxMin[label] = np.minimum(self._bboxMin[label], labelMin)
+                self._bboxMax[label] = np.maximum(self._bboxMax[label], labelMax)
+                touchedLabels.add(int(label))
+
+            # labels that lost pixels, bbox may shrink
+            oldLabels = set(np.unique(oldValues).tolist())
+            touchedLabels |= oldLabels
+            shrunkLabels |= oldLabels
+
+        shrunkLabels.discard(0)
+        self._dirtyBbox |= shrunkLabels
+        self._dirtyData = data
+
+        touchedLabels.discard(0)
+        return sorted(touchedLabels)
+
+    def _updateDirtyBbox(self):
+        """Recompute bbox of labels that lost pixels since last call.
+        """
+        for label in self._dirtyBbox:
+            self._updateBbox(self._dirtyData, label)
+        self._dirtyBbox = set()
+        self._dirtyData = None
+
+    def _updateBbox(self, data, label : int):
+        """Recompute bbox of one label from data, inside its current bbox.
+        """
+        if self._count[label] <= 0:
+            self._bboxMin[label] = _noBboxMin
+            self._bboxMax[label] = _noBboxMax
+            return
+        slices = tuple(slice(int(start), int(stop))
+                    for start, stop in zip(self._bboxMin[label], self._bboxMax[label]))
+        labelMask = np.asarray(data[slices]) == label
+        for axis in range(self._ndim):
+            otherAxes = tuple(oneAxis for oneAxis in range(self._ndim) if oneAxis != axis)
+            present = np.flatnonzero(labelMask.any(axis=otherAxes))
+            if present.size == 0:
+                logger.warning(f'label {label} has area {self._count[label]} but no pixels in data')
+                return
+            self._bboxMax[label, axis] = self._bboxMin[label, axis] + present[-1] + 1
+            self._bboxMin[label, axis] += present[0]
+
+    def labels(self) -> np.ndarray:
+        """Get sorted labels that have at least one pixel (not including 0).
+        """
+        return np.flatnonzero(self._count[1:] > 0) + 1
+
+    def columns(self) -> List[str]:
+        """Get column names of getDataFrame().
+        """
+        centroidColumns = coordinateColumns(self._ndim)
+        bboxColumns = [f'bbox-{idx}' for idx in range(2 * self._ndim)]
+        return ['area'] + centroidColumns + bboxColumns
+
+    def getDataFrame(self, labelList : List[int]) -> pd.DataFrame:
+        """Get stats of labels, one row per label.
+
+        Labels without pixels have area 0 and nan centroid and bbox.
+
+        Args:
+            labelList: labels to get, becomes the index of the returned DataFrame
+        """
+        self._updateDirtyBbox()
+
+        labelArray = np.asarray(labelList, dtype=np.int64).ravel()
+        inRange = (labelArray >= 0) & (labelArray < len(self._count))
+        if not inRange.all():
+            logger.warning(f'labels out of range: {labelArray[~inRange]}')
+        safeLabels = np.where(inRange, labelArray, 0)
+
+        count = np.where(inRange, self._count[safeLabels], 0)
+        hasPixels = count > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            centroid = self._coordSum[safeLabels] / count[:, np.newaxis]
+        centroid[~hasPixels] = np.nan
+        bbox = np.concatenate([self._bboxMin[safeLabels], self._bboxMax[safeLabels]],
+                                axis=1).astype(np.float64)
+        bbox[~hasPixels] = np.nan
+
+        values = np.column_stack([count, centroid, bbox])
+        return pd.DataFrame(values, index=labelList, columns=self.columns())
@@ -1,18 +1,17 @@
 """
 """
 from copy import copy, deepcopy
-import time
+import inspect
+import re
 
-from typing import Union #Callable, TypeVar
-
-from pprint import pprint
+from typing import List, Union #Callable, TypeVar
 
 import numpy as np
 import pandas as pd
 
+import napari
 from napari.qt import get_app  # for flash on selection, see snapToItem()
 
-from skimage.measure import regionprops, regionprops_table  # for labeled layer
 
 # turn off pandas warning
 # no longer needed, in general all pandas 'cells' have to be scalar
@@ -33,12 +32,17 @@ from qtpy import QtCore
 # oct 17, was this
 from napari.layers.utils.layer_utils import _features_to_properties  # , _FeatureTable
 
-from napari.utils.colormaps.standardize_color import (
-    rgb_to_hex,
-)
+from napari_layer_table._my_logger import logger, getTracer
+from napari_layer_table._utils import rgbaToHex, packVertices, segmentMeans, coordinateColumns
+from napari_layer_table._label_stats import labelStats
+from napari_layer_table._undo import mmUndo, selectionSnapshot
+from napari_layer_table._spatial_index import spatialIndex
+from napari_layer_table._profiler import profileStage, numBytesOf
+
+tracer = getTracer('layer')
 
-from napari_layer_table._my_logger import logger
-from napari_layer_table._undo import mmUndo
+def _resultBytes(result, *args, **kwargs):
+    return numBytesOf(result)
 
 #
 # see here for searching unicode symbols
@@ -63,6 +67,51 @@ SYMBOL_ALIAS = {
     }
 
 # TODO (cudmore) put this in a _utils.py file (used by miltiple files)
+def _napariVersion() -> tuple:
+    return tuple(int(part) for part in re.findall(r'\d+', napari.__version__)[:3])
+
+_dataEventHasAction = _napariVersion() >= (0, 4, 19)
+# napari layers emit events.data with action 'changing'/'removing' before an edit,
+# older napari can not tell us, we copy each selection when it is made
+
+_shapesMeshShift = (0, 4, 17) <= _napariVersion() < (0, 5, 0)
+# shapesLayer._shiftItems() writes ShapeList mesh arrays as laid out in these
+# napari versions, other versions shift each shape with ShapeList.shift()
+
+def _getSliceIndices(layer):
+    """Get the current slice of a layer, None if this napari does not have it.
+    """
+    try:
+        return layer._slice_indices
+    except (AttributeError):
+        return None
+
+def _callbackKeywords(callback, names : List[str]) -> set:
+    """Get which of names a callback takes as keyword arguments.
+
+    Lets older callbacks keep their signature when we pass more.
+    """
+    if callback is None:
+        return set()
+    try:
+        parameters = inspect.signature(callback).parameters.values()
+    except (TypeError, ValueError):
+        # e.g. some builtins do not have a signature
+        return set()
+    if any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters):
+        return set(names)
+    return {parameter.name for parameter in parameters if parameter.name in names}
+
+def _getDimsDisplayed(layer) -> List[int]:
+    """Get the layer axes displayed in the viewer.
+
+    napari >= 0.4.18 has them in layer._slice_input, older napari in layer._dims_displayed.
+    """
+    try:
+        return list(layer._slice_input.displayed)
+    except (AttributeError):
+        return list(layer._dims_displayed)
+
 def setsAreEqual(a, b):
     """Convenience function. Return true if sets (a, b) are equal.
     """
@@ -89,6 +138,9 @@ class mmLayer(QtCore.QObject):
         """
         Args:
             onAddCallback (func) params(set, pd.DataFrame) return Union[None, dict]
+                If it takes keywords 'coords' and/or 'myLayer' they are the data
+                coordinates of the add and this layer, use myLayer.findItemsInRadius()
+                or myLayer.findNearestItem() to check for nearby items.
         """
         super().__init__()
         
@@ -97,6 +149,7 @@ class mmLayer(QtCore.QObject):
 
         self._shift_click_for_new = False
         self._onAddCallback = onAddCallback  # callback to accept/reject/modify add
+        self._onAddKeywords = _callbackKeywords(onAddCallback, ['coords', 'myLayer'])
         self.newOnShiftClick(onAddCallback is not None)
         
         # not sure how to use bind_key
@@ -116,6 +169,10 @@ class mmLayer(QtCore.QObject):
 
         self._layerSelectionCopy = None  # a copy of all selected layer data
 
+        self._layerVersion = 0  # incremented on each add, delete and change of items
+        self._selectionSnapshot = selectionSnapshot(self._copyItems)
+        # copy of the selection, only made just before the layer deletes or changes it
+
         self._selected_data = layer.selected_data.copy()
         
         # replaced by full copy of table in _layerSelectionCopy
@@ -128,6 +185,22 @@ class mmLayer(QtCore.QObject):
 
         self._numItems = len(layer.data)
 
+        # highlight is emitted on every mouse hover, most are no-ops
+        self._selectionVersion = 0  # bumped when a points selection changes in place
+        self._seenSelectionVersion = 0
+        self._seenSelection = layer.selected_data  # object and length we last saw
+        self._seenSelectionLen = len(layer.selected_data)
+        self._pendingSelect = False  # a 'select' waiting for _highlightTimer
+        self._numHighlightDropped = 0
+        self._numHighlightCoalesced = 0
+        self._numHighlightProcessed = 0
+
+        # coalesce selection changes to one 'select' per frame
+        self._highlightTimer = QtCore.QTimer(self)
+        self._highlightTimer.setSingleShot(True)
+        self._highlightTimer.setInterval(16)  # ms, about one frame at 60 Hz
+        self._highlightTimer.timeout.connect(self._flushHighlight)
+
         self._connectLayer()
 
         # slots to detect a change in layer selection
@@ -138,6 +211,13 @@ class mmLayer(QtCore.QObject):
 
         self._viewer.layers.selection.events.changed.connect(self.slot_select_layer)
 
+        self._spatialIndex = None
+        # built on first use, see getSpatialIndex(), then kept in sync
+        self.signalDataChanged.connect(self.slot_update_spatial_index)
+
+        self._minAddDistance = None
+        # shift+click closer than this to an item is rejected, see setMinAddDistance()
+
         # todo (cudmore) for now, experiment with this in the mmPoints layer
         #self._undo = mmUndo(self)  # undo connect to self.signalDataChanged
 
@@ -164,16 +244,32 @@ class mmLayer(QtCore.QObject):
         logger.info('')
 
     def _copy_data(self):
-        """Make a complete copy of a layer selection.
+        """Make a complete copy of the current layer selection in _layerSelectionCopy.
+        """
+        self._layerSelectionCopy = self._copyItems(self.selected_data)
+
+    def _copyItems(self, selectedData) -> dict:
+        """Copy layer items to a dict of arrays.
 
         Implement in derived classes.
         """
-        pass
+        return {}
+
+    def _markSelection(self, payload : dict = None):
+        """Remember the current selection, it is copied when needed.
+        """
+        self._selectionSnapshot.mark(self._selected_data, self._layerVersion, payload)
+        if payload is None and not _dataEventHasAction:
+            self._selectionSnapshot.materialize(self._layerVersion)
 
     def doUndo(self):
         if self._undo is not None:
             self._undo.doUndo()
 
+    def doRedo(self):
+        if self._undo is not None:
+            self._undo.doRedo()
+
     def addFeature(self, featureName : str, columnName : Union[str, None] = None):
         """Add a feature to layer.
         
@@ -199,6 +295,58 @@ class mmLayer(QtCore.QObject):
             return
         features[featureName] = None  # need to be len(layer)
 
+    def setFeatureRows(self, rowList : list, df : pd.DataFrame) -> bool:
+        """Set layer features for some rows from a dataframe.
+
+        Only columns of df that are layer features are stored. Table columns
+        like 'Symbol' and 'Face Color' come from the layer, if df changes
+        one of them the edit is refused.
+
+        Args:
+            rowList: rows to set, also the index of df
+            df: new values
+
+        Returns:
+            False if df changes a column that is not a layer feature,
+                nothing is set.
+        """
+        rowList = list(rowList)
+        features = self._layer.features
+        columns = [column for column in df.columns if column in features.columns]
+        otherColumns = [column for column in df.columns if column not in features.columns]
+        if otherColumns:
+            current = self.getDataFrame(rowList=rowList).reindex(columns=otherColumns)
+            newValues = df.loc[rowList, otherColumns].astype(str).to_numpy()
+            isChanged = newValues != current.astype(str).to_numpy()
+            if isChanged.any():
+                changedColumns = [column for column, changed
+                                    in zip(otherColumns, isChanged.any(axis=0)) if changed]
+                logger.warning(f'not a layer feature, edit of {changedColumns} is not stored')
+                return False
+        if columns:
+            features.loc[rowList, columns] = df.loc[rowList, columns]
+        return True
+
+    def _setFeatureValues(self, rowList, columns : list, values : np.ndarray):
+        """Write values into layer features by position.
+
+        Uses iloc (no index alignment), a write of k rows is O(k).
+
+        Args:
+            rowList: row positions to set, pass None to set all rows
+            columns: feature columns to set, must exist in layer features
+            values: (k, len(columns)) new values
+        """
+        features = self._layer.features
+        if rowList is None:
+            # replace whole columns, they become float (not None object)
+            for colIdx, column in enumerate(columns):
+                features[column] = values[:, colIdx]
+            return
+        rowArray = np.asarray(list(rowList), dtype=np.intp)
+        colArray = [features.columns.get_loc(column) for column in columns]
+        features.iloc[rowArray, colArray] = values
+
     def snapToItem(self, selectedRow : int, isAlt : bool =False):
         """Visually snap the viewer to selected item.
         """
@@ -221,7 +369,216 @@ class mmLayer(QtCore.QObject):
         Used to determine if we have add/delete in slot_user_edit_highlight().
         """
         return self._numItems
-        
+
+    def _layerNumItems(self):
+        """Get the number of items in the underlying layer.
+
+        Called on every highlight event, derived classes override
+        when len(layer.data) is not cheap.
+        """
+        return len(self._layer.data)
+
+    def _itemPositions(self, rows=None) -> np.ndarray:
+        """Get the position of items in data coordinates, one row per item.
+
+        From the coordinate features written by _updateFeatures().
+
+        Args:
+            rows: items to get, None for all items
+        """
+        coordinates = self._layer.features[coordinateColumns(self._layer.ndim)]
+        if rows is not None:
+            coordinates = coordinates.iloc[np.asarray(rows, dtype=np.int64)]
+        return coordinates.to_numpy(dtype=float)
+
+    def _layerAxesNotDisplayed(self) -> List[int]:
+        """Layer axes that are sliced (not displayed) in the viewer.
+        """
+        dims = self._viewer.dims
+        # layer axes are the last world axes
+        offset = dims.ndim - self._layer.ndim
+        return [axis - offset for axis in dims.not_displayed if axis >= offset]
+
+    @profileStage('layer.buildSpatialIndex')
+    def _buildSpatialIndex(self, sortAxis : int):
+        self._spatialIndex = spatialIndex(self._itemPositions(), sortAxis)
+
+    def getSpatialIndex(self, sortAxis : int = None) -> spatialIndex:
+        """Get the spatial index of item positions, build it if needed.
+
+        Args:
+            sortAxis: axis the index is sorted along, None to keep the
+                current one (the first sliced axis when first built)
+        """
+        index = self._spatialIndex
+        if sortAxis is None:
+            if index is not None:
+                sortAxis = index.sortAxis
+            else:
+                notDisplayed = self._layerAxesNotDisplayed()
+                sortAxis = notDisplayed[0] if notDisplayed else 0
+        if (index is None or index.sortAxis != sortAxis
+                or index.numItems() != self._layerNumItems()):
+            self._buildSpatialIndex(sortAxis)
+        return self._spatialIndex
+
+    @profileStage('layer.slot_update_spatial_index')
+    def slot_update_spatial_index(self, action : str, rows : set, layerCopy : dict, df : pd.DataFrame):
+        """Keep the spatial index in sync with add, delete and change.
+
+        Connected to our own signalDataChanged.
+        """
+        index = self._spatialIndex
+        if index is None or action == 'select':
+            return
+
+        sortedRows = np.asarray(sorted(rows), dtype=np.int64)
+        if action == 'add':
+            numIndexed = index.numItems()
+            if np.array_equal(sortedRows, np.arange(numIndexed, numIndexed + len(sortedRows))):
+                index.addItems(self._itemPositions(sortedRows))
+        elif action == 'delete':
+            index.deleteItems(sortedRows)
+        elif action == 'change':
+            index.moveItems(sortedRows, self._itemPositions(sortedRows))
+
+        if index.numItems() != self._layerNumItems():
+            # e.g. added rows were not at the end, rebuilt on next use
+            tracer.debug('spatial index out of sync after %s, will rebuild', action)
+            self._spatialIndex = None
+
+    def _getViewBox(self, sliceTolerance : float) -> tuple:
+        """Get the box of data coordinates in view.
+
+        Sliced axes are the current slice +/- sliceTolerance, in 2D display
+        the displayed axes are the canvas. Axes with no bound are +/- inf.
+
+        Returns:
+            (lower, upper) bound of each layer axis
+        """
+        ndim = self._layer.ndim
+        lower = np.full(ndim, -np.inf)
+        upper = np.full(ndim, np.inf)
+
+        dims = self._viewer.dims
+        offset = dims.ndim - ndim
+        worldPoint = np.asarray(dims.point, dtype=float)
+        dataPoint = np.asarray(self._layer.world_to_data(worldPoint), dtype=float)
+        for axis in self._layerAxesNotDisplayed():
+            lower[axis] = dataPoint[axis] - sliceTolerance
+            upper[axis] = dataPoint[axis] + sliceTolerance
+
+        # napari does not have a public canvas size
+        canvasSize = getattr(self._viewer, '_canvas_size', None)
+        camera = self._viewer.camera
+        if dims.ndisplay == 2 and canvasSize is not None and camera.zoom > 0:
+            displayed = list(dims.displayed)[-2:]
+            halfSize = np.asarray(canvasSize, dtype=float) / camera.zoom / 2
+            center = np.asarray(camera.center, dtype=float)[-2:]
+            worldLower = worldPoint.copy()
+            worldUpper = worldPoint.copy()
+            worldLower[displayed] = center - halfSize
+            worldUpper[displayed] = center + halfSize
+            dataLower = np.asarray(self._layer.world_to_data(worldLower), dtype=float)
+            dataUpper = np.asarray(self._layer.world_to_data(worldUpper), dtype=float)
+            for worldAxis in displayed:
+                axis = worldAxis - offset
+                if axis >= 0:
+                    lower[axis] = min(dataLower[axis], dataUpper[axis])
+                    upper[axis] = max(dataLower[axis], dataUpper[axis])
+        return lower, upper
+
+    @profileStage('layer.getVisibleItems')
+    def getVisibleItems(self, sliceTolerance : float = 0.5) -> np.ndarray:
+        """Get items in the current slice and inside the canvas.
+
+        Uses the spatial index sorted along the first sliced axis,
+        only items near the slice are tested against the canvas.
+
+        Args:
+            sliceTolerance: items this close to the current slice are visible,
+                in data units of each sliced axis
+
+        Returns:
+            Sorted rows of visible items.
+        """
+        lower, upper = self._getViewBox(sliceTolerance)
+        notDisplayed = self._layerAxesNotDisplayed()
+        sortAxis = notDisplayed[0] if notDisplayed else None
+        return self.getSpatialIndex(sortAxis).queryBox(lower, upper)
+
+    def findItemsInRadius(self, coords, radius : float) -> np.ndarray:
+        """Get items within a distance of coords, e.g. to reject a duplicate add.
+
+        Args:
+            coords: position in data coordinates, one value per layer axis
+            radius: max euclidean distance in data units
+
+        Returns:
+            Rows of items in radius, nearest first.
+        """
+        if self._layerNumItems() == 0:
+            return np.array([], dtype=np.int64)
+        return self.getSpatialIndex().queryRadius(coords, radius)
+
+    def findNearestItem(self, coords, maxDistance : float = np.inf) -> tuple:
+        """Get the item nearest to coords.
+
+        Args:
+            coords: position in data coordinates, one value per layer axis
+            maxDistance: ignore items further than this
+
+        Returns:
+            (row, distance), (None, np.inf) if no item is within maxDistance
+        """
+        if self._layerNumItems() == 0:
+            return None, np.inf
+        return self.getSpatialIndex().nearest(coords, maxDistance)
+
+    def snapToNearest(self, coords, maxDistance : float = np.inf, isAlt : bool = False) -> Union[int, None]:
+        """Select and snap the viewer to the item nearest to coords.
+
+        Args:
+            coords: position in data coordinates, one value per layer axis
+            maxDistance: do nothing if no item is this close
+            isAlt: passed to snapToItem()
+
+        Returns:
+            The row snapped to, None if no item was in maxDistance.
+        """
+        row, distance = self.findNearestItem(coords, maxDistance)
+        if row is None:
+            return None
+        tracer.debug('nearest item:%s distance:%s', row, distance)
+        self.selectItems({row})
+        self.snapToItem(row, isAlt=isAlt)
+        return row
+
+    def setMinAddDistance(self, minAddDistance : Union[float, None]):
+        """Reject shift+click adds closer than this to an existing item.
+
+        Checked with the spatial index before onAddCallback is called.
+
+        Args:
+            minAddDistance: distance in data units, None to allow all adds
+        """
+        self._minAddDistance = minAddDistance
+
+    def getHighlightCounts(self) -> dict:
+        """Get counts of highlight events.
+
+        Returns:
+            dict with keys
+                'dropped': no change in items or selection (e.g. mouse hover)
+                'coalesced': selection changes replaced by a later change
+                'processed': 'select' emitted
+        """
+        return {
+            'dropped': self._numHighlightDropped,
+            'coalesced': self._numHighlightCoalesced,
+            'processed': self._numHighlightProcessed,
+        }
+
     def selectItems(self, selectedRowSet : set):
         """Set the selected items in layer.
         
@@ -231,6 +588,8 @@ class mmLayer(QtCore.QObject):
             not used.
         """
         self._layer.selected_data = selectedRowSet
+        # selection from the table is not deferred
+        self._flushHighlight()
 
     @property
     def selected_data(self):
@@ -240,6 +599,13 @@ class mmLayer(QtCore.QObject):
         
         self._layer.events.name.connect(self.slot_user_edit_name)
         self._layer.events.highlight.connect(self.slot_user_edit_highlight)
+
+        # points selection is a napari Selection, changed in place
+        # shapes selection is a set, replaced on change
+        try:
+            self._layer.selected_data.events.items_changed.connect(self.slot_selection_changed)
+        except (AttributeError):
+            pass
         self._layer.events.data.connect(self.slot_user_edit_data)
 
         # no longer available in PyPi napari
@@ -283,23 +649,33 @@ class mmLayer(QtCore.QObject):
         Will only be called when install with newOnShiftClick().
         """
         if 'Shift' in event.modifiers:
+            data_coordinates = self._layer.world_to_data(event.position)
+            # always add as integer pixels (not fractional/float pixels)
+            cords = np.round(data_coordinates).astype(int)
+
+            if self._minAddDistance is not None:
+                row, distance = self.findNearestItem(cords, self._minAddDistance)
+                if row is not None:
+                    logger.info(f'shift+click is {distance:.2f} from item {row} -->> no new point')
+                    return
+
             # make a new point at cursor position
             onAddReturn = {}
             if self._onAddCallback is not None:
                 logger.info(f'checking with _onAddCallback ...')
                 # onAddCallback should determine (i) if we want to actually add
                 # (ii) if add is ok, return a dict of values for selected row
-                onAddReturn = self._onAddCallback(self._selected_data, self.getDataFrame())
+                keywords = {}
+                if 'coords' in self._onAddKeywords:
+                    keywords['coords'] = cords
+                if 'myLayer' in self._onAddKeywords:
+                    keywords['myLayer'] = self
+                onAddReturn = self._onAddCallback(self._selected_data, self.getDataFrame(), **keywords)
                 if onAddReturn is None:
-                    print('    shift+clik was rejected -->> no new point')
+                    logger.info('shift+click was rejected -->> no new point')
                     return
                 else:
-                    print('  on add return returned dict:')
-                    pprint(onAddReturn)
-
-            data_coordinates = self._layer.world_to_data(event.position)
-            # always add as integer pixels (not fractional/float pixels)
-            cords = np.round(data_coordinates).astype(int)
+                    tracer.debug('on add returned dict:%s', onAddReturn)
             
             # add to layer, only for points layer?
             # for shape layer type 'path', use add_paths()
@@ -347,12 +723,28 @@ class mmLayer(QtCore.QObject):
         """
         pass
 
-    def getDataFrame(self, getFull=False) -> pd.DataFrame:
+    def _getRowList(self, getFull=False, rowList=None) -> list:
+        """Get the list of rows for getDataFrame().
+
+        Args:
+            getFull: all rows
+            rowList: explicit rows, takes precedence over getFull
+        """
+        if rowList is not None:
+            return list(rowList)
+        elif getFull:
+            return list(range(len(self._layer.data)))
+        else:
+            return list(self._selected_data)
+
+    def getDataFrame(self, getFull=False, rowList=None) -> pd.DataFrame:
         """Get a dataframe from layer.
         
         Args:
             getFull: get full dataframe
                 otherwise, get datafram for _selectedData
+            rowList: get dataframe for these rows (ignores getFull)
+                Used by virtualLayerModel to fetch one chunk of rows.
         """
 
         # self._layer.features gives us a (features, properties) pandas dataframe !!!        
@@ -362,10 +754,7 @@ class mmLayer(QtCore.QObject):
         # not neccessary, alreay a pd.DataFrame (I think)
         # dfFeatures = features_to_pandas_dataframe(dfFeatures)
 
-        if getFull:
-            selectedList = list(range(len(self._layer.data)))
-        else:
-            selectedList = list(self._selected_data)
+        selectedList = self._getRowList(getFull, rowList)
 
         # reduce by selection
         df = dfFeatures.loc[selectedList]
@@ -390,21 +779,47 @@ class mmLayer(QtCore.QObject):
 
 
         if selectedList:
-            # TODO (cudmore) rgb_to_hex() returns an np.array with  dtype of unicode '|U9''
-            #    we want it as a string ???
-            tmpColor = [str(rgb_to_hex(oneColor)[0])
-                        for oneColor in self._layer.face_color[selectedList]]        
-
-            df.loc[selectedList, 'Face Color'] = tmpColor
+            # convert all colors at once, astype(object) gives python str (not '|U9')
+            tmpColor = rgbaToHex(self._layer.face_color[selectedList])
+            df.loc[selectedList, 'Face Color'] = tmpColor.astype(object)
         
         return df
 
     def _derivedClassName(self):
         return self.__class__.__name__
 
+    def slot_selection_changed(self, event):
+        """Points layer selection changed in place.
+
+        Bump a version so slot_user_edit_highlight() can detect
+        a change without comparing sets.
+        """
+        self._selectionVersion += 1
+
+    def _isSameSelection(self, selected_data) -> bool:
+        """Return True if layer selection has not changed since last seen.
+
+        O(1), compares the selection object, its length and the
+        version bumped by slot_selection_changed().
+        """
+        return (selected_data is self._seenSelection
+                and self._selectionVersion == self._seenSelectionVersion
+                and len(selected_data) == self._seenSelectionLen)
+
+    def _setSeenSelection(self, selected_data):
+        self._seenSelection = selected_data
+        self._seenSelectionVersion = self._selectionVersion
+        self._seenSelectionLen = len(selected_data)
+
+    @profileStage('layer.slot_user_edit_highlight')
     def slot_user_edit_highlight(self, event):
         """Called repeatedly on mouse hover.
 
+        Hover without a change in items or selection returns
+        without allocating. Add and delete are handled immediately,
+        a change in selection is coalesced and emitted as one 'select'
+        by _flushHighlight() on the next frame.
+
         Error:
             mm_env/lib/python3.9/site-packages/numpy/core/fromnumeric.py:43:
             VisibleDeprecationWarning:
@@ -414,10 +829,40 @@ class mmLayer(QtCore.QObject):
             If you meant to do this, you must specify 'dtype=object' when creating the ndarray.!
 
         """
-        newSelection = not setsAreEqual(event.source.selected_data, self._selected_data)
+        layerSelection = event.source.selected_data
+        numLayerItems = self._layerNumItems()
+
+        if numLayerItems == self.numItems():
+            if self._isSameSelection(layerSelection):
+                self._numHighlightDropped += 1
+                return
+            self._setSeenSelection(layerSelection)
+            if setsAreEqual(layerSelection, self._selected_data):
+                # selection changed and changed back before we saw it
+                self._numHighlightDropped += 1
+                return
+
+            # new selection, remember it now so delete/change use it
+            if self._pendingSelect:
+                self._numHighlightCoalesced += 1
+            self._selected_data = layerSelection.copy()
+            # no copy, it is made if the selection is deleted or changed
+            self._markSelection()
+            self._pendingSelect = True
+            self._highlightTimer.start()
+            return
+
+        # add or delete, any pending select is replaced
+        if self._pendingSelect:
+            self._numHighlightCoalesced += 1
+            self._pendingSelect = False
+            self._highlightTimer.stop()
+
+        self._setSeenSelection(layerSelection)
+        newSelection = not setsAreEqual(layerSelection, self._selected_data)
             
         action = 'none'
-        if len(event.source.data) > self.numItems():
+        if numLayerItems > self.numItems():
             # add an item: for points layer is point, for shapes layer is shape
             # event.source.selected_data gives us the added points
             # for shape layer, *this is called multiple times without the added items selected
@@ -426,9 +871,8 @@ class mmLayer(QtCore.QObject):
             else:
                 # this happens on add in shapes layer
                 # for shapes, need to add
-                print('    ==== data length changed but selection did not...')
-                print('     event.source.selected_data:', event.source.selected_data)
-                print('     self._selected_data:', self._selected_data)
+                tracer.debug('data length changed but selection did not, layer:%s ours:%s',
+                                layerSelection, self._selected_data)
                 '''
                 _newSelectionStart = self.numItems()
                 _newSelectionStop = len(event.source.data)
@@ -437,33 +881,17 @@ class mmLayer(QtCore.QObject):
                 print(f'     tweeked event.source.selected_data: {event.source.selected_data}')
                 action = 'add'
                 '''
-        elif len(event.source.data) < self.numItems():
+        elif numLayerItems < self.numItems():
             # event.source.selected_data tells us the rows
             # THEY NO LONGER EXIST
             # our current self._selected_data tells us the rows
             action = 'delete'
-        elif newSelection:
-            action = 'select'
-
-        '''
-        if newSelection and self._blockOnAdd and not event.source.selected_data:
-            # after shapes add, we re-enter here but event.source.selected_data is empty set()
-            # should be the newly added shape(s), e.g. self._selected_data
-            print('        ================')
-            print('        action:', action)
-            print('        convert to action: select')
-            event.source.selected_data = self._selected_data
-            self._blockOnAdd = False
-        '''
 
         if action != 'none':
-            logger.info(f'{self._derivedClassName()}')
-            print('    newSelection:', newSelection)
-            print('    event.source.selected_data:', event.source.selected_data)
-            print('    self._selected_data:', self._selected_data)
-            print('    len(event.source.data):', len(event.source.data))
-            print('    self.numItems():', self.numItems())
-            print('    action:', action)
+            tracer.debug('%s action:%s newSelection:%s layer selection:%s ours:%s numLayerItems:%s numItems:%s',
+                            self._derivedClassName(), action, newSelection,
+                            layerSelection, self._selected_data,
+                            numLayerItems, self.numItems())
 
         # signal what changed
         if action == 'add':
@@ -472,56 +900,74 @@ class mmLayer(QtCore.QObject):
             
             # on add we have new items and they are selected
             self._selected_data = event.source.selected_data.copy()
-            self._numItems = len(event.source.data)
+            self._numItems = numLayerItems
 
             # trying to figure out shapes layer
             # after add shapes layer trigger selection with set(), not with what was added
             #if not self._selected_data:
             #    print(f'    ERROR in {self._derivedClassName()} ... new shapes are not selected')
             _selected_data_set = set(self._selected_data)  # abb 202402
-            self._copy_data()  # copy all selected points to _layerSelectionCopy
+            self._layerVersion += 1
+            self._markSelection()
             self._updateFeatures(self._selected_data)
             dfFeatures = self.getDataFrame()
-            print(f'  -->> signalDataChanged.emit "add" with _selected_data:{self._selected_data}')
+            tracer.debug('-->> signalDataChanged.emit "add" with _selected_data:%s\n%s',
+                            self._selected_data, dfFeatures)
+            # undo of add only needs the rows
+            addedRows = {'rows': np.asarray(sorted(_selected_data_set), dtype=np.intp)}
             self.signalDataChanged.emit('add',
                                 _selected_data_set,
                                 # self._selected_data,
-                                self._layerSelectionCopy,
+                                addedRows,
                                 dfFeatures)
 
         elif action == 'delete':
             # on delete, data indices were deleted_selected_data
             delete_selected_data = self._selected_data.copy()
             delete_selected_data_set = set(delete_selected_data)  # abb 202402
+
+            # copy made on 'removing', before items were deleted
+            self._layerSelectionCopy = self._selectionSnapshot.materialize(self._layerVersion)
+
             self._selected_data = set()
-            self._numItems = len(event.source.data)
+            self._numItems = numLayerItems
+            self._layerVersion += 1
+            self._markSelection()
             
-            # here we are reusing previous _layerSelectionCopy
-            # from action ('add', 'select')
-            logger.info(f'  -->> signalDataChanged.emit "delete" with delete_selected_data:{delete_selected_data}')
+            tracer.debug('-->> signalDataChanged.emit "delete" with delete_selected_data:%s',
+                            delete_selected_data)
             self.signalDataChanged.emit('delete',
                             delete_selected_data_set,  # abb 202402
                             # delete_selected_data,
                             self._layerSelectionCopy,
                             pd.DataFrame())
-        
-        elif action == 'select':
-            self._selected_data = event.source.selected_data.copy()
 
-            selectedDataSet = set(self._selected_data)
-            self._copy_data()  # copy all selected points to _layerSelectionCopy
-            dfProperties = self.getDataFrame()
+    @profileStage('layer.select')
+    def _flushHighlight(self):
+        """Emit the pending 'select' from slot_user_edit_highlight().
 
-            logger.info(f'action:{action}')
-            print(f'  -->> signalDataChanged.emit "select" with _selected_data:{self._selected_data}')
-            pprint(dfProperties)
-            print('')
-            self.signalDataChanged.emit('select',
-                                selectedDataSet,  # abb 202402
-                                # self._selected_data,
-                                self._layerSelectionCopy,
-                                dfProperties)
+        Called by _highlightTimer, and directly when a selection
+        must be seen before something else (table selection, data edit).
+        """
+        self._highlightTimer.stop()
+        if not self._pendingSelect:
+            return
+        self._pendingSelect = False
+        self._numHighlightProcessed += 1
 
+        selectedDataSet = set(self._selected_data)
+        dfProperties = self.getDataFrame()
+
+        tracer.debug('-->> signalDataChanged.emit "select" with _selected_data:%s\n%s',
+                        self._selected_data, dfProperties)
+        # selection is not copied, see _markSelection()
+        self.signalDataChanged.emit('select',
+                            selectedDataSet,  # abb 202402
+                            # self._selected_data,
+                            {},
+                            dfProperties)
+
+    @profileStage('layer.slot_user_edit_data')
     def slot_user_edit_data(self, event):
         """User edited a point in the current layer.
         
@@ -529,36 +975,61 @@ class mmLayer(QtCore.QObject):
                 
         Notes:
             On key-press (like delete), we need to ignore event.source.mode
+
+            napari >= 0.4.19 emits this before ('changing', 'removing') and after
+            an edit. Before, we copy the selection so undo has the old items.
         """
+        action = getattr(event, 'action', None)
+        if action in ('changing', 'removing'):
+            # copy the selection before the layer changes it
+            self._selectionSnapshot.materialize(self._layerVersion)
+            return
+        elif action in ('adding', 'added', 'removed'):
+            # add and delete are handled in slot_user_edit_highlight()
+            return
+
+        # a select may be waiting for the next frame, it comes first
+        self._flushHighlight()
 
         # if there is no selection, there is never a change
         # this does not work for shapes layer
         if not self._selected_data:
             # no data changes when no selection
-            logger.info(f'NO CHANGE BECAUSE _selected_data is (empty) {self._selected_data}')
+            tracer.debug('no change because _selected_data is empty')
             return
 
         # we usually show x/y/z in table
         # update our internal fatures
         self._updateFeatures(self._selected_data)
 
-        # copy the selection
-        self._copy_data()
+        # copy the selection, before and after the change
+        changeCopy = self._copyChange()
 
         dfFeatures = self.getDataFrame()
 
-        logger.info('')
-        logger.info(f'  -->> signalDataChanged.emit "change" with _selected_data:{self._selected_data}')
-        logger.info('    features:')
-        pprint(dfFeatures)
+        tracer.debug('-->> signalDataChanged.emit "change" with _selected_data:%s\n%s',
+                        self._selected_data, dfFeatures)
 
         selectedDataSet = set(self._selected_data)
         self.signalDataChanged.emit('change', 
                         selectedDataSet,  # abb 202402
                         # self._selected_data, 
-                        self._layerSelectionCopy, 
+                        changeCopy, 
                         dfFeatures)
 
+    def _copyChange(self) -> dict:
+        """Copy the selection after a change, with the copy from before in 'previous'.
+
+        The copy after becomes the snapshot for the next change.
+        """
+        previous = self._selectionSnapshot.materialize(self._layerVersion)
+        self._copy_data()
+        self._layerVersion += 1
+        self._markSelection(payload=self._layerSelectionCopy)
+        if not self._layerSelectionCopy:
+            return {}
+        return dict(self._layerSelectionCopy, previous=previous)
+
     def slot_user_edit_face_color(self, event):
         """User selected a face color.
         
@@ -570,8 +1041,8 @@ class mmLayer(QtCore.QObject):
         """
         layer = self._viewer.layers.selection.active  # can be None
         try:
-            print('        layer selected_data:', layer.selected_data)
-            print('        self.selected_data:', self._selected_data)
+            tracer.debug('layer selected_data:%s self.selected_data:%s',
+                            layer.selected_data, self._selected_data)
             if not setsAreEqual(layer.selected_data, self._selected_data):
                 logger.warning('ignoring event: selected_data do not match')
                 return
@@ -593,13 +1064,11 @@ class mmLayer(QtCore.QObject):
             #for oneRowIndex in index:
             #    properties.loc[oneRowIndex, 'Face Color'] = current_face_color
 
-            # copy selected data, not sure this is needed, updates _layerSelectionCopy
-            self._copy_data()
+            # copy selected data before and after, for undo
+            changeCopy = self._copyChange()
 
-            print('  -->> emit "change"')
-            print('        self._selected_data:', self._selected_data)
-            print('        dfProperties:')
-            pprint(dfProperties)
+            tracer.debug('-->> emit "change" with _selected_data:%s\n%s',
+                            self._selected_data, dfProperties)
                 
             #pprint(vars(event))
             #print('\n\n')
@@ -607,11 +1076,10 @@ class mmLayer(QtCore.QObject):
             self.signalDataChanged.emit('change',
                             _selected_data_set,
                             # self._selected_data,
-                            self._layerSelectionCopy,
+                            changeCopy,
                             dfProperties)
 
     def slot_user_edit_name(self, event):
-        print('slot_user_edit_name()')
         #newName = self._layer.name
         newName = event.source.name
         self.signalLayerNameChange.emit(newName)
@@ -713,10 +1181,9 @@ class pointsLayer(mmLayer):
         # features this layer will calculate
         # updated in _updateFeatures
         # stored in layer features and displayed as columns in table
-        self.addFeature('x')
-        self.addFeature('y')
-        if self._layer.ndim >= 3:
-            self.addFeature('z')
+        # x, y, z, then leading axes of higher dimensional layers
+        for column in reversed(coordinateColumns(self._layer.ndim)):
+            self.addFeature(column)
     
         self._updateFeatures()
 
@@ -738,39 +1205,28 @@ class pointsLayer(mmLayer):
         self._layer.events.symbol.connect(self.slot_user_edit_symbol)  # points layer
         self._layer.events.size.connect(self.slot_user_edit_size)  # points layer
 
+    @profileStage('layer._updateFeatures')
     def _updateFeatures(self, selectedDataSet=None):
         """Update layer features based on selection.
         
         Used for (i) creation and (ii) on data move.
 
+        Coordinate columns (see coordinateColumns()) are written by position,
+        a move of k points is O(k).
+
         Args:
             selectedDataSet (set) selected data, Pass None to update all.
         """
+        columns = coordinateColumns(self._layer.ndim)
         if selectedDataSet is None:
-            selectedDataSet = set(range(self.numItems()))
-        
-        
-        selectedList = list(selectedDataSet)
-
-        # logger.info(f'check x/y/z order')
-        # print(self._layer.data)
-        
-        #TODO: (cudmore) what if points layer has dim > 3 ???
-        if self._layer.ndim == 3:
-            self._layer.features.loc[selectedList, 'z'] = \
-                            self._layer.data[selectedList,0]
-            self._layer.features.loc[selectedList, 'x'] = \
-                                self._layer.data[selectedList,2]
-            self._layer.features.loc[selectedList, 'y'] = \
-                                self._layer.data[selectedList,1]
-        elif self._layer.ndim == 2:
-            self._layer.features.loc[selectedList, 'x'] = \
-                                self._layer.data[selectedList,1]
-            self._layer.features.loc[selectedList, 'y'] = \
-                                self._layer.data[selectedList,0]
+            self._setFeatureValues(None, columns, self._layer.data)
+        else:
+            selectedList = list(selectedDataSet)
+            self._setFeatureValues(selectedList, columns, self._layer.data[selectedList])
 
-    def _copy_data(self):
-        """Copy selected points to clipboard.
+    @profileStage('layer._copy_data', numBytes=_resultBytes)
+    def _copyItems(self, selectedData) -> dict:
+        """Copy points to a dict of arrays (a clipboard).
         
         Taken from napari.layers.points.points.py
         
@@ -782,41 +1238,59 @@ class pointsLayer(mmLayer):
 
         TODO (cudmore) this is changing with different version of napari.
         """
-        if len(self.selected_data) > 0:
-            layer = self._layer  # abb
-            index = list(self.selected_data)
-            self._layerSelectionCopy = {
-                'data': deepcopy(layer.data[index]),
-                'edge_color': deepcopy(layer.edge_color[index]),
-                'face_color': deepcopy(layer.face_color[index]),
-                'shown': deepcopy(layer.shown[index]),
-                'size': deepcopy(layer.size[index]),
-                'edge_width': deepcopy(layer.edge_width[index]),
-                'features': deepcopy(layer.features.iloc[index]),
-                # 20240612
-                # AttributeError: 'Points' object has no attribute '_slice_indices'
-                # 'indices': layer._slice_indices,
-                
-                #'text': layer.text._copy(index),
-            }
-            # TODO (Cudmore) layer.text.values is usually a <class 'numpy.ndarray'>
-            # is this always true?
-            # secondly, what is layer.text.value anyway? and what is dtype <U1
-            # print(f'  === layer.text.values: "{layer.text.values}" {type(layer.text.values)}')
-            # print('    ', layer.text.values.shape, layer.text.values.dtype)
-            #if len(layer.text.values.shape) == 0:
-            if layer.text.values.size == 0:
-                    self._layerSelectionCopy['text'] = np.empty(0)
-            else:
-                try:
-                    self._layerSelectionCopy['text'] = deepcopy(layer.text.values[index])
-                except (IndexError) as e:
-                    logger.error('   I DO NOT UNDERSTAND HOW TO FIX THIS!')
-                    logger.error(e)
-                    self._layerSelectionCopy['text'] = np.empty(0)
-
+        if len(selectedData) == 0:
+            return {}
+
+        layer = self._layer  # abb
+        index = sorted(selectedData)
+        # fancy indexing already returns copies, no need to deepcopy
+        layerCopy = {
+            'rows': np.asarray(index, dtype=np.intp),
+            'data': layer.data[index],
+            'edge_color': layer.edge_color[index],
+            'face_color': layer.face_color[index],
+            'shown': layer.shown[index],
+            'size': layer.size[index],
+            'edge_width': layer.edge_width[index],
+            'features': layer.features.iloc[index],
+            # 20240612
+            # AttributeError: 'Points' object has no attribute '_slice_indices'
+            'indices': _getSliceIndices(layer),
+            
+            #'text': layer.text._copy(index),
+        }
+        # TODO (Cudmore) layer.text.values is usually a <class 'numpy.ndarray'>
+        # is this always true?
+        # secondly, what is layer.text.value anyway? and what is dtype <U1
+        #if len(layer.text.values.shape) == 0:
+        if layer.text.values.size == 0:
+            layerCopy['text'] = np.empty(0)
         else:
-            self._layerSelectionCopy = {}
+            try:
+                layerCopy['text'] = layer.text.values[index]
+            except (IndexError) as e:
+                logger.error('   I DO NOT UNDERSTAND HOW TO FIX THIS!')
+                logger.error(e)
+                layerCopy['text'] = np.empty(0)
+
+        return layerCopy
+
+    def _itemPositions(self, rows=None) -> np.ndarray:
+        """Points are their own positions.
+        """
+        if rows is None:
+            return self._layer.data
+        return self._layer.data[np.asarray(rows, dtype=np.int64)]
+
+    def _moveItems(self, rows : np.ndarray, delta : np.ndarray):
+        """Move points by delta in place, used by undo.
+
+        Args:
+            rows: points to move
+            delta: (len(rows), ndim) change in coordinates
+        """
+        self._layer.data[rows] += delta
+        self._layer.refresh()
 
     def _paste_data(self, layerSelectionCopy=None):
         """Paste any point from clipboard and select them.
@@ -844,11 +1318,13 @@ class pointsLayer(mmLayer):
         if len(_clipboard.keys()) > 0:
             not_disp = layer._dims_not_displayed
             data = deepcopy(_clipboard['data'])
-            offset = [
-                layer._slice_indices[i] - _clipboard['indices'][i]
-                for i in not_disp
-            ]
-            data[:, not_disp] = data[:, not_disp] + np.array(offset)
+            sliceIndices = _getSliceIndices(layer)
+            if sliceIndices is not None and _clipboard['indices'] is not None:
+                offset = [
+                    sliceIndices[i] - _clipboard['indices'][i]
+                    for i in not_disp
+                ]
+                data[:, not_disp] = data[:, not_disp] + np.array(offset)
             layer._data = np.append(layer.data, data, axis=0)
             layer._shown = np.append(
                 layer.shown, deepcopy(_clipboard['shown']), axis=0
@@ -896,16 +1372,14 @@ class pointsLayer(mmLayer):
 
             layer.refresh()
 
-    def getDataFrame(self, getFull=False) -> pd.DataFrame:
+    @profileStage('layer.getDataFrame', numBytes=_resultBytes)
+    def getDataFrame(self, getFull=False, rowList=None) -> pd.DataFrame:
         # getDataFrame
         # TODO (cudmore) add symbol encoding
 
-        df = super().getDataFrame(getFull=getFull)
+        df = super().getDataFrame(getFull=getFull, rowList=rowList)
 
-        if getFull:
-            selectedList = list(range(len(self._layer.data)))
-        else:
-            selectedList = list(self._selected_data)
+        selectedList = self._getRowList(getFull, rowList)
 
         # logger.warning(f'selectedList:{selectedList}')
 
@@ -923,7 +1397,6 @@ class pointsLayer(mmLayer):
         symbol = self._layer.symbol  # str
         # logger.warning(f'getFull:{getFull} received symbol:{symbol} {type(symbol)}')
         # symbol = str(symbol)  # abb 20240206
-        symbol = [SYMBOL_ALIAS[str(_symbol)] for _symbol in symbol]  # abb 202402
 
         # abb remove 202402
         # try:
@@ -937,7 +1410,8 @@ class pointsLayer(mmLayer):
         # abb 202402 cludge
         #symbolList = [symbol[0]] * len(selectedList)  # data.shape[0]  # make symbols for each point
 
-        symbolList = [symbol[i] for i in selectedList]
+        # only alias the symbols of the rows we return
+        symbolList = [SYMBOL_ALIAS[str(symbol[i])] for i in selectedList]  # abb 202402
 
         df.insert(loc=0, column='Symbol', value=symbolList)  # insert as first column
         # df.insert(loc=0, column='Symbol', value=symbol)  # insert as first column
@@ -978,12 +1452,12 @@ class pointsLayer(mmLayer):
         for featureColumn in self._layer.features.columns:
             if featureColumn in features.keys():
                 addedFeatureValue = features[featureColumn]
-                print(f'      addedIdx:{addedIdx} featureColumn:{featureColumn} addedFeatureValue:{addedFeatureValue}')
+                tracer.debug('addedIdx:%s featureColumn:%s addedFeatureValue:%s',
+                                addedIdx, featureColumn, addedFeatureValue)
                 self._layer.features.loc[addedIdx, featureColumn] = addedFeatureValue
             else:
                 # _layer has a feature we did not set???
-                print(f'  did not find featureColumn:{featureColumn} in added features')
-                pass
+                tracer.debug('did not find featureColumn:%s in added features', featureColumn)
 
     def _flashItem(self, selectedRow : int):
         """Flash size/color if selected item to make it visible to user.
@@ -1142,18 +1616,24 @@ class shapesLayer(mmLayer):
         self.addFeature('x')
         self.addFeature('y')
         self.addFeature('z')
+        # leading axes of higher dimensional layers
+        for column in coordinateColumns(self._layer.ndim)[:-3]:
+            self.addFeature(column)
     
         self._updateFeatures()
 
-    def getDataFrame(self, getFull=False) -> pd.DataFrame:
+    def _layerNumItems(self):
+        """Number of shapes, layer.data would build a list of all vertices.
+        """
+        return self._layer.nshapes
+
+    @profileStage('layer.getDataFrame', numBytes=_resultBytes)
+    def getDataFrame(self, getFull=False, rowList=None) -> pd.DataFrame:
         # TODO (cudmore) make sure it works for 2d/3d (what about N-Dim ???)
 
-        df = super().getDataFrame(getFull=getFull)
+        df = super().getDataFrame(getFull=getFull, rowList=rowList)
 
-        if getFull:
-            selectedList = list(range(len(self._layer.data)))
-        else:
-            selectedList = list(self._selected_data)
+        selectedList = self._getRowList(getFull, rowList)
         
         # now handled in _updateFeatures
         # iterate through each shape and calculate (z,y,x)      
@@ -1168,84 +1648,198 @@ class shapesLayer(mmLayer):
             df.insert(0, 'z', zMean)
         '''
 
-        shape_type = [self._layer.shape_type[idx] for idx in selectedList]        
+        # layer.shape_type builds a list of all shapes, read only the rows we need
+        try:
+            shapes = self._layer._data_view.shapes
+            shape_type = [shapes[idx].name for idx in selectedList]
+        except (AttributeError):
+            allShapeTypes = self._layer.shape_type
+            shape_type = [allShapeTypes[idx] for idx in selectedList]
         df.insert(0, 'Shape Type', shape_type)
 
         return df
 
+    @profileStage('layer._updateFeatures')
     def _updateFeatures(self, selectedDataSet=None):
         """Update underlying layer features based on selection.
         
         Used in creation and on data move.
 
+        Centroid (z, y, x) of each shape is the mean of its vertices.
+        All selected shapes are packed into one vertex array and reduced together.
+
         Args:
             selectedDataSet (set) selected data, Pass None to update all.
         """
+        # layer.data builds a new list of (n, ndim) vertex arrays on each access
+        data = self._layer.data
+
         if selectedDataSet is None:
-            selectedDataSet = set(range(self.numItems()))
-        
-        selectedList = list(selectedDataSet)
+            selectedList = list(range(len(data)))
+            shapeList = data
+        else:
+            selectedList = list(selectedDataSet)
+            shapeList = [data[idx] for idx in selectedList]
 
-        logger.info(f'{self._derivedClassName()} selectedList:{selectedList}')
-        logger.info(f'self._layer.data is:')
-        print(self._layer.data)
+        tracer.debug('%s updating %s shapes', self._derivedClassName(), len(selectedList))
 
-        if self._layer.ndim == 2:
-            yMean = [np.mean(self._layer.data[idx][:,0]) for idx in selectedList]
-            xMean = [np.mean(self._layer.data[idx][:,1]) for idx in selectedList]
-        
-            self._layer.features.loc[selectedList, 'x'] = xMean
-            self._layer.features.loc[selectedList, 'y'] = yMean
-        
-        elif self._layer.ndim >= 3:
-            yMean = [np.mean(self._layer.data[idx][:,1]) for idx in selectedList]
-            xMean = [np.mean(self._layer.data[idx][:,2]) for idx in selectedList]
-        
-            self._layer.features.loc[selectedList, 'x'] = xMean
-            self._layer.features.loc[selectedList, 'y'] = yMean
+        if not selectedList:
+            return
 
-            zMean = [np.mean(self._layer.data[idx][:,0]) for idx in selectedList]
-            self._layer.features.loc[selectedList, 'z'] = zMean
+        vertices, offsets = packVertices(shapeList)
+        centroids = segmentMeans(vertices, offsets)
 
+        columns = coordinateColumns(self._layer.ndim)
+        if selectedDataSet is None:
+            self._setFeatureValues(None, columns, centroids)
         else:
-            logger.warning(f'Did not update with self._layer.ndim:{self._layer.ndim}')
+            self._setFeatureValues(selectedList, columns, centroids)
 
-        print('   now self._layer.features:')
-        pprint(self._layer.features)
+    def getCentroid(self, selectedRow : int) -> np.ndarray:
+        """Get the centroid of one shape as (z, y, x) or (y, x).
+        
+        From features updated in _updateFeatures().
+        """
+        features = self._layer.features
+        columns = coordinateColumns(self._layer.ndim)
+        return features[columns].iloc[selectedRow].to_numpy(dtype=float)
 
-    def _copy_data(self):
-        """Copy selected shapes to clipboard.
+    def snapToItem(self, selectedRow : int, isAlt : bool =False):
+        """Snap viewer to z-Plane of centroid of selected shape and optionally to (y,x)
+
+        Args:
+            selectedRow (int): The row to snap to.
+            isAlt (bool): If True then center shape on (y,x)
+        """
+        centroid = self.getCentroid(selectedRow)
+        logger.info(f'selectedRow:{selectedRow} centroid:{centroid}')
+        if self._layer.ndim >= 3:
+            # z-Plane
+            axis = self._layer.ndim - 3  # z is 3rd from last, like coordinateColumns()
+            self._viewer.dims.set_point(axis, centroid[axis])
+        if isAlt:
+            self._viewer.camera.center = tuple(centroid)
+
+    @profileStage('layer._copy_data', numBytes=_resultBytes)
+    def _copyItems(self, selectedData) -> dict:
+        """Copy shapes to a dict (a clipboard).
         
         Taken from napari.layers.shapes.shapes.py
 
         This is buggy, depends on napari version !!!
         """
-        if len(self.selected_data) > 0:
-            layer = self._layer
-            index = list(self.selected_data)
-            self._layerSelectionCopy = {
-                'data': [
-                    deepcopy(layer._data_view.shapes[i])
-                    for i in layer._selected_data
-                ],
-                'edge_color': deepcopy(layer._data_view._edge_color[index]),
-                'face_color': deepcopy(layer._data_view._face_color[index]),
-                'features': deepcopy(layer.features.iloc[index]),
-                'indices': layer._slice_indices,
-                'text': layer.text._copy(index),  # abb 202402 un-commented
-            }
-            
-            # abb remove 202402
-            # if len(layer.text.values) == 0:
-            #     self._layerSelectionCopy['text'] = np.empty(0)
-            # else:
-            #     try:
-            #         self._layerSelectionCopy['text'] = deepcopy(layer.text.values[index])
-            #     except (IndexError) as e:
-            #         logger.error(f'I DO NOT UNDERSTAND HOW TO FIX THIS! {e}')
-            #         self._layerSelectionCopy['text'] = np.empty(0)
-        else:
-            self._layerSelectionCopy = {}
+        if len(selectedData) == 0:
+            return {}
+
+        layer = self._layer
+        index = sorted(selectedData)
+        shapes = [deepcopy(layer._data_view.shapes[i]) for i in index]
+        # packed vertices to diff and undo a change, see mmUndo
+        vertices, offsets = packVertices([shape.data for shape in shapes])
+        layerCopy = {
+            'rows': np.asarray(index, dtype=np.intp),
+            'data': shapes,
+            'vertices': vertices,
+            'offsets': offsets,
+            'edge_color': layer._data_view._edge_color[index],
+            'face_color': layer._data_view._face_color[index],
+            'features': layer.features.iloc[index],
+            'indices': _getSliceIndices(layer),
+            'text': layer.text._copy(index),  # abb 202402 un-commented
+        }
+        
+        # abb remove 202402
+        # if len(layer.text.values) == 0:
+        #     self._layerSelectionCopy['text'] = np.empty(0)
+        # else:
+        #     try:
+        #         self._layerSelectionCopy['text'] = deepcopy(layer.text.values[index])
+        #     except (IndexError) as e:
+        #         logger.error(f'I DO NOT UNDERSTAND HOW TO FIX THIS! {e}')
+        #         self._layerSelectionCopy['text'] = np.empty(0)
+        return layerCopy
+
+    def _getItemVertices(self, rows : np.ndarray) -> tuple:
+        """Get the vertices of shapes packed in one array, see packVertices().
+        """
+        shapes = self._layer._data_view.shapes
+        return packVertices([shapes[row].data for row in rows])
+
+    def _setItemVertices(self, rows : np.ndarray, vertices : np.ndarray, offsets : np.ndarray):
+        """Set the vertices of shapes, used by undo.
+
+        When each shape only moved (undo of a drag), all shapes are shifted
+        with one update of the layer mesh, see _shiftItems().
+        Otherwise each shape is edited.
+        The layer is refreshed once.
+
+        Args:
+            rows: shapes to set
+            vertices, offsets: new vertices of each shape, see packVertices()
+        """
+        layer = self._layer
+        currentVertices, currentOffsets = self._getItemVertices(rows)
+        shifted = False
+        if np.array_equal(offsets, currentOffsets) and len(rows) > 0:
+            shift = vertices - currentVertices
+            shapeShift = shift[offsets[:-1]]  # shift of first vertex of each shape
+            isTranslation = np.allclose(shift, np.repeat(shapeShift, np.diff(offsets), axis=0))
+            if isTranslation:
+                shifted = self._shiftItems(rows, shapeShift)
+        if not shifted:
+            for i, row in enumerate(rows):
+                layer._data_view.edit(row, vertices[offsets[i]:offsets[i+1]])
+        layer.refresh()
+
+    def _shiftItems(self, rows : np.ndarray, shapeShift : np.ndarray) -> bool:
+        """Translate shapes with one update of the layer mesh.
+
+        Same result as napari ShapeList.shift() for each shape, but the mesh
+        and vertex arrays of the layer are updated once for all shapes.
+
+        Args:
+            rows: shapes to move
+            shapeShift: (len(rows), ndim) translation of each shape
+
+        Returns:
+            False if shapes were not moved, e.g. a shift in a dimension
+                that is not displayed or this napari is not one we know
+                the ShapeList mesh layout of.
+        """
+        if not _shapesMeshShift:
+            return False
+        layer = self._layer
+        try:
+            dataView = layer._data_view
+            dimsDisplayed = _getDimsDisplayed(layer)
+            mesh = dataView._mesh
+            meshShapeIndex = mesh.vertices_index[:, 0]
+            vertexShapeIndex = dataView._index
+        except (AttributeError) as e:
+            logger.warning(f'shifting shapes one by one: {e}')
+            return False
+
+        notDisplayed = np.ones(shapeShift.shape[1], dtype=bool)
+        notDisplayed[dimsDisplayed] = False
+        if np.any(shapeShift[:, notDisplayed]):
+            return False
+
+        displayedShift = shapeShift[:, dimsDisplayed]
+        shiftTable = np.zeros((dataView.nshapes, len(dimsDisplayed)))
+        shiftTable[rows] = displayedShift
+
+        # shape objects hold their own vertices, face and edge triangulation
+        shapes = dataView.shapes
+        for row, oneShift in zip(rows, displayedShift):
+            shapes[row].shift(oneShift)
+
+        # one pass over all mesh vertices, edge offsets do not change
+        meshShift = shiftTable[meshShapeIndex]
+        mesh.vertices += meshShift
+        mesh.vertices_centers += meshShift
+        dataView._vertices += shiftTable[vertexShapeIndex]
+        dataView._update_displayed()
+        return True
 
     def _paste_data(self, layerSelectionCopy=None):
         """Paste any shapes from clipboard and then selects them.
@@ -1267,10 +1861,14 @@ class shapesLayer(mmLayer):
         cur_shapes = layer.nshapes
         if len(_clipboard.keys()) > 0:
             # Calculate offset based on dimension shifts
-            offset = [
-                layer._slice_indices[i] - _clipboard['indices'][i]
-                for i in layer._dims_not_displayed
-            ]
+            sliceIndices = _getSliceIndices(layer)
+            if sliceIndices is not None and _clipboard['indices'] is not None:
+                offset = [
+                    sliceIndices[i] - _clipboard['indices'][i]
+                    for i in layer._dims_not_displayed
+                ]
+            else:
+                offset = [0] * len(layer._dims_not_displayed)
 
             layer._feature_table.append(_clipboard['features'])
 
@@ -1335,7 +1933,7 @@ class shapesPathLayer(shapesLayer):
 
     def addAnnotation(self, coords, event = None):
         if event is not None:
-            print('calling _shapes_mouse_bindings()')
+            tracer.debug('calling _shapes_mouse_bindings()')
             
             # oct 17, was this
             # _shapes_mouse_bindings.vertex_insert(self._layer, event)
@@ -1371,6 +1969,15 @@ class labelLayer(QtCore.QObject):
         # for label layer, this is an integer (not a set)
         self._selected_label = self._layer.selected_label
 
+        self._labelStats = None
+        # area/centroid/bbox of each label, built on first use, see _getLabelStats()
+
+        self._historyLength = self._getHistoryLength()
+        # (undo, redo) length of layer paint history, to detect undo/redo
+
+        self._dataVersion = 0
+        # incremented on each change to label data (paint, fill, undo, new data)
+
         # just show one selected label (hide all others)
         #self._layer.show_selected_label = True
         
@@ -1393,12 +2000,12 @@ class labelLayer(QtCore.QObject):
         selected_label = self._layer.selected_label # int
         
         if selected_label == self._selected_label:
-            print('  no new label selection')
+            tracer.debug('no new label selection')
             return
 
         self._selected_label = selected_label
-        print('  _selected_label:', self._selected_label)
-        
+        tracer.debug('_selected_label:%s', self._selected_label)
+
         #properties = self.getDataFrame()
 
         #print('  properties:')
@@ -1414,7 +2021,7 @@ class labelLayer(QtCore.QObject):
         self._selected_label = event.source._selected_label  # int
 
         properties = self.getDataFrame()
-        print('  -->> emit "select"')
+        tracer.debug('-->> emit "select"\n%s', properties)
         # in label layer we will only every select one label
         # signal/slot expects a list
         selectedLabelList = [self._selected_label]
@@ -1429,38 +2036,145 @@ class labelLayer(QtCore.QObject):
         logger.info('label layer')
         return self.getDataFrame(getFull=True)
 
-    def getDataFrame(self, getFull=False) -> pd.DataFrame:
-        # self._layer.features gives us a (features, properties) pandas dataframe !!!
+    def _getHistoryLength(self):
+        return (len(self._layer._undo_history), len(self._layer._redo_history))
+
+    def _getLabelStats(self) -> labelStats:
+        """Get stats of all labels, build them if needed.
+        """
+        if self._labelStats is None:
+            logger.info(f'building label stats for data shape {self._layer.data.shape}')
+            _labelStats = labelStats(self._layer.data.ndim)
+            _labelStats.build(self._layer.data)
+            self._labelStats = _labelStats
+        return self._labelStats
+
+    def setLabelStats(self, _labelStats : labelStats, dataVersion : int):
+        """Set label stats that were built outside of _getLabelStats().
+
+        Args:
+            _labelStats: stats of all labels
+            dataVersion: getDataVersion() when the build started,
+                if data has changed since then, stats are not used
+        """
+        if dataVersion != self._dataVersion:
+            logger.info('label data changed while building stats, not using them')
+            return
+        self._labelStats = _labelStats
+
+    def getDataVersion(self) -> int:
+        """Get a number that changes each time label data changes.
+        """
+        return self._dataVersion
+
+    def slot_paint(self, event):
+        """Update label stats for labels touched by paint or fill.
         
+        event.value is a list of (indices, old values, new value)
+        """
+        self._dataVersion += 1
+        self._historyLength = self._getHistoryLength()
+        if self._labelStats is None:
+            return
+        touchedLabels = self._labelStats.updateFromPaint(self._layer.data, event.value)
+        logger.info(f'updated stats of labels {touchedLabels}')
+
+    def slot_set_data(self, event):
+        """Invalidate label stats on undo/redo.
+        
+        Napari undo/redo does not emit a paint event, we see it as a change
+        in history length. set_data is also emitted when the slice changes,
+        then the history is the same and we keep the stats.
+        """
+        historyLength = self._getHistoryLength()
+        if historyLength == self._historyLength:
+            return
+        self._historyLength = historyLength
+        self._dataVersion += 1
+        if self._labelStats is not None:
+            logger.info('label history changed, label stats will be rebuilt')
+            self._labelStats = None
+
+    def slot_data(self, event):
+        """Layer data was replaced, invalidate label stats.
+        """
+        self._dataVersion += 1
+        self._labelStats = None
+
+    @profileStage('layer.getDataFrame', numBytes=_resultBytes)
+    def getDataFrame(self, getFull=False) -> pd.DataFrame:
         logger.info(f'label layer getFull:{getFull}')
 
-        dfFeatures = self._layer.features  # all features
+        _labelStats = self._getLabelStats()
 
+        # label 0 is background, not a label
         if getFull:
-            #selectedList = range(len(self._layer.data))
-            # TODO (cudmore) consider keeeping track of this as a member _numLabels
-            selectedList = np.unique(self._layer.data).tolist()  # list
-        else:
+            selectedList = _labelStats.labels().tolist()
+        elif self._selected_label != 0:
             selectedList = [self._selected_label]  # int
+        else:
+            selectedList = []
 
-        # label index is 1 based, add one to list
-        # TODO (cudmore) our data model does not work with row labels 1,2,3,...
-        #  it s expecting row index 0 to be preesent
-        #  need to switch over all .iLoc[] to .loc[] or similar
-        '''
-        if selectedList:
-            selectedList = selectedList[0:-1]
-            selectedList = [index+1 for index in selectedList]
-        '''
-        # drop 0 from list
-        zeroIndex = selectedList.index(0)
-        if zeroIndex is not None:
-            logger.info('removing 0 from list, label layer starts at 1')
-            del selectedList[zeroIndex]
+        return self._makeDataFrame(selectedList, _labelStats)
+
+    def iterDataFrame(self, slabSize : int = 4):
+        """Build label stats one slab at a time, yield rows as labels are finished.
 
-        #print('  selectedList:', selectedList)
-        #print('  dfFeatures:')
-        #pprint(dfFeatures)
+        Designed to run in a worker thread (see LayerTablePlugin),
+        stops early if label data changes while building.
+
+        Args:
+            slabSize: number of planes along axis 0 in each slab
+
+        Yields:
+            (pd.DataFrame, float) rows of finished labels and fraction of data done
+
+        Returns:
+            (labelStats, int) stats and data version for setLabelStats(),
+                None if label data changed
+        """
+        dataVersion = self._dataVersion
+        _labelStats = labelStats(self._layer.data.ndim)
+        for finishedLabels, fraction in _labelStats.iterBuild(self._layer.data, slabSize):
+            if dataVersion != self._dataVersion:
+                logger.info('label data changed, stopping')
+                return None
+            yield self._makeDataFrame(finishedLabels.tolist(), _labelStats), fraction
+        return _labelStats, dataVersion
+
+    def _getLabelColors(self, labelList : List[int]) -> np.ndarray:
+        """Get (N, 4) rgba color of labels, like layer get_color() for each label.
+        """
+        colormap = self._layer.colormap
+        labelArray = np.asarray(labelList, dtype=np.int64)
+        if labelArray.size == 0:
+            return np.zeros((0, 4))
+        try:
+            colorList_rgba = np.array(colormap.map(labelArray), dtype=float).reshape(-1, 4)
+            backgroundColor = colormap.map(colormap.background_value)
+        except (AttributeError):
+            # older napari label colormaps do not have map() and background_value
+            return self._getLabelColorsOneByOne(labelArray)
+        if self._layer.show_selected_label:
+            notSelected = labelArray != self._layer.selected_label
+            colorList_rgba[notSelected] = backgroundColor
+        return colorList_rgba
+
+    def _getLabelColorsOneByOne(self, labelArray : np.ndarray) -> np.ndarray:
+        """Get (N, 4) rgba color of labels with layer get_color(), one label at a time.
+        """
+        colorList_rgba = np.zeros((len(labelArray), 4))
+        for idx, label in enumerate(labelArray.tolist()):
+            oneColor = self._layer.get_color(label)
+            if oneColor is not None:
+                colorList_rgba[idx] = oneColor
+        return colorList_rgba
+
+    def _makeDataFrame(self, selectedList : List[int], _labelStats : labelStats) -> pd.DataFrame:
+        """Make table rows for a list of labels.
+        """
+        # self._layer.features gives us a (features, properties) pandas dataframe !!!
+        dfFeatures = self._layer.features  # all features
 
         if len(dfFeatures) == 0:
             dfFeatures = pd.DataFrame(index=selectedList)
@@ -1470,31 +2184,14 @@ class labelLayer(QtCore.QObject):
 
         df.loc[selectedList, "label"] = selectedList
 
-        # TODO (cudmore) add z/y/x as mean of pixels in label
-        
-        # TODO (cudmore add color with layer get_color(idx) as 'Face Color'
-        colorList_rgba = [self._layer.get_color(index)
-                        for index in selectedList]
-        
-        if selectedList:
-            colorList_rgba[0] = (1., 1., 1., 1.)  # index 0 is not actually a label (it selects all)
-        # use str(rgb_to_hex(oneColor)[0])
-        colorList_hex = [str(rgb_to_hex(oneColor)[0])
-                        for oneColor in colorList_rgba]
-
-        #print('  colorList_hex:', colorList_hex)
+        colorList_rgba = self._getLabelColors(selectedList)
+        colorList_hex = rgbaToHex(colorList_rgba).astype(object)
         df.loc[selectedList, "Face Color"] = colorList_hex
 
-        # abb cudmore baltimore, adding region props to table
-        # Note: region props does not return row 0
-        _properties = ['label', 'centroid', 'area']  # 'solidity' gives convex-hull error
-        props_dict = regionprops_table(self._layer.data, properties=_properties)
-        dfProps = pd.DataFrame(props_dict)
-        # rename some columns
-        dfProps = dfProps.rename(columns={'centroid-0': 'z', 'centroid-1': 'y', 'centroid-2': 'z'})
-
-        #print('df:')
-        #pprint(df)
+        # area, centroid (z, y, x) and bbox from label stats
+        dfStats = _labelStats.getDataFrame(selectedList)
+        for column in dfStats.columns:
+            df[column] = dfStats[column]
 
         return df
 
@@ -1507,6 +2204,9 @@ class labelLayer(QtCore.QObject):
     def _connectLayer(self, layer=None):
         self._layer.events.name.connect(self.slot_user_edit_name)
         self._layer.events.selected_label.connect(self.slot_selected_label)
+        self._layer.events.paint.connect(self.slot_paint)
+        self._layer.events.set_data.connect(self.slot_set_data)
+        self._layer.events.data.connect(self.slot_data)
 
 
     def selectItems(self, selectedRowSet : set):
@@ -1526,4 +2226,7 @@ class labelLayer(QtCore.QObject):
 
     def doUndo(self):
         #self._undo.doUndo()
+        pass
+
+    def doRedo(self):
         pass
\ No newline at end of file
@@ -1,6 +1,24 @@
+"""
+Package logger and per subsystem tracers.
+
+Tracers are child loggers of `logger` ('layer', 'model', 'widget') used for
+verbose diagnostics (selections, DataFrames) in event handlers.
+Trace messages are logged at DEBUG with %-style args so nothing is formatted
+unless the tracer is enabled, e.g. `tracer.debug('df:\\n%s', df)`.
+
+Enable tracing without code edits with the environment variable
+
+    NAPARI_LAYER_TABLE_TRACE=layer=DEBUG,model=DEBUG
+    NAPARI_LAYER_TABLE_TRACE=DEBUG  # all tracers
+
+or at run time with setTraceLevel('layer', 'DEBUG').
+"""
 import logging
+import os
 import sys
 
+from typing import Union
+
 # default logging level
 logging_level = logging.INFO
 
@@ -9,10 +27,57 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging_level)
 
 handler = logging.StreamHandler(sys.stdout)
-handler.setLevel(logging_level)
+# level is set on loggers, handler passes everything they let through (e.g. tracers at DEBUG)
+handler.setLevel(logging.NOTSET)
 #formatter = logging.Formatter('%(asctime)s - %(levelname)7s - %(filename)s %(funcName)s() line:%(lineno)d -- %(message)s')
 #formatter = logging.Formatter('%(levelname)7s - %(filename)s %(className)s %(funcName)s() line:%(lineno)d -- %(message)s')
 formatter = logging.Formatter('%(levelname)7s - %(filename)s %(funcName)s() line:%(lineno)d -- %(message)s')
 handler.setFormatter(formatter)
 
 logger.addHandler(handler)
+
+traceSubsystems = ('layer', 'model', 'widget')
+
+traceEnvironmentVariable = 'NAPARI_LAYER_TABLE_TRACE'
+
+def getTracer(subsystem : str) -> logging.Logger:
+    """Get the tracer (child logger) of a subsystem.
+
+    Args:
+        subsystem: one of traceSubsystems
+    """
+    return logger.getChild(subsystem)
+
+def setTraceLevel(subsystem : str, level : Union[int, str]):
+    """Set the level of one tracer.
+
+    Args:
+        subsystem: one of traceSubsystems
+        level: logging level like logging.DEBUG or 'DEBUG'
+    """
+    if isinstance(level, str):
+        level = level.upper()
+    getTracer(subsystem).setLevel(level)
+
+def setTraceLevelsFromString(traceLevels : str):
+    """Set tracer levels from a string like 'layer=DEBUG,model=INFO'.
+
+    An entry without a subsystem (e.g. 'DEBUG') sets all tracers.
+    """
+    for oneEntry in traceLevels.split(','):
+        oneEntry = oneEntry.strip()
+        if not oneEntry:
+            continue
+        if '=' in oneEntry:
+            subsystem, level = oneEntry.split('=', 1)
+            subsystemList = [subsystem.strip()]
+        else:
+            level = oneEntry
+            subsystemList = traceSubsystems
+        for subsystem in subsystemList:
+            try:
+                setTraceLevel(subsystem, level.strip())
+            except (ValueError) as e:
+                logger.warning(f'{traceEnvironmentVariable}: {e}')
+
+setTraceLevelsFromString(os.environ.get(traceEnvironmentVariable, ''))
@@ -33,14 +33,19 @@ import napari
 
 from qtpy import QtWidgets, QtCore, QtGui
 
-from napari_layer_table._my_logger import logger
+from napari.qt.threading import create_worker
+
+from napari_layer_table._my_logger import logger, getTracer
 from napari_layer_table._table_widget import myTableView
-from napari_layer_table._data_model import pandasModel
+from napari_layer_table._data_model import pandasModel, virtualLayerModel
+from napari_layer_table._profiler import profileStage
 from typing import List, Set
 import warnings
 
 from napari_layer_table import _my_layer
 
+tracer = getTracer('widget')
+
 class LayerTablePlugin(QtWidgets.QWidget):
     acceptedLayers = (napari.layers.Points,
                         napari.layers.Shapes,
@@ -64,7 +69,9 @@ class LayerTablePlugin(QtWidgets.QWidget):
 
     def __init__(self, napari_viewer : napari.Viewer,
                     oneLayer=None,
-                    onAddCallback=None):
+                    onAddCallback=None,
+                    virtualModelRows : int = 200_000,
+                    workerLabelPixels : int = 2**24):
         """A widget to display a layer as a table.
         
         Allows bi-directional selection and editing.
@@ -76,6 +83,16 @@ class LayerTablePlugin(QtWidgets.QWidget):
             onAddCallback (func) function is called on shift+click
                 params(set, pd.DataFrame)
                 return Union[None, dict]
+                Optional keywords 'coords' and 'myLayer', see mmLayer.
+            virtualModelRows (int): Points and shapes layers with at least
+                this many items are shown with a virtualLayerModel that reads
+                rows from the layer as they are displayed. Pass None to never
+                use it. Sorting by column is turned off in this mode, a sort
+                would fetch every row.
+            workerLabelPixels (int): Labels layers with at least this many
+                pixels build their table in a worker thread, rows are added
+                as labels are finished. Pass None to always build in the
+                Qt event loop.
 
         Raises:
             ValueError: If napari_viewer does not have a valid selected layer.
@@ -96,6 +113,13 @@ class LayerTablePlugin(QtWidgets.QWidget):
         )
 
         self._viewer = napari_viewer
+
+        self._virtualModelRows = virtualModelRows
+
+        self._workerLabelPixels = workerLabelPixels
+        self._labelWorker = None
+        # napari GeneratorWorker building a label table, see _startLabelWorker()
+        self._labelWorkerHasModel = False
         
         if oneLayer is None:
             oneLayer = self._findActiveLayers()
@@ -132,6 +156,7 @@ class LayerTablePlugin(QtWidgets.QWidget):
         self._showProperties = True  # Toggle point properties columns
         self._showCoordinates = True  # Toggle point coordinates columns (z,y,x)
         self._shift_click_for_new = False  # Toggle new points on shift+click
+        self._showVisibleOnly = False  # Toggle only rows of items in view
         #self._showFaceColor = True
         
         # If True, will not switch to different layer
@@ -168,6 +193,7 @@ class LayerTablePlugin(QtWidgets.QWidget):
         """
         self._myLayer.newOnShiftClick(on)
 
+    @profileStage('widget.slot2_layer_data_change')
     def slot2_layer_data_change(self, action :str,
                         selection : set,
                         layerSelectionCopy : dict,
@@ -227,6 +253,10 @@ class LayerTablePlugin(QtWidgets.QWidget):
         else:
             logger.info(f'did not understand action: "{action}"')
 
+        if self._showVisibleOnly and action in ('add', 'delete', 'change'):
+            # items moved in or out of view
+            self.slot_view_changed(None)
+
     def slot2_layer_name_change(self, name :str):
         #logger.info(f'name is now: {name}')
         self.layerNameLabel.setText(name)
@@ -274,10 +304,46 @@ class LayerTablePlugin(QtWidgets.QWidget):
         self.layerNameLabel = QtWidgets.QLabel('')
         controls_hbox_layout.addWidget(self.layerNameLabel, alignment=QtCore.Qt.AlignLeft)
 
+        # only show items in the current slice and canvas
+        self.visibleOnlyCheckBox = QtWidgets.QCheckBox('Visible only')
+        self.visibleOnlyCheckBox.setToolTip('Only show items in the current slice and in view')
+        self.visibleOnlyCheckBox.setEnabled(hasattr(self._myLayer, 'getVisibleItems'))
+        self.visibleOnlyCheckBox.stateChanged.connect(self.on_visible_only_checkbox)
+        controls_hbox_layout.addWidget(self.visibleOnlyCheckBox, alignment=QtCore.Qt.AlignLeft)
+
+        # one table update per frame while the view changes
+        self._visibleTimer = QtCore.QTimer(self)
+        self._visibleTimer.setSingleShot(True)
+        self._visibleTimer.setInterval(16)  # ms, about one frame at 60 Hz
+        self._visibleTimer.timeout.connect(self.on_visible_timer)
+
         controls_hbox_layout.addStretch()
 
+        # progress of building table in a worker thread (labels layer)
+        self.progressBar = QtWidgets.QProgressBar()
+        self.progressBar.setRange(0, 100)
+        self.progressBar.setMaximumWidth(120)
+        self.progressBar.setToolTip('Building table')
+        self.progressBar.hide()
+        controls_hbox_layout.addWidget(self.progressBar, alignment=QtCore.Qt.AlignRight)
+
         vbox_layout.addLayout(controls_hbox_layout)
 
+        # only show rows matching a pandas expression
+        self.queryEdit = QtWidgets.QLineEdit()
+        self.queryEdit.setPlaceholderText("Filter rows, e.g. accept == 'Yes' and z > 10")
+        self.queryEdit.setToolTip('pandas expression over table columns,\n'
+                                    'quote columns with spaces in backticks, e.g. `Face Color`')
+        self.queryEdit.setClearButtonEnabled(True)
+        self.queryEdit.textChanged.connect(self.on_query_edit)
+        vbox_layout.addWidget(self.queryEdit)
+
+        # filter once typing pauses, not on every key
+        self._queryTimer = QtCore.QTimer(self)
+        self._queryTimer.setSingleShot(True)
+        self._queryTimer.setInterval(200)  # ms
+        self._queryTimer.timeout.connect(self.on_query_timer)
+
         self.myTable2 = myTableView()
         #self.myTable2.setFontSize(11)
         # to pass selections in table back to the viewer
@@ -292,6 +358,68 @@ class LayerTablePlugin(QtWidgets.QWidget):
         # finalize
         self.setLayout(vbox_layout)
 
+    def on_query_edit(self, text : str):
+        self._queryTimer.start()
+
+    def on_query_timer(self):
+        """Filter table rows with the query, after typing paused.
+        """
+        query = self.queryEdit.text()
+        isValid = self.myTable2.mySetRowQuery(query)
+        self.queryEdit.setStyleSheet('' if isValid else 'color: red')
+        if isValid:
+            # keep the layer selection that is still shown
+            self.selectInTable(self._myLayer.selected_data)
+
+    def on_visible_only_checkbox(self, state : int):
+        self.setShowVisibleOnly(bool(state))
+
+    def _getViewEvents(self) -> list:
+        """Viewer events that change what is in view.
+        """
+        dims = self._viewer.dims
+        camera = self._viewer.camera
+        return [dims.events.current_step, dims.events.ndisplay, dims.events.order,
+                camera.events.center, camera.events.zoom]
+
+    def setShowVisibleOnly(self, visibleOnly : bool):
+        """Only show rows of items in the current slice and canvas of the viewer.
+
+        Visible items are found with the layer spatial index
+        (see mmLayer.getVisibleItems) when the slice, camera or items change.
+        """
+        if visibleOnly == self._showVisibleOnly:
+            return
+        self._showVisibleOnly = visibleOnly
+        for event in self._getViewEvents():
+            if visibleOnly:
+                event.connect(self.slot_view_changed)
+            else:
+                event.disconnect(self.slot_view_changed)
+
+        if visibleOnly:
+            self.on_visible_timer()
+        else:
+            self._visibleTimer.stop()
+            self.myTable2.mySetVisibleRows(None)
+            self.selectInTable(self._myLayer.selected_data)
+
+    def slot_view_changed(self, event):
+        # at most one update per frame, also while panning
+        if not self._visibleTimer.isActive():
+            self._visibleTimer.start()
+
+    def on_visible_timer(self):
+        """Show only rows of visible items.
+        """
+        if not self._showVisibleOnly:
+            return
+        visibleRows = self._myLayer.getVisibleItems()
+        tracer.debug('%s visible items', len(visibleRows))
+        self.myTable2.mySetVisibleRows(visibleRows)
+        # keep the layer selection that is still shown
+        self.selectInTable(self._myLayer.selected_data)
+
     def _findActiveLayers(self):
         """Find pre-existing selected layer.
         """
@@ -413,10 +541,115 @@ class LayerTablePlugin(QtWidgets.QWidget):
             Should only be used on table creation and layer switching.
             Do not use for edits like add, delete, change/move.
         """
+        self._cancelLabelWorker()
+
+        if self._useLabelWorker():
+            # rows are added as the worker finishes labels
+            self._startLabelWorker()
+            return
+
+        if self._useVirtualModel():
+            # do not build a DataFrame, rows are fetched as they are shown
+            logger.info(f'using virtual model for {self._myLayer.numItems()} items')
+            myModel = virtualLayerModel(self._myLayer)
+            self.myTable2.mySetModel(myModel)
+            # sorting would fetch every row
+            self.myTable2.mySetSortingEnabled(False)
+            return
+
         #layerDataFrame = self.getLayerDataFrame()
         layerDataFrame = self._myLayer.getDataFrame(getFull=True)
         self._refreshTableData(layerDataFrame)
 
+    def _useVirtualModel(self) -> bool:
+        """True if refresh() should use a virtualLayerModel.
+        """
+        if self._virtualModelRows is None:
+            return False
+        if not isinstance(self._myLayer, _my_layer.mmLayer):
+            # label layer rows are not layer indices
+            return False
+        return self._myLayer.numItems() >= self._virtualModelRows
+
+    def _useLabelWorker(self) -> bool:
+        """True if refresh() should build the table in a worker thread.
+        """
+        if self._workerLabelPixels is None:
+            return False
+        if not isinstance(self._myLayer, _my_layer.labelLayer):
+            return False
+        return self._myLayer._layer.data.size >= self._workerLabelPixels
+
+    def _startLabelWorker(self):
+        """Build label table in a worker thread, one slab at a time.
+
+        The first rows set a new model, later rows are appended to it.
+        """
+        logger.info(f'building label table in worker thread')
+        worker = create_worker(self._myLayer.iterDataFrame, _start_thread=False)
+        worker.yielded.connect(lambda value: self.slot_label_worker_yielded(worker, value))
+        worker.returned.connect(lambda result: self.slot_label_worker_returned(worker, result))
+        worker.finished.connect(lambda: self.slot_label_worker_finished(worker))
+        self._labelWorker = worker
+        self._labelWorkerHasModel = False
+
+        self.progressBar.setValue(0)
+        self.progressBar.show()
+        worker.start()
+
+    def _cancelLabelWorker(self):
+        """Ask the label worker to stop, its pending rows are ignored.
+        """
+        if self._labelWorker is None:
+            return
+        logger.info('cancel label worker')
+        self._labelWorker.quit()
+        self._labelWorker = None
+        self.progressBar.hide()
+
+    def slot_label_worker_yielded(self, worker, value):
+        """Add rows of labels finished by the worker.
+
+        Args:
+            value: (pd.DataFrame, float) rows and fraction done
+        """
+        if worker is not self._labelWorker:
+            # cancelled
+            return
+        df, fraction = value
+        if not self._labelWorkerHasModel:
+            myModel = pandasModel(df)
+            self.myTable2.mySetModel(myModel)
+            # sorting would re-sort on every insert
+            self.myTable2.mySetSortingEnabled(False)
+            self._labelWorkerHasModel = True
+        else:
+            self.myTable2.myModel.myAppendRow(df)
+        self.progressBar.setValue(int(fraction * 100))
+
+    def slot_label_worker_returned(self, worker, result):
+        """Keep label stats, or start again if label data changed while building.
+
+        Args:
+            result: (labelStats, int) or None, see labelLayer.iterDataFrame()
+        """
+        if worker is not self._labelWorker:
+            return
+        self._labelWorker = None
+        self.progressBar.hide()
+        if result is None or result[1] != self._myLayer.getDataVersion():
+            logger.info('label data changed while building table, starting again')
+            self.refresh()
+            return
+        self._myLayer.setLabelStats(*result)
+        self.myTable2.mySetSortingEnabled(True)
+
+    def slot_label_worker_finished(self, worker):
+        if worker is self._labelWorker:
+            # aborted or errored
+            self._labelWorker = None
+            self.progressBar.hide()
+
     def _refreshTableData(self, df : pd.DataFrame):
         """Refresh all data in table by setting its data model from provided dataframe.
 
@@ -432,11 +665,11 @@ class LayerTablePlugin(QtWidgets.QWidget):
             return
         
         logger.info(f'Full refresh ... limit use of this')
-        logger.info(f'refreshing from df:')
-        print(df)
+        tracer.debug('refreshing from df:\n%s', df)
 
         myModel = pandasModel(df)
         self.myTable2.mySetModel(myModel)
+        self.myTable2.mySetSortingEnabled(True)
 
     def contextMenuEvent(self, event):
         """Show a context menu on mouse right-click.
@@ -529,6 +762,7 @@ class LayerTablePlugin(QtWidgets.QWidget):
         else:
             logger.warning(f'did not understand columnType:{columnType}')
 
+    @profileStage('widget.selectInTable')
     def selectInTable(self, selected_data : Set[int]):
         """Select in table in response to viewer (add, highlight).
         
@@ -539,7 +773,8 @@ class LayerTablePlugin(QtWidgets.QWidget):
             #self._blockDeleteFromTable = False
             return
         
-        logger.info(f'selected_data: {selected_data}')
+        logger.info(f'numSelected: {len(selected_data)}')
+        tracer.debug('selected_data:%s', selected_data)
 
         self.myTable2.mySelectRows(selected_data)
 
@@ -554,7 +789,8 @@ class LayerTablePlugin(QtWidgets.QWidget):
             #self._blockDeleteFromTable = False
             return
 
-        logger.info(f'selectedRowList: {selectedRowList} isAlt:{isAlt}')
+        logger.info(f'numSelected: {len(selectedRowList)} isAlt:{isAlt}')
+        tracer.debug('selectedRowList:%s', selectedRowList)
         
         selectedRowSet = set(selectedRowList)
 
@@ -575,13 +811,7 @@ class LayerTablePlugin(QtWidgets.QWidget):
     def slot_editingRows(self, rowList : List[int], df : pd.DataFrame):
         """Respond to user editing table rows.
         """
-        logger.info('  CONNECTED TO self.myTable2.mtv_signalEditingRows')
-        logger.info('  received rowList and df as follows')
-        print('  rowList:', rowList)
-        print('  df:')
-        print(df)
-        
-        logger.info(f'  -->> NOW emit ltp_signalEditedRows')
+        tracer.debug('-->> emit ltp_signalEditedRows rowList:%s\n%s', rowList, df)
         
         self.ltp_signalEditedRows.emit(rowList, df)
         
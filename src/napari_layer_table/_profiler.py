@@ -0,0 +1,227 @@
+"""
+Opt-in profiler for the layer <-> table event pipeline.
+
+Stages are timed by decorating functions with profileStage('layer.getDataFrame').
+When the profiler is disabled (default) a decorated function only pays for one
+attribute check.
+
+Enable without code edits with the environment variable
+
+    NAPARI_LAYER_TABLE_PROFILE=1
+
+or from the 'Layer Table Profiler' dock widget (see profilerWidget).
+"""
+
+import functools
+import json
+import os
+import time
+
+from collections import deque
+from typing import Callable, Union
+
+import numpy as np
+import pandas as pd
+
+from qtpy import QtCore, QtWidgets
+
+from napari_layer_table._my_logger import logger
+
+profileEnvironmentVariable = 'NAPARI_LAYER_TABLE_PROFILE'
+
+def numBytesOf(obj) -> int:
+    """Number of bytes held by numpy arrays and DataFrames in obj.
+
+    Dict, list and tuple are searched, other objects count as 0.
+    """
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    elif isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(np.sum(obj.memory_usage(index=True)))
+    elif isinstance(obj, dict):
+        return sum(numBytesOf(value) for value in obj.values())
+    elif isinstance(obj, (list, tuple)):
+        return sum(numBytesOf(value) for value in obj)
+    return 0
+
+class _stageStats():
+    def __init__(self, maxSamples : int):
+        self.count = 0
+        self.totalSeconds = 0.0
+        self.maxSeconds = 0.0
+        self.numBytes = 0
+        self.samples = deque(maxlen=maxSamples)  # most recent durations (s)
+
+class stageProfiler():
+    def __init__(self, maxSamples : int = 4096):
+        """Per stage call counts, durations and bytes copied.
+
+        Args:
+            maxSamples: number of most recent durations kept per stage
+                for percentiles. Count, total and max are over all calls.
+        """
+        self.enabled = False
+        self._maxSamples = maxSamples
+        self._stages = {}  # stage name -> _stageStats
+
+    def setEnabled(self, enabled : bool):
+        self.enabled = enabled
+
+    def clear(self):
+        """Remove all recorded stages.
+        """
+        self._stages = {}
+
+    def record(self, name : str, seconds : float, numBytes : int = 0):
+        """Record one call of a stage.
+
+        Args:
+            name: stage name like 'model.myAppendRow'
+            seconds: duration of the call
+            numBytes: bytes copied by the call
+        """
+        try:
+            stats = self._stages[name]
+        except (KeyError):
+            stats = _stageStats(self._maxSamples)
+            self._stages[name] = stats
+        stats.count += 1
+        stats.totalSeconds += seconds
+        stats.maxSeconds = max(stats.maxSeconds, seconds)
+        stats.numBytes += numBytes
+        stats.samples.append(seconds)
+
+    def getStats(self) -> dict:
+        """Get stats of each stage, durations are in ms.
+
+        Returns:
+            dict of stage name -> dict with keys
+                count, total_ms, p50_ms, p95_ms, max_ms, bytes
+        """
+        statsDict = {}
+        for name in sorted(self._stages.keys()):
+            stats = self._stages[name]
+            samples = np.fromiter(stats.samples, dtype=np.float64, count=len(stats.samples))
+            p50, p95 = np.percentile(samples, [50, 95]) if len(samples) else (np.nan, np.nan)
+            statsDict[name] = {
+                'count': stats.count,
+                'total_ms': stats.totalSeconds * 1000,
+                'p50_ms': float(p50) * 1000,
+                'p95_ms': float(p95) * 1000,
+                'max_ms': stats.maxSeconds * 1000,
+                'bytes': stats.numBytes,
+            }
+        return statsDict
+
+    def toJson(self, path : Union[str, None] = None) -> str:
+        """Export stats as JSON.
+
+        Args:
+            path: if not None, also write JSON to this file
+        """
+        jsonStr = json.dumps(self.getStats(), indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(jsonStr)
+            logger.info(f'saved profile of {len(self._stages)} stages to {path}')
+        return jsonStr
+
+profiler = stageProfiler()
+profiler.setEnabled(os.environ.get(profileEnvironmentVariable, '') not in ('', '0'))
+
+def profileStage(name : str, numBytes : Union[Callable, None] = None):
+    """Decorator to time each call of a function as a profiler stage.
+
+    Args:
+        name: stage name like 'layer._copy_data'
+        numBytes: optional func(result, *args, **kwargs) -> bytes copied by
+            the call, only called when the profiler is enabled
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            startSeconds = time.perf_counter()
+            result = func(*args, **kwargs)
+            seconds = time.perf_counter() - startSeconds
+            callBytes = numBytes(result, *args, **kwargs) if numBytes is not None else 0
+            profiler.record(name, seconds, callBytes)
+            return result
+        return wrapper
+    return decorator
+
+class profilerWidget(QtWidgets.QWidget):
+    _columns = ['stage', 'count', 'p50 (ms)', 'p95 (ms)', 'max (ms)', 'total (ms)', 'bytes']
+
+    def __init__(self, napari_viewer=None, refreshInterval : int = 1000):
+        """Dock panel to enable the profiler, view and export its stats.
+
+        Args:
+            napari_viewer: not used, given when opened from the napari plugin menu
+            refreshInterval: ms between table updates
+        """
+        super().__init__()
+
+        vbox_layout = QtWidgets.QVBoxLayout()
+
+        controls_hbox_layout = QtWidgets.QHBoxLayout()
+
+        self.enabledCheckBox = QtWidgets.QCheckBox('Profile')
+        self.enabledCheckBox.setChecked(profiler.enabled)
+        self.enabledCheckBox.stateChanged.connect(self.on_enabled_checkbox)
+        controls_hbox_layout.addWidget(self.enabledCheckBox)
+
+        clearButton = QtWidgets.QPushButton('Clear')
+        clearButton.clicked.connect(self.on_clear_button)
+        controls_hbox_layout.addWidget(clearButton)
+
+        saveButton = QtWidgets.QPushButton('Save JSON')
+        saveButton.clicked.connect(self.on_save_button)
+        controls_hbox_layout.addWidget(saveButton)
+
+        controls_hbox_layout.addStretch()
+        vbox_layout.addLayout(controls_hbox_layout)
+
+        self.statsTable = QtWidgets.QTableWidget(0, len(self._columns))
+        self.statsTable.setHorizontalHeaderLabels(self._columns)
+        self.statsTable.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        vbox_layout.addWidget(self.statsTable)
+
+        self.setLayout(vbox_layout)
+
+        self._refreshTimer = QtCore.QTimer(self)
+        self._refreshTimer.setInterval(refreshInterval)
+        self._refreshTimer.timeout.connect(self.refresh)
+        self._refreshTimer.start()
+
+        self.refresh()
+
+    def refresh(self):
+        """Show current profiler stats.
+        """
+        statsDict = profiler.getStats()
+        self.statsTable.setRowCount(len(statsDict))
+        for rowIdx, (name, stats) in enumerate(statsDict.items()):
+            rowValues = [name,
+                        f"{stats['count']}",
+                        f"{stats['p50_ms']:.3f}",
+                        f"{stats['p95_ms']:.3f}",
+                        f"{stats['max_ms']:.3f}",
+                        f"{stats['total_ms']:.1f}",
+                        f"{stats['bytes']:,}"]
+            for colIdx, value in enumerate(rowValues):
+                self.statsTable.setItem(rowIdx, colIdx, QtWidgets.QTableWidgetItem(value))
+
+    def on_enabled_checkbox(self, state):
+        profiler.setEnabled(state == QtCore.Qt.Checked)
+
+    def on_clear_button(self):
+        profiler.clear()
+        self.refresh()
+
+    def on_save_button(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Save profile',
+                                    'layer_table_profile.json', 'JSON (*.json)')
+        if path:
+            profiler.toJson(path)
@@ -0,0 +1,213 @@
+"""
+Spatial index of layer items, to find the items in view or near a point
+without a full scan.
+
+Items are kept sorted along one axis (e.g. z of a 3D stack), a slab of that
+axis is found with a binary search and only the slab is tested on the other axes.
+"""
+
+import numpy as np
+
+from napari_layer_table._my_logger import logger
+
+class spatialIndex():
+    def __init__(self, positions : np.ndarray, sortAxis : int = 0):
+        """Index of item positions sorted along one axis.
+
+        Updated in place on add, move and delete, each is a few vectorized
+        passes over the sorted arrays, no sort of all items.
+
+        Args:
+            positions: (numItems, ndim) position of each item, row is the item
+            sortAxis: axis to sort along, best is the axis most queries
+                restrict, e.g. the slice axis of a 3D stack
+        """
+        positions = np.asarray(positions, dtype=float)
+        if positions.ndim != 2:
+            positions = positions.reshape(len(positions), -1)
+        self._positions = positions.copy()
+        self._sortAxis = sortAxis
+
+        self._order = np.argsort(self._positions[:, sortAxis], kind='stable')
+        # item rows sorted by position along sortAxis
+        self._keys = self._positions[self._order, sortAxis]
+        # position along sortAxis of each item in self._order (sorted)
+
+    @property
+    def sortAxis(self) -> int:
+        return self._sortAxis
+
+    @property
+    def ndim(self) -> int:
+        return self._positions.shape[1]
+
+    def numItems(self) -> int:
+        return len(self._positions)
+
+    def getPositions(self, rows=None) -> np.ndarray:
+        """Get positions of some items, all items if rows is None.
+        """
+        if rows is None:
+            return self._positions
+        return self._positions[np.asarray(rows, dtype=np.int64)]
+
+    def _insertSorted(self, rows : np.ndarray):
+        """Insert items (already in self._positions) into the sorted order.
+        """
+        keys = self._positions[rows, self._sortAxis]
+        keyOrder = np.argsort(keys, kind='stable')
+        rows = rows[keyOrder]
+        keys = keys[keyOrder]
+        insertAt = np.searchsorted(self._keys, keys, side='right')
+        self._order = np.insert(self._order, insertAt, rows)
+        self._keys = np.insert(self._keys, insertAt, keys)
+
+    def _removeSorted(self, isRemoved : np.ndarray):
+        """Remove items from the sorted order.
+
+        Args:
+            isRemoved: bool per item
+        """
+        keep = ~isRemoved[self._order]
+        self._order = self._order[keep]
+        self._keys = self._keys[keep]
+
+    def addItems(self, positions : np.ndarray):
+        """Add items at the end, they are the last rows like in a napari layer.
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, self.ndim)
+        if len(positions) == 0:
+            return
+        firstRow = self.numItems()
+        self._positions = np.concatenate((self._positions, positions))
+        self._insertSorted(np.arange(firstRow, self.numItems(), dtype=np.int64))
+
+    def moveItems(self, rows, positions : np.ndarray):
+        """Set new positions of some items.
+
+        Args:
+            rows: items to move, no duplicates
+            positions: new position of each row, in the order of rows
+        """
+        rows = np.asarray(list(rows), dtype=np.int64)
+        if len(rows) == 0:
+            return
+        positions = np.asarray(positions, dtype=float).reshape(len(rows), self.ndim)
+        isMoved = np.zeros(self.numItems(), dtype=bool)
+        isMoved[rows] = True
+        self._removeSorted(isMoved)
+        self._positions[rows] = positions
+        self._insertSorted(rows)
+
+    def deleteItems(self, rows):
+        """Delete items, rows after them move up like in a napari layer.
+        """
+        rows = np.asarray(list(rows), dtype=np.int64)
+        if len(rows) == 0:
+            return
+        isDeleted = np.zeros(self.numItems(), dtype=bool)
+        isDeleted[rows] = True
+        self._removeSorted(isDeleted)
+        # new row is old row minus number of deleted rows before it
+        numDeletedBefore = np.cumsum(isDeleted)
+        self._order = self._order - numDeletedBefore[self._order]
+        self._positions = self._positions[~isDeleted]
+
+    def queryBox(self, lower, upper) -> np.ndarray:
+        """Get items inside a box, bounds included.
+
+        Args:
+            lower: lower bound of each axis, -np.inf for no bound
+            upper: upper bound of each axis, np.inf for no bound
+
+        Returns:
+            Sorted rows of items in the box.
+        """
+        lower = np.asarray(lower, dtype=float)
+        upper = np.asarray(upper, dtype=float)
+        axis = self._sortAxis
+        firstIdx = np.searchsorted(self._keys, lower[axis], side='left')
+        stopIdx = np.searchsorted(self._keys, upper[axis], side='right')
+        rows = self._order[firstIdx:stopIdx]
+
+        otherAxes = [oneAxis for oneAxis in range(self.ndim)
+                        if oneAxis != axis and (np.isfinite(lower[oneAxis])
+                                                or np.isfinite(upper[oneAxis]))]
+        if otherAxes:
+            slabPositions = self._positions[rows][:, otherAxes]
+            inBox = np.all((slabPositions >= lower[otherAxes])
+                            & (slabPositions <= upper[otherAxes]), axis=1)
+            rows = rows[inBox]
+        return np.sort(rows)
+
+    def _queryRadius(self, point : np.ndarray, radius : float) -> tuple:
+        """Items within radius of point with their distance, nearest first.
+        """
+        rows = self.queryBox(point - radius, point + radius)
+        distances = np.linalg.norm(self._positions[rows] - point, axis=1)
+        inRadius = distances <= radius
+        rows = rows[inRadius]
+        distances = distances[inRadius]
+        distanceOrder = np.argsort(distances, kind='stable')
+        return rows[distanceOrder], distances[distanceOrder]
+
+    def queryRadius(self, point, radius : float) -> np.ndarray:
+        """Get items within a euclidean distance of a point, bound included.
+
+        Args:
+            point: position with one value per axis
+            radius: max distance
+
+        Returns:
+            Rows of items in radius, nearest first.
+        """
+        point = np.asarray(point, dtype=float).reshape(self.ndim)
+        rows, _distances = self._queryRadius(point, radius)
+        return rows
+
+    def nearest(self, point, maxDistance : float = np.inf) -> tuple:
+        """Get the item nearest to a point.
+
+        Searches a box around point that doubles in size until it has an
+        item in radius, starting from the mean item spacing. Each step is
+        a binary search plus a test of the items in the slab of sortAxis.
+
+        Args:
+            point: position with one value per axis
+            maxDistance: ignore items further than this
+
+        Returns:
+            (row, distance), (None, np.inf) if no item is within maxDistance
+        """
+        numItems = self.numItems()
+        if numItems == 0:
+            return None, np.inf
+        point = np.asarray(point, dtype=float).reshape(self.ndim)
+        axis = self._sortAxis
+        firstKey = self._keys[0]
+        lastKey = self._keys[-1]
+        extent = lastKey - firstKey
+        radius = extent / numItems ** (1 / self.ndim) if extent > 0 else 1.0
+        while True:
+            radius = min(radius, maxDistance)
+            rows, distances = self._queryRadius(point, radius)
+            if len(rows):
+                return int(rows[0]), float(distances[0])
+            if radius >= maxDistance:
+                return None, np.inf
+            if point[axis] - radius <= firstKey and point[axis] + radius >= lastKey:
+                # box spans all items along sortAxis, nothing to gain by doubling
+                radius = maxDistance
+            else:
+                radius *= 2
+
+    def checkIntegrity(self) -> bool:
+        """True if the sorted order matches the positions, for tests and debugging.
+        """
+        isGood = (len(self._order) == self.numItems()
+                    and np.array_equal(np.sort(self._order), np.arange(self.numItems()))
+                    and np.array_equal(self._keys, self._positions[self._order, self._sortAxis])
+                    and np.all(np.diff(self._keys) >= 0))
+        if not isGood:
+            logger.error('spatial index is out of sync with its positions')
+        return isGood
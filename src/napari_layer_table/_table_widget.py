@@ -1,11 +1,13 @@
 from pprint import pprint
-from typing import Set, List
+from typing import Set, List, Union
 import numpy as np
 import pandas as pd
 
 from qtpy import QtCore, QtGui, QtWidgets
-from napari_layer_table._data_model import pandasModel
-from napari_layer_table._my_logger import logger
+from napari_layer_table._data_model import pandasModel, sortProxyModel, contiguousRanges, queryRowMask
+from napari_layer_table._my_logger import logger, getTracer
+
+tracer = getTracer('widget')
 
 class myTableView(QtWidgets.QTableView):
     """Table view to display list of points in a point layer.
@@ -35,6 +37,11 @@ class myTableView(QtWidgets.QTableView):
         self._toggleColOnAccept = 'accept'
         # Column to toggle on keyboard 'a'
 
+        self._rowQuery = ''
+        # only rows matching this pandas expression are shown, see mySetRowQuery()
+        self._visibleRows = None
+        # np.ndarray, only these model rows are shown, see mySetVisibleRows()
+
         self.setSizePolicy(QtWidgets.QSizePolicy.Expanding,
                             QtWidgets.QSizePolicy.Expanding)
 
@@ -94,13 +101,11 @@ class myTableView(QtWidgets.QTableView):
         logger.info(f'rowList:{rowList} col:{col}')
 
         # set the rows at col to True/False
-        _df = self.myModel.myGetData()
-
-        if not col in _df.columns:
+        if not col in self.myModel.myGetColumns():
             logger.warning(f'Did not find column "{col}" in model dataframe')
             return
         
-        df = _df.loc[rowList].copy()
+        df = self.myModel.myGetRows(rowList)
         colVals = df[col].tolist()
         for idx, colVal in enumerate(colVals):
             logger.info(f'  {idx} colVal:"{colVal}" {type(colVal)}')
@@ -147,25 +152,54 @@ class myTableView(QtWidgets.QTableView):
         self.resizeRowsToContents()
 
     def slot_editedRows(self, rowList : List[int], df : pd.DataFrame):
-        logger.info('received rowList and df as follows')
-        print('  rowList:', rowList)
-        print('  df:')
-        print(df)
+        tracer.debug('calling myModel.mySetRow() rowList:%s\n%s', rowList, df)
 
-        print('  after user change calling myModel.mySetRoww')
-        
         self.myModel.mySetRow(rowList, df)
 
     def _getRowSelection(self) -> List[int]:
         """Get the current row(s) selection.
+
+        Returns:
+            Sorted list of model rows.
         """
-        selectedIndexes = [self.proxy.mapToSource(modelIndex).row()
-                            for modelIndex in self.selectedIndexes()]
-        
-        # reduce to list of unique values
-        selectedIndexes = list(set(selectedIndexes))  # to get unique values
+        visualRows = self._getSelectedVisualRows()
+        return np.sort(self._mapToSourceRows(visualRows)).tolist()
+
+    def _getSelectedVisualRows(self) -> np.ndarray:
+        """Get selected visual (proxy) rows from the selection ranges.
+
+        Reads one QItemSelectionRange per contiguous block of rows,
+        not one QModelIndex per cell like selectedIndexes().
+        """
+        selectionModel = self.selectionModel()
+        if selectionModel is None:
+            return np.zeros(0, dtype=np.int64)
+        rowBlocks = [np.arange(selectionRange.top(), selectionRange.bottom() + 1)
+                        for selectionRange in selectionModel.selection()]
+        if not rowBlocks:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(rowBlocks))
+
+    def _mapToSourceRows(self, visualRows : np.ndarray) -> np.ndarray:
+        """Map visual (proxy) rows to model rows.
+        """
+        return self.proxy.mapRowsToSource(visualRows)
 
-        return selectedIndexes
+    def _mapFromSourceRows(self, rows : np.ndarray) -> np.ndarray:
+        """Map model rows to visual (proxy) rows, -1 if a row is not shown.
+        """
+        return self.proxy.mapRowsFromSource(rows)
+
+    def _makeRowSelection(self, visualRows : np.ndarray) -> QtCore.QItemSelection:
+        """One QItemSelectionRange per contiguous block of visual rows.
+        """
+        itemSelection = QtCore.QItemSelection()
+        lastColumn = max(self.proxy.columnCount() - 1, 0)
+        for firstRow, lastRow in contiguousRanges(visualRows):
+            topLeft = self.proxy.index(firstRow, 0)
+            bottomRight = self.proxy.index(lastRow, lastColumn)
+            itemSelection.append(QtCore.QItemSelectionRange(topLeft, bottomRight))
+        return itemSelection
 
     def getNumRows(self):
         """Get number of rows from the model.
@@ -175,7 +209,7 @@ class myTableView(QtWidgets.QTableView):
     def getColumns(self):
         """Get columns from model.
         """
-        return self.myModel.myGetData().columns
+        return self.myModel.myGetColumns()
 
     def clearSelection(self):
         """Over-ride inherited.
@@ -191,8 +225,8 @@ class myTableView(QtWidgets.QTableView):
             rowIdx (int): The row index into the model.
                 it is not the visual row index if table is sorted
         """
-        modelIndex = self.myModel.index(rowIdx, 0)  # rowIdx is in 'model' coordinates
-        visualRow = self.proxy.mapFromSource(modelIndex).row()
+        # rowIdx is in 'model' coordinates
+        visualRow = int(self._mapFromSourceRows([rowIdx])[0])
         logger.info(f'model rowIdx:{rowIdx} corresponds to visual row:{visualRow}')
         super().selectRow(visualRow)
 
@@ -208,27 +242,22 @@ class myTableView(QtWidgets.QTableView):
         
         selectionModel = self.selectionModel()
         if selectionModel:
-            selectionModel.clear()
-        
-            if rows:
-                indexes = [self.myModel.index(r, 0) for r in rows]  # [QModelIndex]
-                visualRows = [self.proxy.mapFromSource(modelIndex) for modelIndex in indexes]
-
-                mode = QtCore.QItemSelectionModel.Select | QtCore.QItemSelectionModel.Rows
-                [self.selectionModel().select(i, mode) for i in visualRows]
-
-                logger.warning(f'20221101 FIX SNAP TO SELECTED ROW')
-                column = 0
-                # error row is a QtCore.QModelIndex ???
-                row = visualRows[0]
-                # abb mar 22
-                row = row.row()
-                index = self.model().index(row, column)
+            visualRows = self._mapFromSourceRows(list(rows))
+            visualRows = np.sort(visualRows[visualRows >= 0])  # -1 is not shown
+
+            if len(visualRows):
+                # one select() with merged ranges, not one per row
+                itemSelection = self._makeRowSelection(visualRows)
+                mode = QtCore.QItemSelectionModel.ClearAndSelect | QtCore.QItemSelectionModel.Rows
+                selectionModel.select(itemSelection, mode)
+
+                # snap to the first selected row
+                index = self.proxy.index(int(visualRows[0]), 0)
                 self.scrollTo(index, QtWidgets.QAbstractItemView.PositionAtTop)  # EnsureVisible
 
             else:
                 #print('  CLEARING SELECTION')
-                self.clearSelection()
+                selectionModel.clear()
         
         #
         self.blockUpdate = False
@@ -250,7 +279,7 @@ class myTableView(QtWidgets.QTableView):
         if selectionModel is not None:
             selectionModel.selectionChanged.disconnect(self.on_selectionChanged)
 
-        self.proxy = QtCore.QSortFilterProxyModel()
+        self.proxy = sortProxyModel()
         self.proxy.setSourceModel(model)
 
         self.myModel.beginResetModel()
@@ -260,9 +289,94 @@ class myTableView(QtWidgets.QTableView):
         self.selectionModel().selectionChanged.connect(self.on_selectionChanged)
         #self.selectionModel().currentChanged.connect(self.old_on_currentChanged)
 
+        if self._rowQuery or self._visibleRows is not None:
+            if not self._setRowFilter(self._rowQuery, self._visibleRows):
+                # e.g. new model does not have a queried column
+                self._setRowFilter('', self._visibleRows)
+
         # refresh hidden columns, only usefull when we first build interface
         self._refreshHiddenColumns()
 
+    def mySetRowQuery(self, query : str) -> bool:
+        """Show only rows matching a pandas expression.
+
+        Evaluated with DataFrame.eval() over whole columns,
+        e.g. "accept == 'Yes' and z > 10".
+
+        Args:
+            query (str): Expression, '' to show all rows.
+
+        Returns:
+            False if query is not valid, the current filter is kept.
+        """
+        return self._setRowFilter(query.strip(), self._visibleRows)
+
+    def mySetVisibleRows(self, rows : Union[np.ndarray, None]):
+        """Show only some model rows, e.g. the items in view in the viewer.
+
+        Combined with the row query, a row is shown if it passes both.
+
+        Args:
+            rows: model rows to show, None to show all rows
+        """
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+        self._setRowFilter(self._rowQuery, rows)
+
+    def _setRowFilter(self, query : str, visibleRows : Union[np.ndarray, None]) -> bool:
+        """Set the proxy row filter from a row query and visible rows.
+
+        Returns:
+            False if query is not valid, the current filter is kept.
+        """
+        def _rowMask(model):
+            numRows = model.rowCount()
+            if query:
+                rowMask = queryRowMask(model.myGetQueryFrame(), query)
+            else:
+                rowMask = np.ones(numRows, dtype=bool)
+            if visibleRows is not None:
+                isVisible = np.zeros(numRows, dtype=bool)
+                isVisible[visibleRows[visibleRows < numRows]] = True
+                rowMask = rowMask & isVisible
+            return rowMask
+
+        if query or visibleRows is not None:
+            rowFilter = _rowMask
+        else:
+            rowFilter = None
+
+        # hidden rows leave the table selection, not the layer selection
+        self.blockUpdate = True
+        try:
+            self.proxy.setRowFilter(rowFilter)
+        except (SyntaxError, NameError, KeyError, TypeError, ValueError) as e:
+            logger.warning(f'not a valid row query "{query}": {e}')
+            return False
+        finally:
+            self.blockUpdate = False
+        self._rowQuery = query
+        self._visibleRows = visibleRows
+        return True
+
+    def getNumShownRows(self) -> int:
+        """Get number of rows shown, after the row query and visible rows.
+        """
+        return self.proxy.rowCount()
+
+    def mySetSortingEnabled(self, enabled : bool):
+        """Turn sorting on/off without sorting the current model.
+
+        QTableView.setSortingEnabled(True) sorts by the header sort indicator
+        (column 0 by default), even if sorting is already on.
+        """
+        if enabled == self.isSortingEnabled():
+            return
+        if enabled:
+            # keep rows in model order until user clicks a header
+            self.horizontalHeader().setSortIndicator(-1, QtCore.Qt.AscendingOrder)
+        self.setSortingEnabled(enabled)
+
     def mySetColumnHidden(self, colStr : str, hidden : bool):
         """Set a column hidden or visible.
         
@@ -273,7 +387,7 @@ class myTableView(QtWidgets.QTableView):
         hidden : bool
             If True then visible, otherwise hidden
         """
-        _columns = self.myModel.myGetData().columns
+        _columns = self.myModel.myGetColumns()
         if not colStr in _columns:
             logger.error(f'did not find {colStr} in model columns')
             logger.error(f'  available columns are: {_columns}')
@@ -292,7 +406,7 @@ class myTableView(QtWidgets.QTableView):
         #self.setColumnHidden(colIdx, hidden)
 
     def _refreshHiddenColumns(self):
-        columns = self.myModel.myGetData().columns
+        columns = self.myModel.myGetColumns()
         for column in columns:
             colIdx = columns.get_loc(column)
             self.setColumnHidden(colIdx, column in self.hiddenColumnSet)
@@ -318,7 +432,7 @@ class myTableView(QtWidgets.QTableView):
         if not isAlt:
             return
         
-        row = self.proxy.mapToSource(item).row()
+        row = int(self._mapToSourceRows([item.row()])[0])
         logger.info(f'row:{row}')
 
         selectedRowList = [row]
@@ -333,7 +447,7 @@ class myTableView(QtWidgets.QTableView):
 
             Notes:
                 - We are not using (selected, deselected) parameters,
-                    instead are using self.selectedIndexes()
+                    instead are using the ranges in self.selectionModel().selection()
                 - Connected to: self.selectionModel().selectionChanged
         """
 
@@ -346,14 +460,11 @@ class myTableView(QtWidgets.QTableView):
         isShift = modifiers == QtCore.Qt.ShiftModifier
         isAlt = modifiers == QtCore.Qt.AltModifier
         
-        # BINGO, don't use params, use self.selectedIndexes()
-        selectedIndexes = [self.proxy.mapToSource(modelIndex).row()
-                            for modelIndex in self.selectedIndexes()]
-        
-        # reduce to list of unique values
-        selectedIndexes = list(set(selectedIndexes))  # to get unique values
-        
-        logger.info(f'  -->> emit signalSelectionChanged selectedIndexes:{selectedIndexes} isAlt:{isAlt}')
+        # BINGO, don't use params, use the whole selection (as ranges)
+        selectedIndexes = self._getRowSelection()
+
+        logger.info(f'  -->> emit signalSelectionChanged numSelected:{len(selectedIndexes)} isAlt:{isAlt}')
+        tracer.debug('selectedIndexes:%s', selectedIndexes)
         
         self.blockUpdate = True  # nov 3, 2022
         self.signalSelectionChanged.emit(selectedIndexes, isAlt)
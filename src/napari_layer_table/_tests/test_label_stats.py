@@ -0,0 +1,94 @@
+from napari_layer_table._label_stats import labelStats
+from skimage.measure import regionprops_table
+import napari
+import numpy as np
+import pandas as pd
+
+def _makeLabels() -> np.ndarray:
+    rng = np.random.default_rng(1)
+    data = np.zeros((12, 40, 40), dtype=np.int32)
+    for label in range(1, 30):
+        z, y, x = rng.integers(0, 10), rng.integers(0, 35), rng.integers(0, 35)
+        data[z:z+rng.integers(1, 3), y:y+rng.integers(1, 6), x:x+rng.integers(1, 6)] = label
+    return data
+
+def _assertMatchesRegionprops(stats : labelStats, data : np.ndarray):
+    bboxColumns = [f'bbox-{idx}' for idx in range(6)]
+    props = regionprops_table(data, properties=['label', 'area', 'centroid', 'bbox'])
+    dfProps = pd.DataFrame(props).set_index('label')
+
+    df = stats.getDataFrame(stats.labels().tolist())
+
+    assert list(df.index) == list(dfProps.index)
+    np.testing.assert_allclose(df['area'], dfProps['area'])
+    np.testing.assert_allclose(df[['z', 'y', 'x']].values,
+                        dfProps[['centroid-0', 'centroid-1', 'centroid-2']].values)
+    np.testing.assert_allclose(df[bboxColumns].values, dfProps[bboxColumns].values)
+
+def test_build_matches_regionprops():
+    # Arrange
+    data = _makeLabels()
+    stats = labelStats(data.ndim)
+
+    # Act: small slabs so labels span more than one slab
+    stats.build(data, slabSize=5)
+
+    # Assert
+    _assertMatchesRegionprops(stats, data)
+
+def test_update_from_paint_and_fill():
+    # Arrange
+    data = _makeLabels()
+    stats = labelStats(data.ndim)
+    stats.build(data)
+    layer = napari.layers.Labels(data)
+    layer.events.paint.connect(lambda event: stats.updateFromPaint(layer.data, event.value))
+
+    # Act and Assert: grow a label, erase part of labels, fill, paint a new label
+    layer.paint((5, 20, 20), 3)
+    _assertMatchesRegionprops(stats, layer.data)
+
+    layer.brush_size = 30
+    layer.paint((5, 20, 20), 0)
+    _assertMatchesRegionprops(stats, layer.data)
+
+    layer.fill((5, 1, 1), 7)
+    _assertMatchesRegionprops(stats, layer.data)
+
+    layer.n_edit_dimensions = 3
+    layer.paint((3, 10, 10), 50)
+    _assertMatchesRegionprops(stats, layer.data)
+
+def test_missing_label_has_no_stats():
+    # Arrange
+    data = np.zeros((10, 10), dtype=np.int32)
+    data[2:4, 3:6] = 2
+    stats = labelStats(data.ndim)
+    stats.build(data)
+
+    # Act
+    df = stats.getDataFrame([1, 2])
+
+    # Assert
+    assert list(stats.labels()) == [2]
+    assert list(df.columns[:3]) == ['area', 'y', 'x']
+    assert df.loc[1, 'area'] == 0
+    assert np.isnan(df.loc[1, 'y'])
+    assert df.loc[2, 'area'] == 6
+    assert (df.loc[2, 'y'], df.loc[2, 'x']) == (2.5, 4.0)
+
+def test_label_colors_match_get_color(make_napari_viewer):
+    # Arrange
+    from napari_layer_table import labelLayer
+    viewer = make_napari_viewer()
+    labels_layer = viewer.add_labels(_makeLabels())
+    myLayer = labelLayer(viewer, labels_layer)
+    labelArray = np.array([1, 2, 5])
+
+    # Act
+    colors = myLayer._getLabelColors(labelArray)
+    oneByOne = myLayer._getLabelColorsOneByOne(labelArray)
+
+    # Assert
+    # older napari label colormaps only have the layer get_color() path
+    assert np.allclose(colors, oneByOne)
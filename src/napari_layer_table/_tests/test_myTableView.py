@@ -1,4 +1,5 @@
 from napari_layer_table import pandasModel, myTableView
+from napari_layer_table._data_model import sortRole
 import numpy as np
 import pandas as pd
 import pytest
@@ -244,9 +245,137 @@ def test_on_selection_changed(table, caplog, points, selectRowIdxs, expectedLogI
     table.mySetModel(data_model)
     table.blockUpdate = False
 
+    emitted = []
+    table.signalSelectionChanged.connect(lambda selectedIndexes, isAlt: emitted.append(selectedIndexes))
+
     # Act
     table.mySelectRows(selectRowIdxs)
     table.on_selectionChanged(None, None)
 
     # Assert
-    assert f"selectedIndexes:{expectedLogIdxs}" in caplog.text
+    assert f"numSelected:{len(expectedLogIdxs)}" in caplog.text
+    assert emitted[-1] == expectedLogIdxs
+
+def test_select_rows_uses_one_range_per_block(table):
+    # Arrange
+    data_model = pandasModel(pd.DataFrame({'x': np.arange(10_000.)}))
+    table.mySetModel(data_model)
+    rows = set(range(100, 5100)) | set(range(6000, 6010)) | {9999}
+    numChanged = []
+    table.selectionModel().selectionChanged.connect(lambda selected, deselected: numChanged.append(1))
+
+    # Act
+    table.mySelectRows(rows)
+
+    # Assert
+    assert len(numChanged) == 1
+    assert len(table.selectionModel().selection()) == 3
+    assert table._getRowSelection() == sorted(rows)
+
+def test_sort_maps_rows_in_bulk(table):
+    # Arrange
+    data_model = pandasModel(pd.DataFrame({'name': ['c', 'a', 'd', 'b']}))
+    table.mySetModel(data_model)
+
+    # Act
+    table.proxy.sort(0, QtCore.Qt.DescendingOrder)
+
+    # Assert
+    assert table.proxy.mapRowsToSource([0, 1, 2, 3]).tolist() == [2, 0, 3, 1]
+    assert table.proxy.mapRowsFromSource([0, 1, 2, 3]).tolist() == [1, 3, 0, 2]
+    assert table.proxy.mapToSource(table.proxy.index(0, 0)).row() == 2
+
+def test_delete_rows_from_sorted_table_keeps_selection(table):
+    # Arrange
+    data_model = pandasModel(pd.DataFrame({'name': ['c', 'a', 'd', 'b', 'e']}))
+    table.mySetModel(data_model)
+    table.proxy.sort(0, QtCore.Qt.AscendingOrder)
+    table.mySelectRows({0, 4})  # 'c' and 'e'
+
+    # Act
+    data_model.myDeleteRows([1, 2])  # 'a' and 'd'
+
+    # Assert
+    names = [table.proxy.index(row, 0).data() for row in range(table.proxy.rowCount())]
+    assert names == ['b', 'c', 'e']
+    assert table._getRowSelection() == [0, 2]
+
+def test_sort_numbers_as_numbers(table):
+    # Arrange
+    data_model = pandasModel(pd.DataFrame({'x': [10, 9, 100, 9], 'y': [1.5, np.nan, -2., 0.]}))
+    table.mySetModel(data_model)
+
+    # Act
+    table.proxy.sort(0, QtCore.Qt.AscendingOrder)
+    xRows = table.proxy.mapRowsToSource(range(4)).tolist()
+    table.proxy.sort(1, QtCore.Qt.DescendingOrder)
+    yRows = table.proxy.mapRowsToSource(range(4)).tolist()
+
+    # Assert
+    assert xRows == [1, 3, 0, 2]  # not '10' < '100' < '9'
+    assert yRows == [0, 3, 2, 1]  # nan is last
+    assert data_model.data(data_model.index(2, 0), sortRole) == 100
+
+def test_row_query_filters_rows_and_keeps_selection(table):
+    # Arrange
+    data_model = pandasModel(pd.DataFrame({'z': [5, 20, 30, 8, 40],
+                                            'accept': ['Yes', 'Yes', '', 'Yes', 'Yes']}))
+    table.mySetModel(data_model)
+    table.mySelectRows({1, 2})
+
+    # Act
+    isValid = table.mySetRowQuery("accept == 'Yes' and z > 10")
+
+    # Assert
+    assert isValid
+    assert table.getNumShownRows() == 2
+    assert table.proxy.mapRowsToSource(range(2)).tolist() == [1, 4]
+    assert table._getRowSelection() == [1]
+
+    # Act
+    table.mySelectRows({2, 4})  # row 2 is not shown
+
+    # Assert
+    assert table._getRowSelection() == [4]
+
+@pytest.mark.parametrize('query', ['z >', 'not_a_column > 1', 'z + 1'])
+def test_bad_row_query_keeps_filter(table, query):
+    # Arrange
+    data_model = pandasModel(pd.DataFrame({'z': [5, 20, 30]}))
+    table.mySetModel(data_model)
+    table.mySetRowQuery('z > 10')
+
+    # Act
+    isValid = table.mySetRowQuery(query)
+
+    # Assert
+    assert not isValid
+    assert table.getNumShownRows() == 2
+
+def test_bool_column_query_with_visible_rows(table):
+    # Arrange
+    data_model = pandasModel(pd.DataFrame({'z': [5, 20, 30, 8], 'isGood': [True, True, False, True]}))
+    table.mySetModel(data_model)
+    table.mySetVisibleRows([0, 2, 3])
+
+    # Act
+    isValid = table.mySetRowQuery('isGood')
+
+    # Assert
+    assert isValid
+    assert table.proxy.mapRowsToSource(range(table.getNumShownRows())).tolist() == [0, 3]
+    assert data_model.myGetData()['isGood'].tolist() == [True, True, False, True]
+
+def test_row_query_is_evaluated_on_new_rows(table):
+    # Arrange
+    data_model = pandasModel(pd.DataFrame({'z': [5., 20.]}))
+    table.mySetModel(data_model)
+    table.mySetRowQuery('z > 10')
+
+    # Act
+    data_model.myAppendRow(pd.DataFrame({'z': [1., 50.]}))
+    data_model.mySetRow([0], pd.DataFrame({'z': [11.]}, index=[0]))
+    data_model.myFlushDataChanged()
+
+    # Assert
+    assert table.proxy.mapRowsToSource(range(table.getNumShownRows())).tolist() == [0, 1, 3]
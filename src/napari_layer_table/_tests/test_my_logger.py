@@ -2,6 +2,7 @@ import logging
 import pytest
 
 import napari_layer_table
+from napari_layer_table import _my_logger
 
 tests = [
     ('debug', logging.DEBUG, False),
@@ -23,3 +24,50 @@ def test_logging(levelStr, level, expected, caplog):
     # Assert
     # my_logger logs only at INFO level and above
     assert (message in caplog.text) == expected
+
+class countStr():
+    """Counts how many times it is formatted.
+    """
+    def __init__(self):
+        self.numFormat = 0
+    def __str__(self):
+        self.numFormat += 1
+        return 'countStr'
+
+def test_tracer_does_not_format_when_disabled(caplog):
+    # Arrange
+    caplog.set_level(logging.INFO)
+    tracer = napari_layer_table.getTracer('layer')
+    oneArg = countStr()
+
+    # Act
+    tracer.debug('disabled %s', oneArg)
+
+    # Assert
+    assert oneArg.numFormat == 0
+    assert 'disabled' not in caplog.text
+
+def test_tracer_levels_per_subsystem(caplog):
+    # Arrange: capture everything, tracers are gated by their own levels
+    caplog.set_level(logging.DEBUG)
+    napari_layer_table.setTraceLevel('model', 'DEBUG')
+    try:
+        # Act
+        napari_layer_table.getTracer('model').debug('model %s', 'traced')
+        napari_layer_table.getTracer('layer').debug('layer %s', 'traced')
+    finally:
+        napari_layer_table.setTraceLevel('model', logging.NOTSET)
+
+    # Assert
+    assert 'model traced' in caplog.text
+    assert 'layer traced' not in caplog.text
+
+def test_trace_levels_from_string():
+    # Act
+    _my_logger.setTraceLevelsFromString('widget=DEBUG, bogus')
+    try:
+        # Assert
+        assert napari_layer_table.getTracer('widget').level == logging.DEBUG
+        assert napari_layer_table.getTracer('layer').level == logging.NOTSET
+    finally:
+        napari_layer_table.setTraceLevel('widget', logging.NOTSET)
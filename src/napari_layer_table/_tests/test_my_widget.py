@@ -879,3 +879,137 @@ def test_snapToPoint(make_napari_viewer, points, selected_row, is_alt, expected_
         assert (int(center[0]) - int(expected_center[0])) <= 0.2 * int(expected_center[0])
         assert (int(center[1]) - int(expected_center[1])) <= 0.2 * int(expected_center[1])
         #assert (int(center[2]) - int(expected_center[2])) <= 0.2 * int(expected_center[2])
+
+def test_virtual_model_reads_rows_from_layer(make_napari_viewer):
+    # Arrange
+    viewer = make_napari_viewer()
+    points_layer = viewer.add_points(threeDimPoints, size=3, face_color='green', name='green circles')
+
+    # Act
+    my_widget = LayerTablePlugin(viewer, oneLayer=points_layer, virtualModelRows=1)
+    model = my_widget.myTable2.myModel
+
+    # Assert
+    assert type(model).__name__ == 'virtualLayerModel'
+    assert model.rowCount() == len(threeDimPoints)
+    xColumn = list(model.myGetColumns()).index('x')
+    assert model.data(model.index(2, xColumn)) == str(threeDimPoints[2, 2])
+
+    # Act: delete a point in the layer
+    points_layer.selected_data = {0}
+    points_layer.remove_selected()
+
+    # Assert
+    assert model.rowCount() == len(threeDimPoints) - 1
+    assert model.data(model.index(1, xColumn)) == str(threeDimPoints[2, 2])
+
+def test_virtual_model_refuses_edit_of_non_feature_column(make_napari_viewer):
+    # Arrange
+    viewer = make_napari_viewer()
+    notes = ['a'] * len(threeDimPoints)
+    points_layer = viewer.add_points(threeDimPoints, size=3, face_color='green',
+                                        features={'note': notes}, name='green circles')
+    my_widget = LayerTablePlugin(viewer, oneLayer=points_layer, virtualModelRows=1)
+    model = my_widget.myTable2.myModel
+    df = my_widget._myLayer.getDataFrame(rowList=[1])
+
+    # Act
+    df.loc[1, 'note'] = 'b'
+    isStored = model.mySetRow([1], df)
+
+    # Assert
+    assert isStored
+    assert points_layer.features.loc[1, 'note'] == 'b'
+
+    # Act
+    df.loc[1, 'Face Color'] = '#0000ffff'
+    isStored = model.mySetRow([1], df)
+
+    # Assert
+    assert not isStored
+    assert my_widget._myLayer.getDataFrame(rowList=[1]).loc[1, 'Face Color'] != '#0000ffff'
+
+def test_label_table_is_built_in_worker(make_napari_viewer, qtbot):
+    # Arrange
+    viewer = make_napari_viewer()
+    labels = np.zeros((20, 16, 16), dtype=np.int32)
+    labels[0:2, 1:3, 1:3] = 1
+    labels[5:12, 4:8, 4:8] = 2
+    labels[19, 10:12, 10:14] = 5
+    labels_layer = viewer.add_labels(labels, name='labels')
+
+    # Act
+    my_widget = LayerTablePlugin(viewer, oneLayer=labels_layer, workerLabelPixels=1)
+    qtbot.waitUntil(lambda: my_widget._labelWorker is None, timeout=5000)
+
+    # Assert
+    df = my_widget.myTable2.myModel.myGetData()
+    assert list(df['label']) == [1, 2, 5]
+    assert list(df['area']) == [8, 112, 8]
+    assert list(df['z']) == [0.5, 8.0, 19.0]
+    assert my_widget._myLayer._labelStats is not None
+    assert not my_widget.progressBar.isVisible()
+
+def test_shapes_centroids_are_features(make_napari_viewer):
+    # Arrange
+    viewer = make_napari_viewer()
+    rectangles = [np.array([[1, 10, 10], [1, 10, 20], [1, 30, 20], [1, 30, 10]]),
+                    np.array([[4, 50, 50], [4, 50, 60], [4, 54, 60], [4, 54, 50]])]
+    shapes_layer = viewer.add_shapes(rectangles, shape_type='rectangle', name='rectangles')
+
+    # Act
+    my_widget = LayerTablePlugin(viewer, oneLayer=shapes_layer)
+
+    # Assert
+    df = my_widget.myTable2.myModel.myGetData()
+    assert list(df['z']) == [1, 4]
+    assert list(df['y']) == [20, 52]
+    assert list(df['x']) == [15, 55]
+    assert list(my_widget._myLayer.getCentroid(1)) == [4, 52, 55]
+
+def test_four_dim_points_move_updates_coordinates(make_napari_viewer):
+    # Arrange
+    viewer = make_napari_viewer()
+    points = np.array([[0, 1, 10, 20], [2, 3, 30, 40], [4, 5, 50, 60]], dtype=float)
+    points_layer = viewer.add_points(points, name='4d points')
+    my_widget = LayerTablePlugin(viewer, oneLayer=points_layer)
+
+    # Act: move one point
+    points_layer.data[1] = [2, 7, 31, 41]
+    my_widget._myLayer._updateFeatures({1})
+
+    # Assert
+    features = points_layer.features
+    assert list(features.loc[1, ['axis-0', 'z', 'y', 'x']]) == [2, 7, 31, 41]
+    assert list(features.loc[2, ['axis-0', 'z', 'y', 'x']]) == [4, 5, 50, 60]
+
+def test_hover_highlight_is_dropped_and_selection_coalesced(make_napari_viewer, qtbot):
+    # Arrange
+    viewer = make_napari_viewer()
+    points_layer = viewer.add_points(threeDimPoints, size=3, name='green circles')
+    my_widget = LayerTablePlugin(viewer, oneLayer=points_layer)
+    myLayer = my_widget._myLayer
+    selectedSets = []
+    myLayer.signalDataChanged.connect(
+        lambda action, selected, copy, df: selectedSets.append((action, selected)))
+    event = MockEvent()
+    event.source = points_layer
+
+    # Act: hover, nothing changed
+    for _ in range(10):
+        myLayer.slot_user_edit_highlight(event)
+
+    # Assert
+    assert myLayer.getHighlightCounts()['dropped'] >= 10
+    assert selectedSets == []
+
+    # Act: two selections in one frame
+    points_layer.selected_data = {0}
+    points_layer.selected_data = {1, 2}
+    qtbot.waitUntil(lambda: len(selectedSets) > 0)
+
+    # Assert: one 'select' with the last selection
+    assert selectedSets == [('select', {1, 2})]
+    counts = myLayer.getHighlightCounts()
+    assert counts['processed'] == 1
+    assert counts['coalesced'] >= 1
@@ -1,4 +1,5 @@
 from napari_layer_table import pandasModel
+from napari_layer_table._data_model import hexToArgb, queryRowMask
 import numpy as np
 import pandas as pd
 import pytest
@@ -213,3 +214,131 @@ def test_my_set_row(points, rows_to_set, data_to_set, expected_data):
 
     # The following doesn't work on Windows, probably due to a pandas bug with .equals()
     # assert data_model.myGetData().equals(expected_data) == True
+
+def test_display_cache_follows_edits():
+    # Arrange
+    data_model = pandasModel(pd.DataFrame(np.array([[50, 55], [60, 65], [70, 75]])))
+    assert data_model.data(MockIndex(1, 1), QtCore.Qt.DisplayRole) == '65'
+
+    # Act
+    data_model.mySetRow([1], pd.DataFrame([[80, 85]], index=[1]))
+    data_model.myDeleteRows([0])
+
+    # Assert
+    assert data_model.data(MockIndex(0, 1), QtCore.Qt.DisplayRole) == '85'
+    assert data_model.data(MockIndex(1, 0), QtCore.Qt.DisplayRole) == '70'
+
+def test_face_color_roles_use_shared_colors(qtbot):
+    # Arrange
+    df = pd.DataFrame({'Symbol': ['+', '+', '+'],
+                        'Face Color': ['#ff000080', '#ff000080', 'nan']})
+    data_model = pandasModel(df)
+
+    # Act
+    color0 = data_model.data(MockIndex(0, 0), QtCore.Qt.ForegroundRole)
+    color1 = data_model.data(MockIndex(1, 1), QtCore.Qt.BackgroundRole)
+    color2 = data_model.data(MockIndex(2, 0), QtCore.Qt.ForegroundRole)
+
+    # Assert
+    assert color0 is color1  # same QColor instance
+    assert color0.getRgb() == (255, 0, 0, 128)
+    assert not QtCore.QVariant(color2).isValid()
+
+def test_hex_to_argb():
+    argb, valid = hexToArgb(np.array(['#11223344', '#112233', 'red', np.nan], dtype=object))
+    assert list(valid) == [True, True, False, False]
+    assert argb[0] == 0x44112233
+    assert argb[1] == 0xFF112233
+
+def test_delete_ranges_then_append_reuses_spare_rows():
+    # Arrange
+    data_model = pandasModel(pd.DataFrame({'x': [0, 1, 2, 3, 4], 'y': [10., 11., 12., 13., 14.]}))
+    removed = []
+    data_model.rowsRemoved.connect(lambda parent, first, last: removed.append((first, last)))
+
+    # Act
+    data_model.myDeleteRows({0, 2, 3})
+    data_model.myAppendRow(pd.DataFrame({'x': [5], 'y': [15.]}))
+
+    # Assert
+    assert removed == [(2, 3), (0, 0)]
+    df = data_model.myGetData()
+    assert df['x'].tolist() == [1, 4, 5]
+    assert df['y'].tolist() == [11., 14., 15.]
+    assert df['x'].dtype == np.int64
+
+def test_my_set_row_emits_one_data_changed_per_range():
+    # Arrange
+    data_model = pandasModel(pd.DataFrame({'x': [0., 1., 2., 3.], 'accept': ['', '', '', '']}))
+    changed = []
+    data_model.dataChanged.connect(lambda start, stop: changed.append((start.row(), stop.row())))
+    df = pd.DataFrame({'x': [10., 11., 13.], 'accept': ['Yes', 'Yes', 'Yes']}, index=[0, 1, 3])
+
+    # Act
+    data_model.mySetRow([0, 1, 3], df, ignoreAccept=True)
+    data_model.myFlushDataChanged()
+
+    # Assert
+    assert changed == [(0, 1), (3, 3)]
+    assert data_model.myGetData()['x'].tolist() == [10., 11., 2., 13.]
+    assert data_model.myGetData()['accept'].tolist() == ['', '', '', '']
+
+def test_my_set_row_burst_emits_data_changed_once(qtbot):
+    # Arrange
+    data_model = pandasModel(pd.DataFrame({'x': np.arange(10.), 'y': np.arange(10.)}))
+    changed = []
+    data_model.dataChanged.connect(lambda start, stop: changed.append(
+        (start.row(), stop.row(), start.column(), stop.column())))
+
+    # Act
+    for row in [2, 3, 4, 2, 3, 8]:
+        df = pd.DataFrame({'x': [100.]}, index=[row])
+        data_model.mySetRow([row], df)
+    df = pd.DataFrame({'y': [100.]}, index=[4])
+    data_model.mySetRow([4], df)
+
+    # Assert
+    assert changed == []
+    qtbot.waitUntil(lambda: len(changed) > 0)
+    assert changed == [(2, 4, 0, 1), (8, 8, 0, 1)]
+    assert data_model._numDataChangedFlushed == 1
+
+def test_pending_data_changed_is_flushed_before_remove():
+    # Arrange
+    data_model = pandasModel(pd.DataFrame({'x': [0., 1., 2., 3.]}))
+    events = []
+    data_model.dataChanged.connect(lambda start, stop: events.append(('changed', start.row(), stop.row())))
+    data_model.rowsRemoved.connect(lambda parent, first, last: events.append(('removed', first, last)))
+
+    # Act
+    data_model.mySetRow([3], pd.DataFrame({'x': [30.]}, index=[3]))
+    data_model.myDeleteRows([0])
+
+    # Assert
+    assert events == [('changed', 3, 3), ('removed', 0, 0)]
+
+def test_query_row_mask():
+    # Arrange
+    df = pd.DataFrame({'z': [5, 20, 30], 'Face Color': ['#ff0000ff', '#00ff00ff', '#ff0000ff']})
+
+    # Act
+    mask = queryRowMask(df, "z > 10 and `Face Color` == '#ff0000ff'")
+
+    # Assert
+    assert mask.tolist() == [False, False, True]
+    with pytest.raises(ValueError):
+        queryRowMask(df, 'z * 2')
+
+def test_append_row_refreshes_face_color(qtbot):
+    # Arrange
+    df = pd.DataFrame({'x': [0, 1, 2], 'Face Color': ['#ff0000ff', '#00ff00ff', '#00ff00ff']})
+    data_model = pandasModel(df)
+    assert data_model.data(MockIndex(2, 1), QtCore.Qt.BackgroundRole).getRgb() == (0, 255, 0, 255)
+    data_model.myDeleteRows({0})  # leaves a spare row, append is in place
+
+    # Act
+    data_model.myAppendRow(pd.DataFrame({'x': [3], 'Face Color': ['#0000ffff']}))
+
+    # Assert
+    assert data_model.data(MockIndex(2, 1), QtCore.Qt.BackgroundRole).getRgb() == (0, 0, 255, 255)
+    assert data_model.data(MockIndex(1, 1), QtCore.Qt.BackgroundRole).getRgb() == (0, 255, 0, 255)
@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from napari_layer_table import LayerTablePlugin
+from napari_layer_table._profiler import profiler, profileStage, numBytesOf, profilerWidget
+
+@pytest.fixture
+def enabledProfiler():
+    profiler.clear()
+    profiler.setEnabled(True)
+    yield profiler
+    profiler.setEnabled(False)
+    profiler.clear()
+
+def test_numBytesOf():
+    # Arrange
+    copyDict = {'data': np.zeros((10, 3)), 'text': ['a'], 'features': pd.DataFrame({'x': np.zeros(4)})}
+
+    # Act
+    numBytes = numBytesOf(copyDict)
+
+    # Assert
+    assert numBytes == 10 * 3 * 8 + 4 * 8 + copyDict['features'].index.memory_usage()
+
+def test_disabled_profiler_records_nothing():
+    # Arrange
+    profiler.clear()
+    @profileStage('test.disabled')
+    def oneStage():
+        return 1
+
+    # Act
+    oneStage()
+
+    # Assert
+    assert profiler.getStats() == {}
+
+def test_profile_stage_stats_and_json(enabledProfiler):
+    # Arrange
+    @profileStage('test.stage', numBytes=lambda result, numValues: result.nbytes)
+    def oneStage(numValues):
+        return np.zeros(numValues)
+
+    # Act
+    for numValues in [1, 2, 3]:
+        oneStage(numValues)
+    stats = json.loads(enabledProfiler.toJson())['test.stage']
+
+    # Assert
+    assert stats['count'] == 3
+    assert stats['bytes'] == 6 * 8
+    assert stats['p50_ms'] <= stats['p95_ms'] <= stats['max_ms']
+
+def test_points_pipeline_stages(make_napari_viewer, enabledProfiler):
+    # Arrange
+    viewer = make_napari_viewer()
+    points = np.array([[15, 10, 10], [15, 20, 20], [15, 30, 30]])
+    points_layer = viewer.add_points(points, name='green circles')
+    my_widget = LayerTablePlugin(viewer, oneLayer=points_layer)
+
+    # Act: add a point
+    points_layer.add([15, 40, 40])
+
+    # Assert
+    stats = enabledProfiler.getStats()
+    assert stats['widget.slot2_layer_data_change']['count'] >= 1
+    assert stats['model.myAppendRow']['count'] == 1
+    assert my_widget.myTable2.getNumRows() == len(points) + 1
+
+    # Act: move the added point, the selection is copied
+    moved = points_layer.data.copy()
+    moved[-1] += 1
+    points_layer.data = moved
+
+    # Assert
+    stats = enabledProfiler.getStats()
+    assert stats['layer._copy_data']['bytes'] > 0
+
+    # Act: panel shows one row per stage
+    panel = profilerWidget()
+
+    # Assert
+    assert panel.statsTable.rowCount() == len(stats)
@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+
+from napari_layer_table import pointsLayer
+from napari_layer_table._spatial_index import spatialIndex
+
+def _bruteForceBox(positions, lower, upper):
+    inBox = np.all((positions >= lower) & (positions <= upper), axis=1)
+    return np.nonzero(inBox)[0]
+
+@pytest.mark.parametrize('sortAxis', [0, 1, 2])
+def test_query_box_matches_brute_force(sortAxis):
+    # Arrange
+    rng = np.random.default_rng(0)
+    positions = rng.uniform(0, 100, (5000, 3))
+    index = spatialIndex(positions, sortAxis=sortAxis)
+    lower = np.array([10., -np.inf, 40.])
+    upper = np.array([12., 50., 60.])
+
+    # Act
+    rows = index.queryBox(lower, upper)
+
+    # Assert
+    assert np.array_equal(rows, _bruteForceBox(positions, lower, upper))
+
+def test_add_move_delete_keep_index_in_sync():
+    # Arrange
+    rng = np.random.default_rng(1)
+    positions = rng.uniform(0, 100, (1000, 3))
+    index = spatialIndex(positions)
+    lower = np.array([20., 0., 0.])
+    upper = np.array([30., 50., 50.])
+
+    # Act
+    newPositions = rng.uniform(0, 100, (50, 3))
+    index.addItems(newPositions)
+    positions = np.concatenate((positions, newPositions))
+
+    movedRows = np.array([3, 500, 1020])
+    positions[movedRows] = [[25., 10., 10.], [99., 1., 1.], [21., 40., 40.]]
+    index.moveItems(movedRows, positions[movedRows])
+
+    deletedRows = np.array([0, 3, 10, 700])
+    index.deleteItems(deletedRows)
+    positions = np.delete(positions, deletedRows, axis=0)
+
+    # Assert
+    assert index.checkIntegrity()
+    assert np.array_equal(index.getPositions(), positions)
+    assert np.array_equal(index.queryBox(lower, upper), _bruteForceBox(positions, lower, upper))
+
+def test_points_layer_visible_items(make_napari_viewer):
+    # Arrange
+    viewer = make_napari_viewer()
+    points = np.array([[5, 10, 10], [5, 80, 80], [6, 12, 12], [20, 10, 10]], dtype=float)
+    viewer.add_image(np.zeros((30, 100, 100)))
+    layer = viewer.add_points(points, size=3)
+    myLayer = pointsLayer(viewer, layer)
+    viewer.dims.set_point(0, 5)
+
+    # Act
+    visibleRows = myLayer.getVisibleItems()
+
+    # Assert
+    assert visibleRows.tolist() == [0, 1]
+
+    # Act
+    layer.selected_data = {3}
+    myLayer._flushHighlight()
+    moved = layer.data.copy()
+    moved[3, 0] = 5
+    layer.data = moved
+    myLayer.slot_user_edit_data(None)
+
+    # Assert
+    assert myLayer.getVisibleItems().tolist() == [0, 1, 3]
+    assert myLayer._spatialIndex.checkIntegrity()
+
+@pytest.mark.parametrize('sortAxis', [0, 1])
+def test_radius_and_nearest_match_brute_force(sortAxis):
+    # Arrange
+    rng = np.random.default_rng(2)
+    positions = rng.uniform(0, 100, (5000, 3))
+    index = spatialIndex(positions, sortAxis=sortAxis)
+    points = [[50., 50., 50.], [0., 0., 0.], [500., -20., 50.]]
+
+    for point in points:
+        distances = np.linalg.norm(positions - point, axis=1)
+
+        # Act
+        rows = index.queryRadius(point, 10.)
+        nearestRow, nearestDistance = index.nearest(point)
+
+        # Assert
+        assert set(rows.tolist()) == set(np.nonzero(distances <= 10.)[0].tolist())
+        assert np.all(np.diff(distances[rows]) >= 0)
+        assert nearestRow == np.argmin(distances)
+        assert nearestDistance == pytest.approx(distances.min())
+
+def test_nearest_respects_max_distance():
+    # Arrange
+    index = spatialIndex(np.array([[0., 0.], [10., 10.]]))
+
+    # Act
+    farRow, farDistance = index.nearest([5., 4.], maxDistance=1.)
+    nearRow, nearDistance = index.nearest([9., 9.], maxDistance=2.)
+
+    # Assert
+    assert farRow is None and farDistance == np.inf
+    assert nearRow == 1 and nearDistance == pytest.approx(np.sqrt(2))
+    assert spatialIndex(np.zeros((0, 2))).nearest([0., 0.]) == (None, np.inf)
+
+def test_points_layer_nearest_item(make_napari_viewer):
+    # Arrange
+    viewer = make_napari_viewer()
+    points = np.array([[5, 10, 10], [5, 80, 80], [6, 12, 12]], dtype=float)
+    layer = viewer.add_points(points, size=3)
+    myLayer = pointsLayer(viewer, layer)
+
+    # Act
+    layer.add([[5, 40, 40]])
+
+    # Assert
+    assert myLayer.findNearestItem([5, 41, 41], maxDistance=3)[0] == 3
+    assert myLayer.findItemsInRadius([5, 11, 11], 3).tolist() == [0, 2]
+
+    # Act
+    myLayer.setMinAddDistance(3)
+    class _event:
+        modifiers = ['Shift']
+        position = (5, 41, 40)
+    myLayer._on_mouse_drag(layer, _event())
+
+    # Assert
+    assert len(layer.data) == 4
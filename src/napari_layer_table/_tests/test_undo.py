@@ -0,0 +1,295 @@
+import numpy as np
+import pandas as pd
+import pytest
+from qtpy import QtCore
+
+from napari_layer_table import pointsLayer, shapesLayer
+from napari_layer_table._my_layer import _shapesMeshShift
+from napari_layer_table._undo import mmUndo, selectionSnapshot
+from napari_layer_table._utils import packVertices
+
+class MockNapariLayer:
+    ndim = 3
+
+class MockLayer(QtCore.QObject):
+    """Just enough of mmLayer to make undo records.
+    """
+    signalDataChanged = QtCore.Signal(object, object, object, object)
+
+    def __init__(self):
+        super().__init__()
+        self._layer = MockNapariLayer()
+
+    def getName(self):
+        return 'mock'
+
+def _pointsCopy(rows, data):
+    return {
+        'rows': np.asarray(rows, dtype=np.intp),
+        'data': np.asarray(data, dtype=float),
+        'face_color': np.ones((len(rows), 4)),
+        'features': pd.DataFrame({'z': data[:, 0], 'accept': [True] * len(rows)}, index=rows),
+    }
+
+def test_undo_keeps_max_num_undo(qtbot):
+    # Arrange
+    undo = mmUndo(MockLayer(), maxNumUndo=5)
+    copy = _pointsCopy([0], np.zeros((1, 3)))
+
+    # Act
+    for _ in range(8):
+        undo.slot_change('add', {0}, copy, pd.DataFrame())
+
+    # Assert
+    assert undo.numUndo() == 5
+    assert undo.numUndoBytes() == 5 * copy['rows'].nbytes
+
+def test_undo_drops_oldest_over_byte_budget(qtbot):
+    # Arrange
+    rows = np.arange(1000)
+    copy = _pointsCopy(rows, np.zeros((1000, 3)))
+    undo = mmUndo(MockLayer(), maxUndoBytes=100_000)
+
+    # Act
+    for _ in range(5):
+        undo.slot_change('delete', set(rows), copy, pd.DataFrame())
+
+    # Assert
+    assert 1 <= undo.numUndo() < 5
+    assert undo.numUndoBytes() <= 100_000
+
+def test_undo_change_keeps_only_what_changed(qtbot):
+    # Arrange
+    undo = mmUndo(MockLayer())
+    before = _pointsCopy([2, 3], np.array([[1., 2., 3.], [4., 5., 6.]]))
+    after = _pointsCopy([2, 3], np.array([[1., 2., 3.], [4., 7., 6.]]))
+    after['features'].loc[3, 'accept'] = False
+    after['previous'] = before
+
+    # Act
+    undo.slot_change('change', {2, 3}, after, pd.DataFrame())
+
+    # Assert
+    record = undo._undoList[-1]
+    assert set(record['changed'].keys()) == {'delta', 'features'}
+    assert np.array_equal(record['changed']['delta'], [[0, 0, 0], [0, 2, 0]])
+    assert list(record['changed']['features'].columns) == ['accept']
+
+def test_undo_change_without_selection_copy_is_ignored(qtbot):
+    # Arrange
+    undo = mmUndo(MockLayer())
+    after = _pointsCopy([0], np.ones((1, 3)))
+
+    # Act
+    undo.slot_change('change', {0}, after, pd.DataFrame())
+
+    # Assert
+    assert undo.numUndo() == 0
+
+def test_undo_move_of_points(make_napari_viewer):
+    # Arrange
+    viewer = make_napari_viewer()
+    points = np.array([[15, 55, 66], [15, 60, 65], [50, 79, 85], [20, 68, 90]], dtype=float)
+    layer = viewer.add_points(points, size=3)
+    myLayer = pointsLayer(viewer, layer)
+    undo = mmUndo(myLayer)
+    layer.selected_data = {1, 2}
+    myLayer._flushHighlight()
+
+    # Act
+    moved = layer.data.copy()
+    moved[[1, 2]] += 5
+    layer.data = moved
+    undo.doUndo()
+
+    # Assert
+    assert np.array_equal(layer.data, points)
+
+def test_selection_snapshot_copies_on_materialize():
+    # Arrange
+    copies = []
+    def copyItems(selection):
+        copies.append(set(selection))
+        return {'rows': np.array(sorted(selection))}
+    snapshot = selectionSnapshot(copyItems)
+
+    # Act
+    snapshot.mark({1, 2}, version=0)
+    snapshot.mark({3}, version=0)
+
+    # Assert
+    assert copies == []
+
+    # Act
+    first = snapshot.materialize(version=0)
+    second = snapshot.materialize(version=1)
+
+    # Assert
+    assert copies == [{3}]
+    assert first is second
+
+def test_selection_snapshot_is_empty_if_layer_changed_first():
+    # Arrange
+    snapshot = selectionSnapshot(lambda selection: {'rows': np.array(sorted(selection))})
+    snapshot.mark({1, 2}, version=0)
+
+    # Act
+    layerCopy = snapshot.materialize(version=1)
+
+    # Assert
+    assert layerCopy == {}
+
+def test_selecting_points_does_not_copy(make_napari_viewer):
+    # Arrange
+    viewer = make_napari_viewer()
+    layer = viewer.add_points(np.random.uniform(0, 100, (1000, 3)))
+    myLayer = pointsLayer(viewer, layer)
+
+    # Act
+    for selection in [set(range(500)), set(range(500, 1000)), set()]:
+        layer.selected_data = selection
+        myLayer._flushHighlight()
+
+    # Assert
+    assert myLayer._selectionSnapshot.numMaterialized == 0
+
+def _changeCopy(rows, before, after):
+    afterCopy = _pointsCopy(rows, after)
+    afterCopy['previous'] = _pointsCopy(rows, before)
+    return afterCopy
+
+def test_transaction_merges_changes(qtbot):
+    # Arrange
+    undo = mmUndo(MockLayer())
+    zero = np.zeros((1, 3))
+    one = np.ones((1, 3))
+
+    # Act
+    with undo.transaction('move'):
+        undo.slot_change('change', {1}, _changeCopy([1], zero, one), pd.DataFrame())
+        undo.slot_change('change', {2}, _changeCopy([2], zero, one), pd.DataFrame())
+        undo.slot_change('change', {1}, _changeCopy([1], one, 3 * one), pd.DataFrame())
+
+    # Assert
+    assert undo.numUndo() == 1
+    record = undo._undoList[-1]
+    assert record['action'] == 'change'
+    assert np.array_equal(record['rows'], [1, 2])
+    assert np.array_equal(record['changed']['delta'], [[3, 3, 3], [1, 1, 1]])
+
+def test_transaction_keeps_add_and_change_in_order(qtbot):
+    # Arrange
+    undo = mmUndo(MockLayer())
+
+    # Act
+    with undo.transaction('add and move'):
+        undo.slot_change('add', {4}, {'rows': np.array([4])}, pd.DataFrame())
+        with undo.transaction():
+            undo.slot_change('change', {4}, _changeCopy([4], np.zeros((1, 3)), np.ones((1, 3))), pd.DataFrame())
+
+    # Assert
+    assert undo.numUndo() == 1
+    record = undo._undoList[-1]
+    assert record['action'] == 'transaction'
+    assert [oneRecord['action'] for oneRecord in record['records']] == ['add', 'change']
+
+def test_undo_and_redo_of_transaction(make_napari_viewer):
+    # Arrange
+    viewer = make_napari_viewer()
+    points = np.random.default_rng(0).uniform(0, 100, (1000, 3))
+    layer = viewer.add_points(points)
+    myLayer = pointsLayer(viewer, layer)
+    undo = mmUndo(myLayer)
+    layer.selected_data = set(range(1000))
+    myLayer._flushHighlight()
+
+    # Act
+    with undo.transaction('move all'):
+        for _ in range(3):
+            moved = layer.data.copy()
+            moved += 1
+            layer.data = moved
+    movedData = layer.data.copy()
+    undo.doUndo()
+
+    # Assert
+    assert undo.numUndo() == 0
+    assert np.allclose(layer.data, points)
+
+    # Act
+    undo.doRedo()
+
+    # Assert
+    assert undo.numRedo() == 0
+    assert np.allclose(layer.data, movedData)
+    assert np.allclose(movedData, points + 3)
+
+def test_new_action_clears_redo(qtbot):
+    # Arrange
+    undo = mmUndo(MockLayer())
+    undo._redoList.append({'action': 'add', 'rows': np.array([0]), 'numBytes': 8})
+
+    # Act
+    undo.slot_change('add', {1}, {'rows': np.array([1])}, pd.DataFrame())
+
+    # Assert
+    assert undo.numRedo() == 0
+
+rectangles = [
+    np.array([[10., 10.], [10., 20.], [20., 20.], [20., 10.]]),
+    np.array([[30., 30.], [30., 40.], [40., 40.], [40., 30.]]),
+    np.array([[50., 50.], [50., 60.], [60., 60.], [60., 50.]]),
+]
+
+@pytest.mark.parametrize('shift, isShifted', [
+    (np.array([5., -2.]), True),  # a move, shifted with one mesh update
+    (np.array([[5., -2.], [0., 0.], [0., 0.], [0., 0.]]), False),  # one vertex moved, each shape edited
+])
+def test_set_shape_vertices(make_napari_viewer, monkeypatch, shift, isShifted):
+    # Arrange
+    viewer = make_napari_viewer()
+    layer = viewer.add_shapes(rectangles, shape_type='rectangle')
+    myLayer = shapesLayer(viewer, layer)
+    rows = np.array([0, 2])
+    expected = [rectangles[0] + shift, rectangles[1], rectangles[2] + shift]
+    shiftResults = []
+    shiftItems = myLayer._shiftItems
+    def spyShiftItems(*args):
+        shiftResults.append(shiftItems(*args))
+        return shiftResults[-1]
+    monkeypatch.setattr(myLayer, '_shiftItems', spyShiftItems)
+
+    # Act
+    vertices, offsets = packVertices([expected[0], expected[2]])
+    myLayer._setItemVertices(rows, vertices, offsets)
+
+    # Assert
+    assert shiftResults == ([_shapesMeshShift] if isShifted else [])
+    assert len(layer.data) == len(expected)
+    for shapeData, expectedData in zip(layer.data, expected):
+        assert np.allclose(shapeData, expectedData)
+
+def test_shift_shapes_matches_shape_list_shift(make_napari_viewer):
+    # Arrange
+    viewer = make_napari_viewer()
+    boxes = [np.column_stack(([z] * 4, rectangle)) for z, rectangle in zip([2., 5., 5.], rectangles)]
+    layer = viewer.add_shapes(boxes, shape_type='rectangle')
+    refLayer = viewer.add_shapes(boxes, shape_type='rectangle')
+    myLayer = shapesLayer(viewer, layer)
+    rows = np.array([0, 2])
+    shapeShift = np.array([[0., 5., -2.], [0., -1., 3.]])  # axis 0 is not displayed
+
+    # Act
+    shifted = myLayer._shiftItems(rows, shapeShift)
+    layer.refresh()
+    for row, oneShift in zip(rows, shapeShift):
+        refLayer._data_view.shift(row, oneShift[1:])
+    refLayer.refresh()
+
+    # Assert
+    assert shifted == _shapesMeshShift
+    if shifted:
+        for shapeData, refData in zip(layer.data, refLayer.data):
+            assert np.allclose(shapeData, refData)
+        assert np.allclose(layer._data_view._mesh.vertices, refLayer._data_view._mesh.vertices)
+        assert np.allclose(layer._data_view._vertices, refLayer._data_view._vertices)
@@ -0,0 +1,46 @@
+from napari_layer_table._utils import rgbaToHex, packVertices, segmentMeans, coordinateColumns
+from napari.utils.colormaps.standardize_color import rgb_to_hex
+import numpy as np
+
+def test_rgba_to_hex_matches_napari():
+    # Arrange
+    rng = np.random.default_rng(0)
+    rgba = rng.uniform(0, 1, (500, 4))
+    rgba[0] = (1., 1., 1., 1.)
+    rgba[1] = (0., 0., 0., 0.)
+    expected = [str(rgb_to_hex(oneColor)[0]) for oneColor in rgba]
+
+    # Act
+    hexColors = rgbaToHex(rgba)
+
+    # Assert
+    assert hexColors.tolist() == expected
+    assert hexColors[0] == '#ffffffff'
+    assert rgbaToHex(np.zeros((0, 4))).shape == (0,)
+
+def test_segment_means_of_packed_vertices():
+    # Arrange
+    rng = np.random.default_rng(0)
+    shapes = [rng.uniform(0, 100, (numVertices, 3)) for numVertices in (4, 1, 7, 2)]
+
+    # Act
+    vertices, offsets = packVertices(shapes)
+    means = segmentMeans(vertices, offsets)
+
+    # Assert
+    assert list(offsets) == [0, 4, 5, 12, 14]
+    np.testing.assert_allclose(means, [oneShape.mean(axis=0) for oneShape in shapes])
+
+def test_segment_means_of_empty_segment():
+    vertices = np.array([[1., 2.], [3., 4.]])
+    offsets = np.array([0, 2, 2])
+
+    means = segmentMeans(vertices, offsets)
+
+    np.testing.assert_allclose(means[0], [2., 3.])
+    assert np.isnan(means[1]).all()
+
+def test_coordinate_columns():
+    assert coordinateColumns(2) == ['y', 'x']
+    assert coordinateColumns(3) == ['z', 'y', 'x']
+    assert coordinateColumns(5) == ['axis-0', 'axis-1', 'z', 'y', 'x']
@@ -1,8 +1,13 @@
 """
+Undo and redo for layer edits (add, delete, change).
+
+Undo records only keep what an edit changed, see mmUndo._makeRecord().
+Layers copy a selection lazily with a selectionSnapshot.
 """
 
-from pprint import pprint
-#from tkinter.messagebox import showinfo
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable
 
 import numpy as np
 import pandas as pd
@@ -10,20 +15,97 @@ import pandas as pd
 from qtpy import QtCore
 
 from napari_layer_table._my_logger import logger
+from napari_layer_table._profiler import numBytesOf
+from napari_layer_table._utils import coordinateColumns, packVertices
 #from napari_layer_table._my_layer import mmLayer
 
+# layer attributes (per item arrays) restored by undo of 'change'
+_undoItemAttributes = ['face_color', 'edge_color', 'size', 'edge_width']
+
+def _unpackVertices(vertices : np.ndarray, offsets : np.ndarray) -> list:
+    """Inverse of packVertices().
+    """
+    return [vertices[offsets[i]:offsets[i+1]] for i in range(len(offsets) - 1)]
+
+class selectionSnapshot():
+    def __init__(self, copyItems : Callable[[set], dict]):
+        """Copy-on-write copy of a layer selection.
+
+        mark() only keeps a reference to the selection and the layer version,
+        materialize() makes the full copy the first time it is needed,
+        e.g. just before the layer deletes or moves the selected items.
+
+        Args:
+            copyItems: function that copies a selection of layer items
+                to a dict of arrays, like pointsLayer._copyItems()
+        """
+        self._copyItems = copyItems
+        self._selection = set()
+        self._version = None  # layer version at mark()
+        self._payload = None  # the copy, None until materialized
+        self.numMaterialized = 0
+
+    def mark(self, selection, version : int, payload : dict = None):
+        """Remember a selection without copying it.
+
+        Args:
+            selection: selected items, not copied, the caller replaces
+                (does not modify) it when the selection changes
+            version: layer version, see mmLayer._layerVersion
+            payload: a copy of selection if the caller already has one
+        """
+        self._selection = selection
+        self._version = version
+        self._payload = payload
+
+    def isMaterialized(self) -> bool:
+        return self._payload is not None
+
+    def materialize(self, version : int) -> dict:
+        """Get the copy of the marked selection, copy it if needed.
+
+        Args:
+            version: current layer version
+
+        Returns:
+            dict from copyItems(), empty if the layer changed since
+                mark() and the selection was not copied before the change
+        """
+        if self._payload is None:
+            if version != self._version:
+                logger.warning('layer changed before selection was copied')
+                return {}
+            self._payload = self._copyItems(self._selection) if self._selection else {}
+            self.numMaterialized += 1
+        return self._payload
+
 class mmUndo(QtCore.QObject):
     #def __init__(self, layer : mmLayer):
-    def __init__(self, layer):
+    def __init__(self, layer,
+                    maxNumUndo : int = 20,
+                    maxUndoBytes : int = 64 * 2**20):
+        """
+        Args:
+            layer (mmLayer)
+            maxNumUndo: Number of undo (and redo) records to keep
+            maxUndoBytes: Memory budget of all undo records,
+                the oldest records are dropped first.
+        """
         super().__init__()
-        
+
         self._layer = layer  # mmLayer
 
-        # TODO (cudmore) keep adding (push) but pop oldest
-        self._maxNumUndo = 20
-        
-        self._undoList = []
-        self._redoList = []
+        self._maxNumUndo = maxNumUndo
+        self._maxUndoBytes = maxUndoBytes
+
+        self._undoList = deque(maxlen=maxNumUndo)
+        self._undoBytes = 0  # sum of 'numBytes' of records in _undoList
+
+        self._redoList = deque(maxlen=maxNumUndo)
+        # inverse of undone records, cleared by a new action
+
+        self._transactionDepth = 0
+        self._transactionRecords = []  # records of the open transaction
 
         self._ignoreNewAction = False  # set to stop adding undo on actual undo
 
@@ -31,120 +113,362 @@ class mmUndo(QtCore.QObject):
 
     def numUndo(self):
         return len(self._undoList)
-    
-    def _addUndo(self, theDict):
-        """Append to the list and keep it within max elements.
+
+    def numRedo(self):
+        return len(self._redoList)
+
+    def numUndoBytes(self) -> int:
+        return self._undoBytes
+
+    @contextmanager
+    def transaction(self, name : str = 'transaction'):
+        """Group all layer edits in a with block into one undo record.
+
+        Consecutive changes of the same items (e.g. a scripted move of
+        10k points, one at a time) are merged, undo and redo of the
+        transaction then update the layer once.
+
+        Transactions can be nested, the outermost one makes the record.
+
+        Example:
+            with myUndo.transaction('move all'):
+                for row in rows:
+                    ...
+        """
+        if self._transactionDepth == 0:
+            self._transactionRecords = []
+        self._transactionDepth += 1
+        try:
+            yield
+        finally:
+            self._transactionDepth -= 1
+            if self._transactionDepth == 0:
+                records = self._transactionRecords
+                self._transactionRecords = []
+                if records:
+                    record = self._mergeRecords(records, name)
+                    logger.info(f'transaction "{name}" of {len(records)} edits')
+                    self._addUndo(record)
+
+    def _pushRecord(self, record : dict):
+        """Add a record of a new action, a new action can not be redone.
+        """
+        self._redoList.clear()
+        if self._transactionDepth > 0:
+            self._transactionRecords.append(record)
+        else:
+            self._addUndo(record)
+
+    def _addUndo(self, record : dict):
+        """Append to the ring buffer and keep it within max elements and bytes.
         """
-        self._undoList.append(theDict)
-        # limit list to last _maxNumUndo 
-        self._undoList = self._undoList[-self._maxNumUndo:] 
+        if len(self._undoList) == self._maxNumUndo:
+            self._popOldest()
+        self._undoList.append(record)
+        self._undoBytes += record['numBytes']
+        # always keep the newest record, even if it is over budget
+        while self._undoBytes > self._maxUndoBytes and len(self._undoList) > 1:
+            self._popOldest()
+
+    def _popOldest(self):
+        record = self._undoList.popleft()
+        self._undoBytes -= record['numBytes']
+        logger.info(f'dropped oldest undo "{record["action"]}" of {len(record["rows"])} items')
 
     def _print(self):
-        logger.info('  == undo stack is:')
-        for item in self._undoList:
-            print(f'    layer "{self._layer.getName()}" original undo action:', item['action'], item['selected_data'])
-    
+        logger.info(f'  == undo stack of layer "{self._layer.getName()}" is:')
+        for record in self._undoList:
+            logger.info(f'    {record["action"]} {len(record["rows"])} items {record["numBytes"]} bytes')
+
     def doUndo(self):
         """Pop the last action and perform undo.
         """
         if self.numUndo() == 0:
             logger.info('nothing to undo')
             return
-                
+
         self._print()
-        
+
         # pop from list
-        theDict = self._undoList.pop(-1)
-        action = theDict['action']
-        if action == 'add':
-            _selected_data = theDict['selected_data']
-            logger.info(f'undo add with delete _selected_data:{_selected_data}')
-            
-            # TODO (cudmore) fix this, our _layer is a mmLAyer which has a napari _layer
-            # Two steps (i) select and (ii) remove selected
-            self._ignoreNewAction = True
-            self._layer._layer.selected_data = _selected_data
-            self._layer._layer.remove_selected()
+        record = self._undoList.pop()
+        self._undoBytes -= record['numBytes']
 
-            self._ignoreNewAction = False
+        inverse = self._apply(record)
+        self._redoList.append(inverse)
 
-        if action == 'delete':
-            _selected_data = theDict['selected_data']
-            logger.info(f' undo delete with add _selected_data:{_selected_data}')
-            
-            self._ignoreNewAction = True
-            self._layer._paste_data(theDict['layerSelectionCopy'])
+    def doRedo(self):
+        """Pop the last undo and perform it again.
+        """
+        if self.numRedo() == 0:
+            logger.info('nothing to redo')
+            return
+
+        record = self._redoList.pop()
+        inverse = self._apply(record)
+        self._addUndo(inverse)
+
+    def _apply(self, record : dict) -> dict:
+        """Undo a record.
+
+        Returns:
+            The inverse record, applying it does the action again.
+        """
+        self._ignoreNewAction = True
+        try:
+            inverse = self._applyRecord(record)
+        finally:
             self._ignoreNewAction = False
+        inverse['numBytes'] = numBytesOf(inverse)
+        return inverse
+
+    def _applyRecord(self, record : dict) -> dict:
+        action = record['action']
+        rows = record['rows']
+        napariLayer = self._layer._layer
+        if action == 'add':
+            logger.info(f'undo add with delete of {len(rows)} items')
+            # copy the items so redo can paste them
+            payload = self._layer._copyItems(set(rows.tolist()))
+            # Two steps (i) select and (ii) remove selected
+            napariLayer.selected_data = set(rows.tolist())
+            napariLayer.remove_selected()
+            return {'action': 'delete', 'rows': rows, 'payload': payload}
+
+        elif action == 'delete':
+            logger.info(f'undo delete with paste of {len(rows)} items')
+            # pasted items go to the end of the layer
+            firstRow = self._layer._layerNumItems()
+            self._layer._paste_data(record['payload'])
+            addedRows = np.arange(firstRow, firstRow + len(rows), dtype=np.intp)
+            return {'action': 'add', 'rows': addedRows}
 
         elif action =='change':
-            # action should be called 'move'
-            logger.info(' do move by updating layer data')
-            _selected_data_list = list(theDict['selected_data'])
-            
-            # TODO (cudmore) for shapes these are not ndarray but [shapes] !!!!
-            _data = theDict['layerSelectionCopy']['data']
-
-            print('    _selected_data_list:', _selected_data_list)  # the data to be moved
-            print('    type(self._layer._layer.data):', type(self._layer._layer.data))
-            print('    type(_data):', type(_data))
-            print('    _data:', _data)
-            print('    -->> not refreshing properly ???')
-            
-            # todo (cudmore) the viewer is not refreshing ???
-
-            self._ignoreNewAction = True
-            if isinstance(self._layer._layer.data, list):
-                # shapes layer data is a list
-                for oneIdx, oneItem in enumerate(_selected_data_list):
-                    self._layer._layer.data[oneItem] = _data[oneIdx]  # property setter of napari layer
-            else:
-                # assuming np.ndarray
-                self._layer._layer.data[_selected_data_list] = _data  # property setter of napari layer
-            self._ignoreNewAction = False
+            logger.info(f'undo change of {len(rows)} items {list(record["changed"].keys())}')
+            self._layer.selectItems(set(rows.tolist()))
+            current = self._currentItems(rows, record['changed'])
+            self._restoreItems(rows, record['changed'])
+            # update our features and the table
+            self._layer.slot_user_edit_data(None)
+            return {'action': 'change', 'rows': rows, 'changed': current}
 
-            # the above is not refreshing the viewer
-            self._layer._layer.refresh()
+        elif action == 'transaction':
+            # undo the edits in reverse order, redo them in order
+            inverses = [self._applyRecord(oneRecord)
+                            for oneRecord in reversed(record['records'])]
+            inverses.reverse()
+            return {'action': 'transaction', 'rows': rows, 'records': inverses}
 
-    def _getUndoDict(self, action : str,
-                    selected_data : set,
-                    #selected_data2 : np.ndarray,
-                    layerSelectionCopy : dict,
-                    df : pd.DataFrame):
+        else:
+            raise ValueError(f'did not understand undo action "{action}"')
+
+    def _currentItems(self, rows : np.ndarray, changed : dict) -> dict:
+        """Current layer values of what _restoreItems() will write.
+
+        This is the inverse of changed, restoring it redoes the change.
         """
+        napariLayer = self._layer._layer
+        current = {}
+        if 'delta' in changed:
+            current['delta'] = -changed['delta']
+        if 'vertices' in changed:
+            current['vertices'], current['offsets'] = self._layer._getItemVertices(rows)
+        for attribute in _undoItemAttributes:
+            if attribute in changed:
+                current[attribute] = getattr(napariLayer, attribute)[rows]
+        if 'features' in changed:
+            columns = list(changed['features'].columns)
+            current['features'] = napariLayer.features.iloc[rows][columns]
+        return current
+
+    def _restoreItems(self, rows : np.ndarray, changed : dict):
+        """Write the values in changed back into the layer.
+
+        Each value is written for all rows at once.
+
         Args:
-            action (Str)
-            select_data (Set)
-            layerSelectionCopy (dict) Full copy of all selected layer info
-            df (pd.DataFrame) DataFrame of all layer features.
+            rows: layer items that changed
+            changed: values before the change, see _diffItems()
         """
-        theDict = {
+        napariLayer = self._layer._layer
+        if 'delta' in changed:
+            self._layer._moveItems(rows, -changed['delta'])
+        if 'vertices' in changed:
+            self._layer._setItemVertices(rows, changed['vertices'], changed['offsets'])
+        for attribute in _undoItemAttributes:
+            if attribute in changed:
+                values = getattr(napariLayer, attribute).copy()
+                values[rows] = changed[attribute]
+                setattr(napariLayer, attribute, values)
+        if 'features' in changed:
+            oldFeatures = changed['features']
+            self._layer._setFeatureValues(rows, list(oldFeatures.columns),
+                                            oldFeatures.to_numpy())
+
+    def _mergeRecords(self, records : list, name : str) -> dict:
+        """Make one record from the records of a transaction.
+
+        If all records are 'change', they are merged into one 'change'
+        of all their rows. Otherwise (add and delete change row indices)
+        the records are kept in order in one 'transaction' record.
+        """
+        if len(records) == 1:
+            return records[0]
+
+        allRows = np.unique(np.concatenate([record['rows'] for record in records]))
+        if all(record['action'] == 'change' for record in records):
+            record = {
+                'action': 'change',
+                'rows': allRows,
+                'changed': self._mergeChanges(records, allRows),
+            }
+        else:
+            record = {
+                'action': 'transaction',
+                'name': name,
+                'rows': allRows,
+                'records': records,
+            }
+        record['numBytes'] = numBytesOf(record)
+        return record
+
+    def _mergeChanges(self, records : list, rows : np.ndarray) -> dict:
+        """Merge 'changed' of records, in order, into values for sorted rows.
+
+        Deltas are summed, other values keep the value before the first change.
+        """
+        napariLayer = self._layer._layer
+        changedList = [record['changed'] for record in records]
+        positionList = [np.searchsorted(rows, record['rows']) for record in records]
+
+        merged = {}
+        withDelta = [i for i, changed in enumerate(changedList) if 'delta' in changed]
+        if withDelta:
+            positions = np.concatenate([positionList[i] for i in withDelta])
+            deltas = np.concatenate([changedList[i]['delta'] for i in withDelta])
+            delta = np.zeros((len(rows), deltas.shape[1]), dtype=deltas.dtype)
+            np.add.at(delta, positions, deltas)
+            merged['delta'] = delta
+
+        if any('vertices' in changed for changed in changedList):
+            # start from current vertices, earliest change is written last
+            vertexList = _unpackVertices(*self._layer._getItemVertices(rows))
+            for positions, changed in zip(reversed(positionList), reversed(changedList)):
+                if 'vertices' in changed:
+                    oldList = _unpackVertices(changed['vertices'], changed['offsets'])
+                    for position, oldVertices in zip(positions, oldList):
+                        vertexList[position] = oldVertices
+            merged['vertices'], merged['offsets'] = packVertices(vertexList)
+
+        for attribute in _undoItemAttributes:
+            if any(attribute in changed for changed in changedList):
+                values = getattr(napariLayer, attribute)[rows]
+                for positions, changed in zip(reversed(positionList), reversed(changedList)):
+                    if attribute in changed:
+                        values[positions] = changed[attribute]
+                merged[attribute] = values
+
+        featureColumns = []
+        for changed in changedList:
+            if 'features' in changed:
+                featureColumns += [column for column in changed['features'].columns
+                                    if column not in featureColumns]
+        if featureColumns:
+            features = napariLayer.features.iloc[rows][featureColumns].copy()
+            for positions, changed in zip(reversed(positionList), reversed(changedList)):
+                if 'features' in changed:
+                    oldFeatures = changed['features']
+                    colIdx = [featureColumns.index(column) for column in oldFeatures.columns]
+                    features.iloc[positions, colIdx] = oldFeatures.to_numpy()
+            merged['features'] = features
+
+        return merged
+
+    def _makeRecord(self, action : str, layerSelectionCopy : dict) -> dict:
+        """Make an undo record that only keeps what the action changed.
+
+        Records are dicts with
+            'action': ('add', 'delete', 'change', 'transaction')
+            'rows': (np.ndarray) layer items of the action
+            'payload': (dict) for 'delete', layerSelectionCopy of deleted items
+            'changed': (dict) for 'change', values before the change, see _diffItems()
+            'records': (list) for 'transaction', records in the order they were made
+            'numBytes': (int) memory held by the record
+
+        Returns:
+            None if there is nothing to undo
+        """
+        rows = layerSelectionCopy['rows']
+        record = {
             'action': action,
-            'selected_data': selected_data,
-            'layerSelectionCopy': layerSelectionCopy,
-            'df': df,
+            'rows': rows,
         }
-        return theDict.copy()
-    
-    #def slot_change(self, action : str, selected_data : set, data : np.ndarray, df : pd.DataFrame):
+        if action == 'delete':
+            record['payload'] = layerSelectionCopy
+        elif action == 'change':
+            # a 'change' copy carries the copy of items before the change
+            changed = self._diffItems(layerSelectionCopy.get('previous', {}),
+                                        layerSelectionCopy)
+            if not changed:
+                return None
+            record['changed'] = changed
+        record['numBytes'] = numBytesOf(record)
+        return record
+
+    def _diffItems(self, before : dict, after : dict) -> dict:
+        """Values in before that are different in after.
+
+        Moved points are kept as a coordinate delta (after - before),
+        other changes keep the values before the change.
+
+        Returns:
+            dict with keys from ('delta', 'vertices', 'offsets', 'features')
+                and _undoItemAttributes. Empty if before is not a copy of the
+                same items.
+        """
+        if not before or not np.array_equal(before['rows'], after['rows']):
+            logger.warning('no copy of items before change, can not undo')
+            return {}
+
+        changed = {}
+        if 'vertices' in before:
+            # shapes, vertices of all items packed in one array
+            if not (np.array_equal(before['offsets'], after['offsets'])
+                        and np.array_equal(before['vertices'], after['vertices'])):
+                changed['vertices'] = before['vertices']
+                changed['offsets'] = before['offsets']
+        else:
+            delta = after['data'] - before['data']
+            if np.any(delta):
+                changed['delta'] = delta
+
+        for attribute in _undoItemAttributes:
+            if attribute in before and not np.array_equal(before[attribute], after[attribute]):
+                changed[attribute] = before[attribute]
+
+        # coordinate features follow the data
+        skipColumns = coordinateColumns(self._layer._layer.ndim)
+        featureColumns = [column for column in before['features'].columns
+                            if column not in skipColumns
+                            and not before['features'][column].equals(after['features'][column])]
+        if featureColumns:
+            changed['features'] = before['features'][featureColumns]
+
+        return changed
+
     def slot_change(self, action :str,
                     selected_data : set,
                     layerSelectionCopy : dict,
                     df : pd.DataFrame):
-        # don't update undo if no selection
-        # could also use selected_data
         if self._ignoreNewAction:
             # ignore new actions when actually doing undo
             return
-        
+
         if action == 'select':
             # no undo action for selection
             return
-        
-        # debug (Cudmore) put this back in
-        #if action == 'change':
-        #    return
-        
+
         if layerSelectionCopy:
             logger.info(f'action:{action} selected_data:{selected_data}')
-            theDict = self._getUndoDict(action, selected_data, layerSelectionCopy, df)
-            self._addUndo(theDict)
\ No newline at end of file
+            record = self._makeRecord(action, layerSelectionCopy)
+            if record is not None:
+                self._pushRecord(record)
@@ -0,0 +1,88 @@
+"""
+Utilities shared by layers and table model.
+"""
+
+from typing import List
+
+import numpy as np
+
+_hexCharCodes = np.array([ord(c) for c in '0123456789abcdef'], dtype=np.uint32)
+# unicode code point of each hex digit
+
+def rgbaToHex(rgba : np.ndarray) -> np.ndarray:
+    """Convert RGBA colors to napari hex strings in one vectorized pass.
+
+    Gives the same result as napari rgb_to_hex() without a Python loop
+    over colors.
+
+    Args:
+        rgba (np.ndarray): (N, 4) float colors with values in [0, 1]
+
+    Returns:
+        np.ndarray of N '#rrggbbaa' strings (dtype '<U9')
+    """
+    rgba = np.asarray(rgba, dtype=float).reshape(-1, 4)
+    numColors = rgba.shape[0]
+
+    # same truncation as napari rgb_to_hex()
+    channels = (255 * rgba).astype(np.uint8)
+
+    # one uint32 code point per character, then view as fixed width unicode
+    chars = np.empty((numColors, 9), dtype=np.uint32)
+    chars[:, 0] = ord('#')
+    chars[:, 1::2] = _hexCharCodes[channels >> 4]
+    chars[:, 2::2] = _hexCharCodes[channels & 0x0F]
+    return chars.view('<U9').reshape(numColors)
+
+def packVertices(vertexList) -> tuple:
+    """Pack a list of (n_i, ndim) vertex arrays into one array.
+
+    Args:
+        vertexList: list of (n_i, ndim) arrays, e.g. napari shapes layer data
+
+    Returns:
+        (vertices, offsets) with vertices (sum(n_i), ndim) and
+            offsets (len(vertexList)+1,), shape i is vertices[offsets[i]:offsets[i+1]]
+    """
+    counts = np.fromiter((len(oneShape) for oneShape in vertexList),
+                            dtype=np.int64, count=len(vertexList))
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    if len(vertexList) == 0:
+        return np.zeros((0, 0)), offsets
+    vertices = np.concatenate(vertexList, axis=0)
+    return vertices, offsets
+
+def segmentMeans(vertices : np.ndarray, offsets : np.ndarray) -> np.ndarray:
+    """Mean of each segment of packed vertices, see packVertices().
+
+    Args:
+        vertices: (M, ndim) packed vertices
+        offsets: (N+1,) start of each segment plus end of last segment
+
+    Returns:
+        (N, ndim) mean of each segment, nan for empty segments
+    """
+    counts = np.diff(offsets)
+    means = np.full((len(counts), vertices.shape[1]), np.nan)
+    hasVertices = counts > 0
+    if hasVertices.any():
+        # reduceat() needs valid, increasing starts, skip empty segments
+        starts = offsets[:-1][hasVertices]
+        sums = np.add.reduceat(vertices, starts, axis=0)
+        means[hasVertices] = sums / counts[hasVertices, np.newaxis]
+    return means
+
+def coordinateColumns(ndim : int) -> List[str]:
+    """Names of table columns for each axis of layer coordinates.
+
+    Last three axes are (z, y, x), like napari. Leading axes of
+    higher dimensional layers (e.g. time) are 'axis-0', 'axis-1', ...
+
+    Args:
+        ndim: number of dimensions of layer data
+    """
+    zyx = ['z', 'y', 'x']
+    if ndim <= 3:
+        return zyx[3-ndim:]
+    return [f'axis-{axis}' for axis in range(ndim-3)] + zyx
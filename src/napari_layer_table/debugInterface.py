@@ -299,8 +299,15 @@ def runPlugin(viewer, layer, onAddCallback=None):
 
     return ltp
 
-def addPointCallback(selectedData : set, df : pd.DataFrame) -> dict:
-    logger.info('BINGO')
+def addPointCallback(selectedData : set, df : pd.DataFrame, coords=None, myLayer=None) -> dict:
+    if myLayer is None or coords is None:
+        # called with the old (selectedData, df) signature
+        return {}
+    # reject a point on top of an existing point
+    nearbyRows = myLayer.findItemsInRadius(coords, 2)
+    if len(nearbyRows):
+        logger.info(f'BINGO rejected, too close to row {nearbyRows[0]}')
+        return None
     return {}
 
 def flashItem(_layer, selectedRow):